@@ -12,9 +12,13 @@ from backend.services.auth_service import AuthService
 from backend.services.student_service import StudentService
 from datetime import timedelta
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import os
 from dotenv import load_dotenv
 from starlette.middleware.sessions import SessionMiddleware
+from backend.mongodb import MongoDB, async_db, indexes, project_migration
+from backend.ai.session_assistant import SessionAssistantManager
+from backend.services import blob_service
 
 # Import all your routers directly
 from backend.routers.auth_router import router as auth_router
@@ -26,7 +30,34 @@ from backend.routers.survey_router import router as survey_router
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled MongoClient is shared by every request and closed on shutdown
+    MongoDB.get_client()
+    try:
+        await asyncio.to_thread(indexes.ensure_indexes)
+    except Exception as e:
+        print(f"❌ Failed to ensure MongoDB indexes: {e}")
+    # The AsyncMongoClient is bound to the loop it is created on, so it is opened here on the server's loop
+    if async_db.MONGO_ASYNC_DRIVER == "native":
+        try:
+            await async_db.open_async_client()
+        except Exception as e:
+            print(f"❌ Failed to open the async MongoDB client: {e}")
+    if os.getenv("MIGRATE_PROJECTS_ON_STARTUP", "true").lower() == "true":
+        project_migration.start_background_migration()
+    blob_gc = asyncio.create_task(blob_service.collect_garbage_periodically()) if blob_service.BLOB_GC_INTERVAL > 0 else None
+    yield
+    if blob_gc is not None:
+        blob_gc.cancel()
+    if SessionAssistantManager._instance is not None:
+        await SessionAssistantManager.get_instance().close()
+    await async_db.close_async_client()
+    MongoDB.close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add Session Middleware for Authlib
 MODE = os.getenv("MODE", "dev")
@@ -1,11 +1,14 @@
 
-from dotenv import load_dotenv
-import os
+import asyncio
 
 from pydantic.type_adapter import P
+from backend.ai.openai_client import AZURE_OPENAI_DEPLOYMENT, complete, create_async_client
+from backend.ai.response_cache import AI_RESPONSE_CACHE_ENABLED, ResponseCache
 import re
-import os
-import openai
+
+# Returned instead of a response when the completion fails
+AI_TIMEOUT_RESPONSE = "The request took too long. Please try again."
+AI_ERROR_RESPONSE = "An error occurred while processing your request."
 
 class AIAnalyzer:
     _instance = None
@@ -18,16 +21,8 @@ class AIAnalyzer:
     
     def __init__(self):
         if not self._initialized:
-            load_dotenv()
-            self.client = openai.AzureOpenAI(
-                azure_endpoint="https://gw-uib.intark.uh-it.no",
-                azure_deployment="gpt-4.1-mini",
-                api_key="unused",  # but still required by the library
-                default_headers={
-                    "X-Gravitee-API-Key": os.getenv("OPENAI_GRAVITEE_KEY") or ""
-                },
-                api_version="2024-10-21",
-            )
+            self.client = create_async_client()
+            self.cache = ResponseCache.get_instance() if AI_RESPONSE_CACHE_ENABLED else None
             self.conversation_history = []
             self._initialized = True
 
@@ -40,27 +35,39 @@ class AIAnalyzer:
             cls._instance = cls()
         return cls._instance
 
-    def get_ai_response(self, prompt: str | None = None, add_promt_to_history: bool = True, add_response_to_history: bool = True) -> str:
+    async def get_ai_response(self, prompt: str | None = None, add_promt_to_history: bool = True, add_response_to_history: bool = True, cache_version: str | None = None) -> str:
         """
         Get a response from the AI assistant using the provided prompt.
+
+        Calls that pass the version of their prompt template as cache_version
+        and leave the history alone are answered from the response cache when
+        the exact same messages were sent before.
         """
         try:
             if add_promt_to_history:
                 self.conversation_history.append({"role": "user", "content": prompt})
-                response = self.client.chat.completions.create(
-                model='gpt-4.1-mini',
-                messages=self.conversation_history
-                 )
+                messages = self.conversation_history
             else:
-                response = self.client.chat.completions.create(
-                    model='gpt-4.1-mini',
-                    messages=self.conversation_history + [{"role": "user", "content": prompt}]
-                )
+                messages = self.conversation_history + [{"role": "user", "content": prompt}]
+
+            cache_key = None
+            if cache_version and self.cache is not None and not add_promt_to_history and not add_response_to_history:
+                cache_key = ResponseCache.key(AZURE_OPENAI_DEPLOYMENT, cache_version, messages)
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    print("♻️ Reusing cached AI response")
+                    return cached
+
+            response = await complete(self.client, messages)
             if add_response_to_history:
-                self.conversation_history.append({"role": "assistant", "content": response.choices[0].message.content.strip() or ""})
-            return response.choices[0].message.content.strip() or ""
+                self.conversation_history.append({"role": "assistant", "content": response})
+            # Only real responses are cached, errors below are returned but not stored
+            if cache_key is not None:
+                await self.cache.put(cache_key, response, AZURE_OPENAI_DEPLOYMENT, cache_version)
+            return response
+        except asyncio.TimeoutError:
+            print("⏱️ AI response timed out")
+            return AI_TIMEOUT_RESPONSE
         except Exception as e:
             print(f"Error getting ai response: {e}")
-            return "An error occurred while processing your request."
-    
-
+            return AI_ERROR_RESPONSE
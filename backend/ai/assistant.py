@@ -1,12 +1,10 @@
 
-from dotenv import load_dotenv
-import os
+import asyncio
 
 from pydantic.type_adapter import P
+from backend.ai.openai_client import complete, create_async_client
 from backend.models.promt import system_prompt
 import re
-import os
-import openai
 
 class Assistant:
     _instance = None
@@ -19,16 +17,7 @@ class Assistant:
     
     def __init__(self):
         if not self._initialized:
-            load_dotenv()
-            self.client = openai.AzureOpenAI(
-                azure_endpoint="https://gw-uib.intark.uh-it.no",
-                azure_deployment="gpt-4.1-mini",
-                api_key="unused",  # but still required by the library
-                default_headers={
-                    "X-Gravitee-API-Key": os.getenv("OPENAI_GRAVITEE_KEY") or ""
-                },
-                api_version="2024-10-21",
-            )
+            self.client = create_async_client()
             self.conversation_history = []
             self._initialized = True
 
@@ -60,7 +49,7 @@ class Assistant:
         self.conversation_history = []
         self.add_system_message(system_prompt)
 
-    def get_assistant_response(self, prompt: str, code: str | None = None) -> str:
+    async def get_assistant_response(self, prompt: str, code: str | None = None) -> str:
         """
         Get a response from the AI assistant using the provided prompt.
         """
@@ -69,14 +58,12 @@ class Assistant:
                 code = f"Here is the code: {code}\n\n"
             
             self.conversation_history.append({"role": "user", "content": prompt})
-            response = self.client.chat.completions.create(
-                model='gpt-4.1-mini',
-                messages=self.conversation_history + [{"role": "user", "content": code}]
-            )
-            self.conversation_history.append({"role": "assistant", "content": response.choices[0].message.content.strip() or ""})
-            return response.choices[0].message.content.strip() or ""
+            response = await complete(self.client, self.conversation_history + [{"role": "user", "content": code}])
+            self.conversation_history.append({"role": "assistant", "content": response})
+            return response
+        except asyncio.TimeoutError:
+            print("⏱️ Assistant response timed out")
+            return "The request took too long. Please try again."
         except Exception as e:
             print(f"Error getting assistant response: {e}")
             return "An error occurred while processing your request."
-    
-
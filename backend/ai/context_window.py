@@ -0,0 +1,303 @@
+"""
+Token budget for the messages sent with each assistant request.
+
+A session's stored history keeps growing, but a request only carries:
+
+- the system prompt and other instructions,
+- a rolling summary of the turns that fell out of the window,
+- the last ASSISTANT_CONTEXT_KEEP_TURNS turns verbatim,
+- the student's code in full once, then only what changed between requests,
+- the new question.
+
+Older turns are folded into the summary in batches, and the summary is
+stored in the session so it is only generated once per batch. The session
+stores the code the same way it is sent: a full copy every
+ASSISTANT_CODE_SNAPSHOT_EVERY changes and unified diffs in between, which
+are applied to rebuild the current file.
+
+Tokens are estimated at four characters per token. ASSISTANT_TOKEN_COUNTER=tiktoken
+counts them exactly but needs the tiktoken package (pip install tiktoken);
+without it the estimate is used.
+"""
+import difflib
+import hashlib
+import os
+import re
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from backend.ai.openai_client import complete
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+load_dotenv()
+
+# Largest request sent to the model, older verbatim turns are dropped to stay below it
+ASSISTANT_CONTEXT_MAX_TOKENS = int(os.getenv("ASSISTANT_CONTEXT_MAX_TOKENS") or 8000)
+# Question/answer pairs sent verbatim
+ASSISTANT_CONTEXT_KEEP_TURNS = int(os.getenv("ASSISTANT_CONTEXT_KEEP_TURNS") or 6)
+# Turns that have to fall out of the window before they are folded into the summary
+ASSISTANT_SUMMARY_BATCH = int(os.getenv("ASSISTANT_SUMMARY_BATCH") or 4)
+# Code changes sent as diffs before the next one is sent and stored in full
+ASSISTANT_CODE_SNAPSHOT_EVERY = int(os.getenv("ASSISTANT_CODE_SNAPSHOT_EVERY") or 10)
+# "estimate" or "tiktoken"
+ASSISTANT_TOKEN_COUNTER = os.getenv("ASSISTANT_TOKEN_COUNTER", "estimate")
+
+# Names marking the session messages the window manages itself
+SUMMARY_NAME = "conversation_summary"
+CODE_NAME = "student_code"
+
+FULL_CODE_PREFIX = "Here is my current code:\n"
+CODE_DIFF_PREFIX = "I changed my code since the last version:\n"
+
+SUMMARY_PROMPT = """Summarize this conversation between a programming student and a tutor
+    in at most 150 words. Keep the student's goals, the problems found in their code, the hints
+    already given and any open questions. Do not include code."""
+
+_encoding = None
+if ASSISTANT_TOKEN_COUNTER == "tiktoken":
+    if tiktoken is None:
+        print("⚠️ tiktoken is not installed, estimating tokens at four characters per token")
+    else:
+        _encoding = tiktoken.get_encoding("o200k_base")
+
+
+def count_text_tokens(text: str) -> int:
+    """
+    Tokens in a text. Counted with tiktoken when ASSISTANT_TOKEN_COUNTER
+    selects it, otherwise estimated at four characters per token.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def count_tokens(messages: List[dict]) -> int:
+    """Tokens used by chat messages"""
+    # Every message carries a few tokens of framing besides its content
+    return sum(4 + count_text_tokens(message.get("content") or "") for message in messages)
+
+
+def code_message(code: str, sha: str) -> dict:
+    """A stored full copy of the code, the hash is kept to compare later code with"""
+    return {"role": "user", "name": CODE_NAME, "content": FULL_CODE_PREFIX + code, "sha": sha}
+
+
+def code_diff_message(diff: str, sha: str) -> dict:
+    """A stored code change, only the diff from the previous version is kept"""
+    return {"role": "user", "name": CODE_NAME, "content": CODE_DIFF_PREFIX + diff, "sha": sha}
+
+
+def split_lines(text: str) -> List[str]:
+    """Lines ending in \\n, unlike str.splitlines other line breaks stay inside a line"""
+    return re.findall(r"[^\n]*\n|[^\n]+$", text)
+
+
+def unified_diff(before: str, after: str) -> str:
+    """A unified diff between two versions of the code that apply_diff can apply"""
+    lines = []
+    for line in difflib.unified_diff(
+        split_lines(before), split_lines(after), fromfile="before", tofile="after",
+    ):
+        lines.append(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n")
+    return "".join(lines)
+
+
+HUNK_HEADER = re.compile(r"@@ -(\d+)(?:,(\d+))? \+")
+
+
+def apply_diff(code: str, diff: str) -> str:
+    """Apply a diff made by unified_diff to the version it was made from"""
+    source = split_lines(code)
+    result, position, last = [], 0, None
+    for line in split_lines(diff):
+        header = HUNK_HEADER.match(line)
+        if header:
+            start, length = int(header.group(1)), header.group(2)
+            # An empty range names the line before it, any other its first line
+            index = start if length == "0" else start - 1
+            result += source[position:index]
+            position = index
+        elif last is None:
+            # The ---/+++ file names before the first hunk
+            continue
+        elif line.startswith(" "):
+            result.append(source[position])
+            position += 1
+        elif line.startswith("-"):
+            position += 1
+        elif line.startswith("+"):
+            result.append(line[1:])
+        elif line.startswith("\\") and last[0] != "-":
+            result[-1] = result[-1].rstrip("\n")
+        last = line
+    result += source[position:]
+    return "".join(result)
+
+
+def latest_code(messages: List[dict]) -> Optional[dict]:
+    """
+    The current code of the messages: its text, hash and the number of diffs
+    applied since the last full copy. Rebuilt from that copy and the diffs after it.
+    """
+    snapshots = [m for m in messages if m.get("name") == CODE_NAME]
+    full = [i for i, m in enumerate(snapshots) if m["content"].startswith(FULL_CODE_PREFIX)]
+    if not full:
+        return None
+    code = snapshots[full[-1]]["content"][len(FULL_CODE_PREFIX):]
+    changes = snapshots[full[-1] + 1:]
+    for change in changes:
+        code = apply_diff(code, change["content"][len(CODE_DIFF_PREFIX):])
+    return {"code": code, "sha": snapshots[-1]["sha"], "diffs": len(changes)}
+
+
+def without_orphan_diffs(messages: List[dict]) -> List[dict]:
+    """The messages without the code diffs that come before any full copy"""
+    result, based = [], False
+    for message in messages:
+        if message.get("name") == CODE_NAME:
+            based = based or message["content"].startswith(FULL_CODE_PREFIX)
+            if not based:
+                continue
+        result.append(message)
+    return result
+
+
+def group_turns(messages: List[dict]) -> List[List[dict]]:
+    """
+    The turns of a conversation, system messages left out. A turn is a
+    question with the code change sent with it and its answer.
+    """
+    turns = []
+    for message in messages:
+        if message["role"] == "system":
+            continue
+        starts_turn = message.get("name") == CODE_NAME or (
+            message["role"] == "user" and not (turns and turns[-1][-1].get("name") == CODE_NAME)
+        )
+        if starts_turn or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def with_full_code(earlier: List[List[dict]], kept: List[List[dict]]) -> List[dict]:
+    """
+    Flatten the kept turns so the first code they carry is a full copy: a
+    diff whose base fell out of the window is replaced by the whole file, and
+    the latest earlier snapshot is brought along if the kept turns have none.
+    """
+    before = [m for turn in earlier for m in turn]
+    messages = [m for turn in kept for m in turn]
+    snapshots = [m for m in messages if m.get("name") == CODE_NAME]
+    if snapshots:
+        first = snapshots[0]
+        if first["content"].startswith(FULL_CODE_PREFIX):
+            return messages
+        current = latest_code(before + [first])
+        if current is None:
+            # The full copy these diffs apply to is gone, drop them until the next one
+            return without_orphan_diffs(messages)
+        return [code_message(current["code"], current["sha"]) if m is first else m for m in messages]
+    previous = latest_code(before)
+    if previous is not None:
+        return [code_message(previous["code"], previous["sha"])] + messages
+    return messages
+
+
+def sendable(message: dict) -> dict:
+    """The message without the fields only kept for the session"""
+    return {key: value for key, value in message.items() if key in ("role", "name", "content")}
+
+
+class ContextWindow:
+    """
+    Builds the messages of a request from a session's history and compacts
+    the history by folding old turns into a summary.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = ASSISTANT_CONTEXT_MAX_TOKENS,
+        keep_turns: int = ASSISTANT_CONTEXT_KEEP_TURNS,
+        summary_batch: int = ASSISTANT_SUMMARY_BATCH,
+        snapshot_every: int = ASSISTANT_CODE_SNAPSHOT_EVERY,
+    ):
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.summary_batch = summary_batch
+        self.snapshot_every = snapshot_every
+
+    def turn(self, history: List[dict], prompt: str, code: Optional[str] = None) -> List[dict]:
+        """
+        The messages to store for a new question.
+
+        The code is compared by hash with the session's last snapshot: an
+        unchanged file adds nothing, a changed one is sent as a unified diff
+        unless the diff is larger than the file itself or snapshot_every
+        diffs have been sent since the last full copy.
+        """
+        messages = []
+        if code:
+            sha = hashlib.sha256(code.encode("utf-8")).hexdigest()
+            previous = latest_code(history)
+            if previous is None:
+                messages.append(code_message(code, sha))
+            elif previous["sha"] != sha:
+                diff = unified_diff(previous["code"], code)
+                if len(diff) < len(code) and previous["diffs"] + 1 < self.snapshot_every:
+                    messages.append(code_diff_message(diff, sha))
+                else:
+                    messages.append(code_message(code, sha))
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def build(self, history: List[dict], new_messages: List[dict]) -> List[dict]:
+        """
+        The messages to send: instructions, summary, the last turns with
+        their code changes and the new question, within max_tokens.
+        """
+        instructions, summary, turns = self._split(history)
+        kept = turns[-self.keep_turns:] if self.keep_turns else []
+        earlier = turns[:len(turns) - len(kept)]
+
+        # Drop the oldest verbatim turns first when the window is still too large
+        window = with_full_code(earlier, kept) + new_messages
+        while kept and count_tokens(instructions + summary + window) > self.max_tokens:
+            earlier, kept = earlier + kept[:1], kept[1:]
+            window = with_full_code(earlier, kept) + new_messages
+        return [sendable(m) for m in instructions + summary + window]
+
+    def needs_compaction(self, history: List[dict]) -> bool:
+        _, _, turns = self._split(history)
+        return len(turns) >= self.keep_turns + self.summary_batch
+
+    async def compact(self, client, history: List[dict]) -> List[dict]:
+        """
+        Fold every turn but the last keep_turns into the summary. The kept
+        turns start with a full copy of the code. Returns the history to store.
+        """
+        instructions, summary, turns = self._split(history)
+        kept = turns[-self.keep_turns:] if self.keep_turns else []
+        folded = turns[:len(turns) - len(kept)]
+
+        transcript = "\n".join(
+            f"{m['role']}: {m['content']}" for m in summary + [m for turn in folded for m in turn] if m.get("name") != CODE_NAME
+        )
+        text = await complete(client, [
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": transcript},
+        ])
+
+        summary_message = {"role": "system", "name": SUMMARY_NAME, "content": f"Summary of the earlier conversation: {text}"}
+        return instructions + [summary_message] + with_full_code(folded, kept)
+
+    def _split(self, history: List[dict]):
+        """The instructions, the latest summary and the turns of a history"""
+        instructions = [m for m in history if m["role"] == "system" and m.get("name") != SUMMARY_NAME]
+        summary = [m for m in history if m.get("name") == SUMMARY_NAME][-1:]
+        return instructions, summary, group_turns(history)
@@ -0,0 +1,70 @@
+import asyncio
+import os
+
+import openai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+AZURE_OPENAI_ENDPOINT = "https://gw-uib.intark.uh-it.no"
+AZURE_OPENAI_DEPLOYMENT = "gpt-4.1-mini"
+AZURE_OPENAI_API_VERSION = "2024-10-21"
+# Deadline for one completion, including the client's own retries
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT") or 60)
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES") or 2)
+
+
+def create_async_client() -> openai.AsyncAzureOpenAI:
+    """
+    AsyncAzureOpenAI client for the gateway. Its connection pool belongs to
+    the event loop it is first used on, so create it from the app's loop.
+    """
+    return openai.AsyncAzureOpenAI(
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        azure_deployment=AZURE_OPENAI_DEPLOYMENT,
+        api_key="unused",  # but still required by the library
+        default_headers={
+            "X-Gravitee-API-Key": os.getenv("OPENAI_GRAVITEE_KEY") or ""
+        },
+        api_version=AZURE_OPENAI_API_VERSION,
+        timeout=OPENAI_TIMEOUT,
+        max_retries=OPENAI_MAX_RETRIES,
+    )
+
+
+async def complete(client: openai.AsyncAzureOpenAI, messages: list[dict], timeout: float | None = None) -> str:
+    """
+    Await one chat completion and return its text.
+
+    Raises asyncio.TimeoutError when the deadline passes. If the calling task
+    is cancelled (for example because the HTTP client went away) the request
+    is cancelled with it.
+    """
+    response = await asyncio.wait_for(
+        client.chat.completions.create(model=AZURE_OPENAI_DEPLOYMENT, messages=messages),
+        timeout=timeout or OPENAI_TIMEOUT,
+    )
+    return (response.choices[0].message.content or "").strip()
+
+
+async def stream(client: openai.AsyncAzureOpenAI, messages: list[dict], timeout: float | None = None):
+    """
+    Stream one chat completion, yielding its text as the tokens arrive.
+
+    The deadline applies to the first token and to every gap between tokens,
+    so long answers are not cut off as long as they keep coming.
+    """
+    timeout = timeout or OPENAI_TIMEOUT
+    chunks = await asyncio.wait_for(
+        client.chat.completions.create(model=AZURE_OPENAI_DEPLOYMENT, messages=messages, stream=True),
+        timeout=timeout,
+    )
+    iterator = chunks.__aiter__()
+    while True:
+        try:
+            chunk = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+        except StopAsyncIteration:
+            return
+        # Azure sends a first chunk without choices carrying the content filter results
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+from backend.mongodb.async_db import get_async_db_connection
+
+
+load_dotenv()
+
+AI_RESPONSE_CACHE_ENABLED = os.getenv("AI_RESPONSE_CACHE", "true").lower() not in ("0", "false", "no")
+# Number of responses kept in process in front of MongoDB
+AI_RESPONSE_CACHE_SIZE = int(os.getenv("AI_RESPONSE_CACHE_SIZE") or 256)
+# Entries not used for this long are dropped by a TTL index
+AI_RESPONSE_CACHE_TTL = int(os.getenv("AI_RESPONSE_CACHE_TTL") or 30 * 24 * 3600)
+
+
+class ResponseCache:
+    """
+    Cache of LLM responses keyed by a hash of the model, the prompt template
+    version and the exact messages sent.
+
+    Responses are stored in the "ai_response_cache" collection, with an LRU of
+    the most recently used ones in process. An identical request (the same
+    code analysed with the same template) is answered without calling the
+    model. Bumping a template version invalidates its old entries.
+    """
+    _instance = None
+
+    def __init__(self, db=None, max_entries: int = AI_RESPONSE_CACHE_SIZE):
+        self.db = db if db is not None else get_async_db_connection("students")
+        self.collection = self.db["ai_response_cache"]
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.memory_hits = 0
+        self.mongo_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the process-wide cache.
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def key(model: str, template_version: str, messages: list[dict]) -> str:
+        payload = json.dumps({"model": model, "template": template_version, "messages": messages}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> str | None:
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.memory_hits += 1
+                return self.memory[key]
+
+        entry = await self.collection.find_one_and_update(
+            {"_id": key},
+            {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+            projection={"response": 1}
+        )
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.mongo_hits += 1
+        self._remember(key, entry["response"])
+        return entry["response"]
+
+    async def put(self, key: str, response: str, model: str, template_version: str):
+        self._remember(key, response)
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": key},
+            {
+                "$set": {"response": response, "model": model, "template_version": template_version, "last_used_at": now},
+                "$setOnInsert": {"created_at": now, "hits": 0},
+            },
+            upsert=True
+        )
+
+    async def stats(self) -> dict:
+        hits = self.memory_hits + self.mongo_hits
+        total = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "mongo_hits": self.mongo_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "memory_entries": len(self.memory),
+            "entries": await self.collection.estimated_document_count(),
+        }
+
+    def _remember(self, key: str, response: str):
+        with self.lock:
+            self.memory[key] = response
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
@@ -1,10 +1,10 @@
-from math import e
-from dotenv import load_dotenv
-import os
-from typing import Dict, List, Optional
-import openai
+import asyncio
+from typing import List, Optional
 
 import uuid
+from backend.ai.context_window import ContextWindow
+from backend.ai.openai_client import complete, create_async_client, stream
+from backend.ai.session_store import SessionStore, create_session_store
 from backend.models.promt import system_prompt
 
 
@@ -12,24 +12,20 @@ class SessionAssistant:
     """
     A session-based assistant that maintains separate conversation histories
     for different sessions/contexts (e.g., default editor vs survey editors).
+    Conversations are kept in a session store, in process or in MongoDB so
+    that several workers can serve the same session. Each request only sends
+    the part of the conversation that fits the context window.
     """
     
-    def __init__(self):
-        load_dotenv()
-        self.client = openai.AzureOpenAI(
-            azure_endpoint="https://gw-uib.intark.uh-it.no",
-            azure_deployment="gpt-4.1-mini",
-            api_key="unused",  # but still required by the library
-            default_headers={
-                "X-Gravitee-API-Key": os.getenv("OPENAI_GRAVITEE_KEY") or ""
-            },
-            api_version="2024-10-21",
-        )
-        self.sessions: Dict[str, List[dict]] = {}
-
-    def create_session(self, session_id: Optional[str] = None, system_message: Optional[str] = None) -> str:
-        """
-        Create a new session with optional custom system message.
+    def __init__(self, store: Optional[SessionStore] = None, context: Optional[ContextWindow] = None):
+        self.client = create_async_client()
+        self.store = store or create_session_store()
+        self.context = context or ContextWindow()
+
+    async def create_session(self, session_id: Optional[str] = None, system_message: Optional[str] = None) -> str:
+        """
+        Create a new session with optional custom system message. An
+        existing session, for example one another worker just created, is kept.
         
         Args:
             session_id: Optional session ID. If not provided, a UUID will be generated.
@@ -41,92 +37,119 @@ class SessionAssistant:
         if session_id is None:
             session_id = str(uuid.uuid4())
         
-        self.sessions[session_id] = []
-        
-        if system_message:
-            self.add_system_message(session_id, system_message)
+        messages = [{"role": "system", "content": system_message}] if system_message else []
+        await self.store.create(session_id, messages)
 
         return session_id
 
-    def get_or_create_session(self, session_id: str, system_message: Optional[str] = None) -> str:
+    async def get_or_create_session(self, session_id: str, system_message: Optional[str] = None) -> str:
         """
         Get existing session or create new one if it doesn't exist.
         """
-        if session_id not in self.sessions:
-            return self.create_session(session_id, system_message)
+        if not await self.store.exists(session_id):
+            return await self.create_session(session_id, system_message)
         return session_id
 
-    def add_system_message(self, session_id: str, message: str):
+    async def add_system_message(self, session_id: str, message: str):
         """
         Add a system message to a specific session.
         """
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-        
-        self.sessions[session_id].append({"role": "system", "content": message})
+        await self.store.append(session_id, {"role": "system", "content": message})
 
-    def clear_session(self, session_id: str, system_message: Optional[str] = None):
+    async def clear_session(self, session_id: str, system_message: Optional[str] = None):
         """
         Clear a session's conversation history and optionally set new system message.
         """
         # Clear the session (or create it if it doesn't exist)
-        self.sessions[session_id] = []
-            
-        if system_message:
-            self.add_system_message(session_id, system_message)
+        messages = [{"role": "system", "content": system_message}] if system_message else []
+        await self.store.set(session_id, messages)
 
 
-    def delete_session(self, session_id: str):
+    async def delete_session(self, session_id: str):
         """
         Delete a session completely.
         """
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        await self.store.delete(session_id)
 
-    def get_assistant_response(self, session_id: str, prompt: str, code: Optional[str] = None) -> str:
+    async def get_assistant_response(self, session_id: str, prompt: str, code: Optional[str] = None) -> str:
         """
         Get a response from the AI assistant for a specific session.
+
+        The completion is awaited, so other requests keep being served while
+        it runs. The exchange is only added to the history once the response
+        arrived, so a timed out or cancelled request leaves the session as it was.
         """
-        if session_id not in self.sessions:
-            # Create session with default system prompt if it doesn't exist
-            self.create_session(session_id)
+        history = await self._load_history(session_id)
 
         try:
-            # Prepare the user message
-            user_message = prompt
-            if code:
-                user_message = f"Here is the code: {code}\n\n{prompt}"
-            
-            # Add user message to session history
-            self.sessions[session_id].append({"role": "user", "content": user_message})
-            
-            # Get response from OpenAI
-            response = self.client.chat.completions.create(
-                model='gpt-4.1-mini',
-                messages=self.sessions[session_id]
-            )
-            
-            assistant_response = response.choices[0].message.content
-            
-            # Add assistant response to session history
-            self.sessions[session_id].append({"role": "assistant", "content": assistant_response})
+            turn = self.context.turn(history, prompt, code)
+            assistant_response = await complete(self.client, self.context.build(history, turn))
+
+            # Add the exchange to the session history, unless the session was deleted meanwhile
+            if await self.store.exists(session_id):
+                await self.store.append(session_id, *turn, {"role": "assistant", "content": assistant_response})
             return assistant_response
-            
+
+        except asyncio.TimeoutError:
+            print(f"⏱️ Assistant response timed out for session {session_id}")
+            return "I'm sorry, that took too long. Please try again."
         except Exception as e:
             print(f"Error getting assistant response: {e}")
             return "I'm sorry, I encountered an error. Please try again."
 
-    def get_session_history(self, session_id: str) -> List[dict]:
+    async def stream_assistant_response(self, session_id: str, prompt: str, code: Optional[str] = None):
+        """
+        Stream a response for a specific session, yielding text as it is generated.
+
+        The assembled reply is added to the history once the stream has
+        finished. Errors are raised to the caller, and a stream that is
+        abandoned midway leaves the session as it was.
+        """
+        history = await self._load_history(session_id)
+        turn = self.context.turn(history, prompt, code)
+
+        parts = []
+        async for token in stream(self.client, self.context.build(history, turn)):
+            parts.append(token)
+            yield token
+
+        if await self.store.exists(session_id):
+            await self.store.append(session_id, *turn, {"role": "assistant", "content": "".join(parts).strip()})
+
+    async def _load_history(self, session_id: str) -> List[dict]:
+        """
+        The session's history, created if it doesn't exist. Turns that fell
+        out of the context window are folded into the session's summary once
+        enough of them have accumulated. The summary only replaces the turns
+        it was made from, messages another request added meanwhile are kept.
+        """
+        history = await self.store.get(session_id)
+        if history is None:
+            # Create session with default system prompt if it doesn't exist
+            await self.create_session(session_id)
+            return []
+        if not self.context.needs_compaction(history):
+            return history
+        try:
+            compacted = await self.context.compact(self.client, history)
+        except Exception as e:
+            # The window still limits what is sent, summarize on a later request
+            print(f"⚠️ Failed to summarize assistant session {session_id}: {e}")
+            return history
+        await self.store.replace(session_id, history, compacted)
+        return compacted
+
+    async def get_session_history(self, session_id: str) -> List[dict]:
         """
         Get the conversation history for a specific session.
         """
-        return self.sessions.get(session_id, [])
+        return await self.store.get(session_id) or []
 
-    def list_sessions(self) -> List[str]:
+    async def list_sessions(self) -> List[str]:
         """
         Get a list of all active session IDs.
         """
-        return list(self.sessions.keys())
+        return await self.store.list_ids()
 
 
 class SessionAssistantManager:
@@ -160,3 +183,9 @@ class SessionAssistantManager:
         Get the session assistant instance.
         """
         return self.assistant
+
+    async def close(self):
+        """
+        Persist buffered session writes, called on shutdown.
+        """
+        await self.assistant.store.close()
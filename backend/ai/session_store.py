@@ -0,0 +1,414 @@
+"""
+Storage of assistant conversations.
+
+ASSISTANT_SESSION_BACKEND selects where sessions live:
+
+- "memory" (default) keeps them in a bounded in-process LRU, which only works
+  with a single worker process.
+- "mongo" keeps them in the "assistant_sessions" collection so every worker
+  and replica sees the same conversations. Writes are buffered and flushed in
+  the background, and concurrent writers are reconciled with a version number.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+
+from backend.ai.context_window import CODE_NAME, FULL_CODE_PREFIX, group_turns
+from backend.mongodb.async_db import get_async_db_connection
+
+load_dotenv()
+
+ASSISTANT_SESSION_BACKEND = os.getenv("ASSISTANT_SESSION_BACKEND", "memory")
+
+# Sessions not used for this long are dropped
+ASSISTANT_SESSION_TTL = int(os.getenv("ASSISTANT_SESSION_TTL") or 6 * 3600)
+# Largest conversation kept per session, older messages are dropped first
+ASSISTANT_SESSION_MAX_BYTES = int(os.getenv("ASSISTANT_SESSION_MAX_BYTES") or 512 * 1024)
+# Memory budget for all sessions together, least recently used sessions are evicted
+ASSISTANT_SESSIONS_MAX_BYTES = int(os.getenv("ASSISTANT_SESSIONS_MAX_BYTES") or 256 * 1024 * 1024)
+ASSISTANT_MAX_SESSIONS = int(os.getenv("ASSISTANT_MAX_SESSIONS") or 10_000)
+# How long buffered writes wait before they are flushed to MongoDB
+ASSISTANT_SESSION_FLUSH_INTERVAL = float(os.getenv("ASSISTANT_SESSION_FLUSH_INTERVAL") or 0.25)
+# Attempts to write a session before giving up on a run of version conflicts
+ASSISTANT_SESSION_MAX_RETRIES = 5
+
+
+def message_bytes(message: dict) -> int:
+    """Approximate memory held by one chat message"""
+    return len(json.dumps(message, ensure_ascii=False).encode("utf-8"))
+
+
+def trim_to_bytes(messages: List[dict], max_bytes: int) -> List[dict]:
+    """
+    Drop the oldest turns until the conversation fits. System messages are
+    kept, they carry the session's instructions, and so are the latest full
+    copy of the student's code and the code diffs that apply to it.
+    """
+    total = sum(message_bytes(message) for message in messages)
+    if total <= max_bytes:
+        return list(messages)
+    code = [m for m in messages if m.get("name") == CODE_NAME]
+    full_copies = [i for i, m in enumerate(code) if m["content"].startswith(FULL_CODE_PREFIX)]
+    current_code = {id(m) for m in code[full_copies[-1]:]} if full_copies else set()
+    dropped = set()
+    for turn in group_turns(messages):
+        if total <= max_bytes:
+            break
+        for message in turn:
+            if id(message) not in current_code:
+                dropped.add(id(message))
+                total -= message_bytes(message)
+    return [message for message in messages if id(message) not in dropped]
+
+
+class SessionStore:
+    """
+    Interface of the session backends. A session is an ordered list of chat
+    messages; every method is a coroutine so backends can do I/O.
+    """
+
+    async def exists(self, session_id: str) -> bool:
+        return await self.get(session_id) is not None
+
+    async def get(self, session_id: str) -> Optional[List[dict]]:
+        """The session's messages, or None if it does not exist"""
+        raise NotImplementedError
+
+    async def set(self, session_id: str, messages: List[dict]):
+        """Replace the session's messages, creating the session if needed"""
+        raise NotImplementedError
+
+    async def create(self, session_id: str, messages: List[dict] = ()):
+        """Create the session with these messages unless it already exists"""
+        raise NotImplementedError
+
+    async def replace(self, session_id: str, read: List[dict], messages: List[dict]):
+        """
+        Replace the messages read from the session with new ones, keeping any
+        appended since. Nothing changes if the session no longer starts with
+        the messages that were read.
+        """
+        raise NotImplementedError
+
+    async def append(self, session_id: str, *messages: dict):
+        """Add messages to the end of a session, creating it if needed"""
+        raise NotImplementedError
+
+    async def delete(self, session_id: str):
+        raise NotImplementedError
+
+    async def list_ids(self) -> List[str]:
+        raise NotImplementedError
+
+    async def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    async def close(self):
+        """Persist anything still buffered, called on shutdown"""
+
+
+def create_session_store(backend: str = ASSISTANT_SESSION_BACKEND) -> SessionStore:
+    if backend == "mongo":
+        return MongoSessionStore()
+    if backend == "memory":
+        return MemorySessionStore()
+    raise ValueError(f"Unknown assistant session backend {backend!r}")
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Bounded in-process store of assistant conversations.
+
+    Sessions are kept in least-recently-used order. A session idle for longer
+    than the TTL, or the least recently used one when the store holds more
+    sessions or bytes than allowed, is evicted. Each conversation is capped
+    at max_session_bytes by dropping its oldest messages.
+    """
+
+    def __init__(
+        self,
+        ttl: float = ASSISTANT_SESSION_TTL,
+        max_session_bytes: int = ASSISTANT_SESSION_MAX_BYTES,
+        max_total_bytes: int = ASSISTANT_SESSIONS_MAX_BYTES,
+        max_sessions: int = ASSISTANT_MAX_SESSIONS,
+    ):
+        self.ttl = ttl
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.max_sessions = max_sessions
+        # session_id -> (messages, bytes, last used), least recently used first
+        self.sessions: OrderedDict[str, tuple[List[dict], int, float]] = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    async def exists(self, session_id: str) -> bool:
+        with self.lock:
+            self._expire()
+            return session_id in self.sessions
+
+    async def get(self, session_id: str) -> Optional[List[dict]]:
+        with self.lock:
+            self._expire()
+            if session_id not in self.sessions:
+                return None
+            messages, size, _ = self.sessions[session_id]
+            self.sessions[session_id] = (messages, size, time.monotonic())
+            self.sessions.move_to_end(session_id)
+            return list(messages)
+
+    async def set(self, session_id: str, messages: List[dict]):
+        with self.lock:
+            self._put(session_id, list(messages))
+
+    async def create(self, session_id: str, messages: List[dict] = ()):
+        with self.lock:
+            self._expire()
+            if session_id not in self.sessions:
+                self._put(session_id, list(messages))
+
+    async def replace(self, session_id: str, read: List[dict], messages: List[dict]):
+        with self.lock:
+            if session_id not in self.sessions:
+                return
+            current = self.sessions[session_id][0]
+            if current[:len(read)] == read:
+                self._put(session_id, list(messages) + current[len(read):])
+
+    async def append(self, session_id: str, *messages: dict):
+        with self.lock:
+            current = self.sessions[session_id][0] if session_id in self.sessions else []
+            self._put(session_id, current + list(messages))
+
+    async def delete(self, session_id: str):
+        with self.lock:
+            self._drop(session_id)
+
+    async def list_ids(self) -> List[str]:
+        with self.lock:
+            self._expire()
+            return list(self.sessions.keys())
+
+    async def stats(self) -> Dict[str, int]:
+        """Gauges of the sessions and bytes currently held"""
+        with self.lock:
+            self._expire()
+            return {
+                "sessions": len(self.sessions),
+                "bytes": self.total_bytes,
+                "evictions": self.evictions,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_total_bytes,
+            }
+
+    def _put(self, session_id: str, messages: List[dict]):
+        self._drop(session_id)
+        messages = trim_to_bytes(messages, self.max_session_bytes)
+        size = sum(message_bytes(message) for message in messages)
+        self.sessions[session_id] = (messages, size, time.monotonic())
+        self.total_bytes += size
+        self._expire()
+        # Evict least recently used sessions, never the one just written
+        while len(self.sessions) > 1 and (len(self.sessions) > self.max_sessions or self.total_bytes > self.max_total_bytes):
+            self._evict(next(iter(self.sessions)))
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        while self.sessions:
+            session_id, (_, _, last_used) = next(iter(self.sessions.items()))
+            if last_used > cutoff:
+                break
+            self._evict(session_id)
+
+    def _evict(self, session_id: str):
+        self._drop(session_id)
+        self.evictions += 1
+
+    def _drop(self, session_id: str):
+        if session_id in self.sessions:
+            self.total_bytes -= self.sessions.pop(session_id)[1]
+
+
+class MongoSessionStore(SessionStore):
+    """
+    Sessions in the "assistant_sessions" collection, shared by all workers.
+
+    Each document holds the messages and a version that is incremented on
+    every write. Changes go to a local buffer first and a background task
+    flushes it every flush_interval. A flush reads the stored session,
+    applies the buffered changes in order and writes back only if the version
+    is still the one it read; on a conflict it reads again and reapplies
+    them, so messages appended by another worker in the meantime are kept.
+    A replace() only applies while the stored session still starts with the
+    messages it replaces, and create() leaves an existing session alone.
+    Reads merge the stored session with this worker's buffered changes.
+
+    A deleted session is replaced by a tombstone rather than removed, so a
+    write that was already on its way fails the version check instead of
+    bringing the session back. Only set() and create() recreate a deleted session.
+
+    Conversations are capped at max_session_bytes and idle sessions are
+    removed by a TTL index.
+    """
+
+    def __init__(
+        self,
+        db=None,
+        max_session_bytes: int = ASSISTANT_SESSION_MAX_BYTES,
+        flush_interval: float = ASSISTANT_SESSION_FLUSH_INTERVAL,
+    ):
+        self.db = db if db is not None else get_async_db_connection("students")
+        self.collection = self.db["assistant_sessions"]
+        self.max_session_bytes = max_session_bytes
+        self.flush_interval = flush_interval
+        # session_id -> buffered changes in order: ("set", messages), ("create", messages),
+        # ("replace", read, messages) or ("append", messages)
+        self.pending: Dict[str, List[tuple]] = {}
+        # Sessions deleted by this worker, whose writes still in flight are dropped
+        self.deleted: set = set()
+        self.flushes = 0
+        self.conflicts = 0
+        self._flusher = None
+
+    async def get(self, session_id: str) -> Optional[List[dict]]:
+        doc = await self.collection.find_one({"_id": session_id}, {"messages": 1, "deleted": 1})
+        return self._apply(doc, self.pending.get(session_id, []))
+
+    async def set(self, session_id: str, messages: List[dict]):
+        self.deleted.discard(session_id)
+        # Replaces whatever was buffered before
+        self.pending[session_id] = [("set", list(messages))]
+        self._schedule_flush()
+
+    async def create(self, session_id: str, messages: List[dict] = ()):
+        self.deleted.discard(session_id)
+        self._buffer(session_id, ("create", list(messages)))
+
+    async def replace(self, session_id: str, read: List[dict], messages: List[dict]):
+        self._buffer(session_id, ("replace", list(read), list(messages)))
+
+    async def append(self, session_id: str, *messages: dict):
+        self._buffer(session_id, ("append", list(messages)))
+
+    async def delete(self, session_id: str):
+        self.pending.pop(session_id, None)
+        self.deleted.add(session_id)
+        await self.collection.update_one(
+            {"_id": session_id},
+            {
+                "$set": {"deleted": True, "messages": [], "bytes": 0, "updated_at": datetime.utcnow()},
+                "$inc": {"version": 1},
+            },
+            upsert=True
+        )
+
+    async def list_ids(self) -> List[str]:
+        docs = await self.collection.find({"deleted": {"$ne": True}}, {"_id": 1}).to_list()
+        return list(dict.fromkeys([doc["_id"] for doc in docs] + list(self.pending)))
+
+    async def stats(self) -> Dict[str, int]:
+        cursor = await self.collection.aggregate([
+            {"$match": {"deleted": {"$ne": True}}},
+            {"$group": {"_id": None, "sessions": {"$sum": 1}, "bytes": {"$sum": "$bytes"}}}
+        ])
+        totals = (await cursor.to_list() or [{}])[0]
+        return {
+            "sessions": totals.get("sessions", 0),
+            "bytes": totals.get("bytes") or 0,
+            "pending_writes": len(self.pending),
+            "flushes": self.flushes,
+            "conflicts": self.conflicts,
+        }
+
+    async def flush(self):
+        """Write all buffered changes to MongoDB"""
+        for session_id in list(self.pending):
+            changes = self.pending.pop(session_id, None)
+            if changes is None:
+                continue
+            try:
+                await self._write(session_id, changes)
+            except Exception as e:
+                print(f"⚠️ Failed to store assistant session {session_id}: {e}")
+                # Retry on the next flush, before anything buffered since
+                self.pending[session_id] = changes + self.pending.get(session_id, [])
+        self.flushes += 1
+
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+    def _buffer(self, session_id: str, change: tuple):
+        self.pending.setdefault(session_id, []).append(change)
+        self._schedule_flush()
+
+    def _apply(self, doc: Optional[dict], changes: List[tuple]) -> Optional[List[dict]]:
+        """The session after the buffered changes, or None if it does not exist"""
+        tombstone = doc is not None and doc.get("deleted")
+        messages = list(doc["messages"]) if doc is not None and not tombstone else None
+        for change in changes:
+            kind = change[0]
+            if kind == "set" or (kind == "create" and messages is None):
+                messages = list(change[1])
+            elif kind == "replace":
+                read, replacement = change[1], change[2]
+                if messages is not None and messages[:len(read)] == read:
+                    messages = replacement + messages[len(read):]
+            elif kind == "append" and (messages is not None or not tombstone):
+                # Deleted by another worker, appends do not bring it back
+                messages = (messages or []) + change[1]
+        if messages is None:
+            return None
+        return trim_to_bytes(messages, self.max_session_bytes)
+
+    async def _write(self, session_id: str, changes: List[tuple]):
+        for _ in range(ASSISTANT_SESSION_MAX_RETRIES):
+            if session_id in self.deleted:
+                return
+            doc = await self.collection.find_one({"_id": session_id}, {"messages": 1, "version": 1, "deleted": 1})
+            messages = self._apply(doc, changes)
+            if messages is None:
+                return
+            fields = {
+                "messages": messages,
+                "bytes": sum(message_bytes(message) for message in messages),
+                "updated_at": datetime.utcnow(),
+            }
+            if doc is None:
+                try:
+                    await self.collection.insert_one({"_id": session_id, "version": 1, **fields})
+                    return
+                except DuplicateKeyError:
+                    pass
+            else:
+                result = await self.collection.update_one(
+                    {"_id": session_id, "version": doc["version"]},
+                    {"$set": fields, "$unset": {"deleted": ""}, "$inc": {"version": 1}}
+                )
+                if result.modified_count:
+                    return
+            # Another worker wrote the session after it was read, read it again
+            self.conflicts += 1
+        raise RuntimeError(f"session kept changing during {ASSISTANT_SESSION_MAX_RETRIES} attempts")
+
+    def _schedule_flush(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        # Writes buffered while a flush was running are picked up by the next round
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if not self.pending:
+                return
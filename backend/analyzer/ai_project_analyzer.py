@@ -1,38 +1,77 @@
 from backend.mongodb.MongoDB import get_db_connection
+from backend.mongodb.async_db import get_async_db_connection
+from backend.mongodb.bulk_writer import BulkWriter
 from backend.ai.assistant import Assistant
 from datetime import datetime
-from backend.ai.ai_analyzer import AIAnalyzer
+from backend.ai.ai_analyzer import AI_ERROR_RESPONSE, AI_TIMEOUT_RESPONSE, AIAnalyzer
+from backend.analyzer.code_chunker import ANALYSIS_CHUNK_TOKENS, chunk_files
+from backend.ai.context_window import count_text_tokens
+from backend.services.blob_service import BlobService
+import asyncio
 import json
+import os
 import re
 
+# Bump when a prompt template changes, so cached responses to the old one are not reused
+ANALYSIS_PROMPT_VERSION = "analysis-v1"
+CHUNK_ANALYSIS_PROMPT_VERSION = "chunk-analysis-v1"
+REDUCE_ANALYSIS_PROMPT_VERSION = "reduce-analysis-v1"
+SUGGESTION_PROMPT_VERSION = "suggestions-v1"
+# Chunks of one student's code analysed at the same time
+ANALYSIS_CONCURRENCY = int(os.getenv("ANALYSIS_CONCURRENCY") or 4)
+# Comma-separated languages of the files sent for analysis (e.g. "Python,Java"), all files when empty
+ANALYSIS_LANGUAGES = [language.strip() for language in os.getenv("ANALYSIS_LANGUAGES", "").split(",") if language.strip()] or None
+
+ANALYSIS_ASPECTS = (
+    "1.  **Overall Code Quality**: Give a general impression of the code quality (e.g., clean, messy, well-structured, etc.).\n"
+    "2.  **Naming Conventions**: Comment on the use of variable, function, and class names. Are they descriptive and do they follow Python conventions (e.g., snake_case for functions/variables, PascalCase for classes)?\n"
+    "3.  **Code Structure and Readability**: Assess the code's organization. Is it easy to read and understand? Is there good use of functions and classes? Are there overly complex functions that could be broken down?\n"
+    "4.  **Potential Bugs or Semantic Issues**: Identify any potential bugs, logical errors, or anti-patterns in the code.\n"
+    "5.  **Strengths**: Point out what the student is doing well.\n"
+    "6.  **Areas for Improvement**: Provide clear, constructive, and actionable suggestions for how the student can improve their code. Frame this as helpful advice, not harsh criticism.\n\n"
+)
+
 class AIProjectAnalyzer:
     def __init__(self, student_id: str):
         self.student_id = student_id
+        # The blob store and bulk writer are sync and run in worker threads
         self.db = get_db_connection("students")
-        self.projects_collection = self.db[student_id]
-        self.analysis_collection = self.db["code_analyses"]
-        self.suggestions_collection = self.db["suggested_tasks"]
+        self.async_db = get_async_db_connection("students")
+        self.projects_collection = self.async_db["projects"]
+        self.analysis_collection = self.async_db["code_analyses"]
+        self.suggestions_collection = self.async_db["suggested_tasks"]
+        self.blob_service = BlobService(self.db)
         self.ai_analyzer = AIAnalyzer.get_instance()
+        # Limits the completions one analysis runs at the same time
+        self.llm_slots = asyncio.Semaphore(ANALYSIS_CONCURRENCY)
 
-    def analyze_and_store_student_projects(self) -> str:
+    async def analyze_and_store_student_projects(self) -> str:
         """
         Analyzes a student's code, stores the analysis in the database,
         and returns the analysis.
+
+        Code that does not fit in one prompt is split into chunks by project
+        and module. The chunks are analysed in parallel and the partial
+        analyses are then merged into one report.
         """
-        all_code = self._get_all_student_code()
-        if not all_code:
+        files = await self._get_student_files()
+        chunks = chunk_files(files, ANALYSIS_CHUNK_TOKENS)
+        if not chunks:
             return "No Python code found for this student to analyze."
 
-        prompt = self._create_analysis_prompt(all_code)
-        
-        analysis = self.ai_analyzer.get_ai_response(prompt, add_promt_to_history=False, add_response_to_history=False)
+        if len(chunks) == 1:
+            analysis = await self._ask(self._create_analysis_prompt(chunks[0]), ANALYSIS_PROMPT_VERSION)
+        else:
+            print(f"🧩 Analysing {len(chunks)} chunks of code for student {self.student_id}")
+            analysis = await self._reduce_analyses(await self._analyze_chunks(chunks))
         
         # Store the analysis, replacing any old one for this student
-        self.analysis_collection.update_one(
+        await self.analysis_collection.update_one(
             {"student_id": self.student_id},
             {
                 "$set": {
                     "analysis": analysis,
+                    "chunk_count": len(chunks),
                     "created_at": datetime.utcnow()
                 }
             },
@@ -40,13 +79,61 @@ class AIProjectAnalyzer:
         )
         return analysis
 
-    def create_project_suggestions(self) -> list[str]:
+    async def _ask(self, prompt: str, cache_version: str) -> str:
+        async with self.llm_slots:
+            return await self.ai_analyzer.get_ai_response(
+                prompt, add_promt_to_history=False, add_response_to_history=False, cache_version=cache_version
+            )
+
+    async def _analyze_chunks(self, chunks: list[str]) -> list[str]:
+        """
+        Analyses every chunk, at most ANALYSIS_CONCURRENCY at a time. Chunks
+        whose completion failed are left out.
+        """
+        partials = await asyncio.gather(*(
+            self._ask(self._create_chunk_analysis_prompt(chunk, i, len(chunks)), CHUNK_ANALYSIS_PROMPT_VERSION)
+            for i, chunk in enumerate(chunks, start=1)
+        ))
+        analyses = [partial for partial in partials if partial not in (AI_ERROR_RESPONSE, AI_TIMEOUT_RESPONSE)]
+        if len(analyses) < len(partials):
+            print(f"⚠️ {len(partials) - len(analyses)} of {len(partials)} code chunks could not be analysed")
+        return analyses
+
+    async def _reduce_analyses(self, analyses: list[str]) -> str:
+        """
+        Merges partial analyses into one report. When they do not fit in one
+        prompt together they are merged in groups first.
+        """
+        if not analyses:
+            return AI_ERROR_RESPONSE
+        while len(analyses) > 1:
+            groups, group, size = [], [], 0
+            for analysis in analyses:
+                tokens = count_text_tokens(analysis)
+                if group and size + tokens > ANALYSIS_CHUNK_TOKENS:
+                    groups.append(group)
+                    group, size = [], 0
+                group.append(analysis)
+                size += tokens
+            groups.append(group)
+            if len(groups) == len(analyses):
+                # Every analysis is too large to be merged with another, merge them pairwise
+                groups = [analyses[i:i + 2] for i in range(0, len(analyses), 2)]
+            analyses = await asyncio.gather(*(self._merge_analyses(group) for group in groups))
+        return analyses[0]
+
+    async def _merge_analyses(self, analyses: list[str]) -> str:
+        if len(analyses) == 1:
+            return analyses[0]
+        return await self._ask(self._create_reduce_prompt(analyses), REDUCE_ANALYSIS_PROMPT_VERSION)
+
+    async def create_project_suggestions(self) -> list[str]:
         """
         Generates comprehensive project suggestions with detailed explanations,
         starter code, and examples based on the student's analysis.
         """
 
-        latest_analysis_doc = self.analysis_collection.find_one(
+        latest_analysis_doc = await self.analysis_collection.find_one(
             {"student_id": self.student_id}
         )
         if not latest_analysis_doc:
@@ -55,24 +142,32 @@ class AIProjectAnalyzer:
         code_analysis = latest_analysis_doc["analysis"]
 
 
-        past_suggestions_docs = self.suggestions_collection.find(
+        past_suggestions_docs = await self.suggestions_collection.find(
             {"student_id": self.student_id}
-        )
+        ).to_list()
         past_suggestions = [doc["suggestion"] for doc in past_suggestions_docs]
 
 
         prompt = self._create_comprehensive_suggestion_prompt(code_analysis, past_suggestions)
-        suggestions_response = self.ai_analyzer.get_ai_response(prompt = prompt, add_promt_to_history=False, add_response_to_history=False)
+        suggestions_response = await self.ai_analyzer.get_ai_response(
+            prompt=prompt, add_promt_to_history=False, add_response_to_history=False, cache_version=SUGGESTION_PROMPT_VERSION
+        )
         
 
         parsed_suggestions = self._parse_comprehensive_suggestions(suggestions_response)
         
-        for suggestion in parsed_suggestions:
-            self.suggestions_collection.insert_one({
-                "student_id": self.student_id,
-                "suggestion": suggestion,
-                "created_at": datetime.utcnow()
-            })
+        created_at = datetime.utcnow()
+        await asyncio.to_thread(
+            BulkWriter(self.db["suggested_tasks"]).insert_many,
+            [
+                {
+                    "student_id": self.student_id,
+                    "suggestion": suggestion,
+                    "created_at": created_at
+                }
+                for suggestion in parsed_suggestions
+            ]
+        )
 
         return parsed_suggestions
 
@@ -187,18 +282,17 @@ Remember: Base tasks on the student's current Python level and identified improv
 
         return prompt
 
-    def _get_all_student_code(self) -> str:
-        """Fetches and concatenates all Python code for the student."""
-        projects = list(self.projects_collection.find({}))
-        all_code = ""
+    async def _get_student_files(self) -> list[tuple[str, str, str]]:
+        """Fetches the student's files as (project name, path, content), limited to ANALYSIS_LANGUAGES if set."""
+        projects = await self.projects_collection.find({"student_id": self.student_id}).to_list()
+        student_files = []
         for project in projects:
             project_name = project.get("name", "Unknown Project")
-            if "files" in project and isinstance(project["files"], dict):
-                for file_path, file_content in project["files"].items():
-                    if file_content:
-                        all_code += f"# FILE: {project_name}/{file_path}\n"
-                        all_code += file_content + "\n\n"
-        return all_code.strip()
+            files = await asyncio.to_thread(self.blob_service.load_files, project, languages=ANALYSIS_LANGUAGES)
+            for file_path, file_content in files.items():
+                if file_content:
+                    student_files.append((project_name, file_path, file_content))
+        return student_files
 
     def _create_analysis_prompt(self, code: str) -> str:
         """Creates a prompt for the AI to analyze the student's code."""
@@ -207,12 +301,7 @@ Remember: Base tasks on the student's current Python level and identified improv
             "Your task is to analyze the following Python code written by a student. "
             "The code is concatenated from multiple files and projects.\n\n"
             "Please provide a comprehensive analysis of the student's coding style, focusing on the following aspects:\n"
-            "1.  **Overall Code Quality**: Give a general impression of the code quality (e.g., clean, messy, well-structured, etc.).\n"
-            "2.  **Naming Conventions**: Comment on the use of variable, function, and class names. Are they descriptive and do they follow Python conventions (e.g., snake_case for functions/variables, PascalCase for classes)?\n"
-            "3.  **Code Structure and Readability**: Assess the code's organization. Is it easy to read and understand? Is there good use of functions and classes? Are there overly complex functions that could be broken down?\n"
-            "4.  **Potential Bugs or Semantic Issues**: Identify any potential bugs, logical errors, or anti-patterns in the code.\n"
-            "5.  **Strengths**: Point out what the student is doing well.\n"
-            "6.  **Areas for Improvement**: Provide clear, constructive, and actionable suggestions for how the student can improve their code. Frame this as helpful advice, not harsh criticism.\n\n"
+            f"{ANALYSIS_ASPECTS}"
             "Here is the student's code:\n\n"
             "```python\n"
             f"{code}\n"
@@ -222,32 +311,60 @@ Remember: Base tasks on the student's current Python level and identified improv
         )
         return prompt 
 
-    def get_project_suggestions(self) -> list[str]:
+    def _create_chunk_analysis_prompt(self, code: str, part: int, parts: int) -> str:
+        """Creates a prompt for analysing one chunk of a large codebase."""
+        return (
+            "You are an expert code reviewer and a helpful teaching assistant. "
+            f"The following Python code is part {part} of {parts} of the code written by a student, "
+            "grouped by project and module. Another reviewer will combine your notes with the notes on the other parts.\n\n"
+            "Write concise notes on this part, covering the following aspects:\n"
+            f"{ANALYSIS_ASPECTS}"
+            "Refer to files by name when pointing out issues.\n\n"
+            "```python\n"
+            f"{code}\n"
+            "```"
+        )
+
+    def _create_reduce_prompt(self, analyses: list[str]) -> str:
+        """Creates a prompt for merging the analyses of separate chunks into one report."""
+        notes = "\n\n".join(f"### Notes on part {i}\n{analysis}" for i, analysis in enumerate(analyses, start=1))
+        return (
+            "You are an expert code reviewer and a helpful teaching assistant. "
+            "Several reviewers each analysed one part of a student's Python code. "
+            "Combine their notes into one comprehensive analysis of the student's coding style, "
+            "merging repeated observations and keeping the most important concrete examples. Cover the following aspects:\n"
+            f"{ANALYSIS_ASPECTS}"
+            f"{notes}\n\n"
+            "Please structure your response in clear sections. "
+            "Please do not start the response with a introduction or end your reponse with an outro, because the user will be reading the response directly and have no possible way to answer you."
+        )
+
+    async def get_project_suggestions(self) -> list[str]:
         """
         Retrieves previously generated project suggestions.
         """
-        suggestions = list(self.suggestions_collection.find({"student_id": self.student_id}))
+        suggestions = await self.suggestions_collection.find({"student_id": self.student_id}).to_list()
         return [suggestion["suggestion"] for suggestion in suggestions]
 
-    def delete_project_suggestions(self, suggestion_id: str) -> str:
+    async def delete_project_suggestions(self, suggestion_id: str) -> str:
         """
         Deletes a previously generated project suggestion.
         """
-        self.suggestions_collection.delete_one({"_id": suggestion_id})
+        await self.suggestions_collection.delete_one({"_id": suggestion_id})
         return "Suggestion deleted successfully"
 
-    def delete_all_project_suggestions(self) -> str:
+    async def delete_all_project_suggestions(self) -> str:
         """
         Deletes all previously generated project suggestions.
         """
-        self.suggestions_collection.delete_many({"student_id": self.student_id})
+        await self.suggestions_collection.delete_many({"student_id": self.student_id})
         return "All suggestions deleted successfully"
     
-    def get_stored_analysis(self) -> dict | None:
+    async def get_stored_analysis(self) -> dict | None:
         """
         Retrieves the stored analysis for this student.
         """
-        analysis_doc = self.analysis_collection.find_one({"student_id": self.student_id})
+        analysis_doc = await self.analysis_collection.find_one({"student_id": self.student_id})
         if analysis_doc:
             return {
                 "analysis": analysis_doc["analysis"],
@@ -0,0 +1,80 @@
+import os
+from itertools import groupby
+from typing import List, Tuple
+
+from dotenv import load_dotenv
+
+from backend.ai.context_window import count_text_tokens
+
+load_dotenv()
+
+# Largest amount of code sent in one analysis prompt
+ANALYSIS_CHUNK_TOKENS = int(os.getenv("ANALYSIS_CHUNK_TOKENS") or 12_000)
+
+# (project name, file path, content)
+StudentFile = Tuple[str, str, str]
+
+
+def format_file(project: str, path: str, content: str, part: str = "") -> str:
+    return f"# FILE: {project}/{path}{part}\n{content}\n\n"
+
+
+def module_of(path: str) -> str:
+    """The directory a file lives in, files of one module are kept together"""
+    return path.rsplit("/", 1)[0] if "/" in path else ""
+
+
+def split_file(project: str, path: str, content: str, max_tokens: int) -> List[str]:
+    """Split a file too large for one chunk into parts at line boundaries"""
+    parts, lines, size = [], [], 0
+    for line in content.splitlines(keepends=True):
+        tokens = count_text_tokens(line)
+        if lines and size + tokens > max_tokens:
+            parts.append("".join(lines))
+            lines, size = [], 0
+        lines.append(line)
+        size += tokens
+    parts.append("".join(lines))
+    return [
+        format_file(project, path, part, f" (part {i}/{len(parts)})")
+        for i, part in enumerate(parts, start=1)
+    ]
+
+
+def chunk_files(files: List[StudentFile], max_tokens: int = ANALYSIS_CHUNK_TOKENS) -> List[str]:
+    """
+    Pack a student's files into chunks of at most max_tokens.
+
+    Files are ordered by project and module, and a module is only split
+    across chunks when it does not fit in one on its own. A single file
+    larger than a chunk is split into parts.
+    """
+    chunks, current, size = [], [], 0
+
+    def add(text: str, tokens: int):
+        nonlocal current, size
+        if current and size + tokens > max_tokens:
+            chunks.append("".join(current).strip())
+            current, size = [], 0
+        current.append(text)
+        size += tokens
+
+    ordered = sorted(files, key=lambda file: (file[0], module_of(file[1]), file[1]))
+    for _, module_files in groupby(ordered, key=lambda file: (file[0], module_of(file[1]))):
+        module_files = [file for file in module_files if file[2]]
+        texts = [format_file(*file) for file in module_files]
+        tokens = [count_text_tokens(text) for text in texts]
+        # Start a fresh chunk rather than split a module that fits in one
+        if current and size + sum(tokens) > max_tokens and sum(tokens) <= max_tokens:
+            chunks.append("".join(current).strip())
+            current, size = [], 0
+        for file, text, count in zip(module_files, texts, tokens):
+            if count <= max_tokens:
+                add(text, count)
+                continue
+            # Leave room for the header of each part
+            for part in split_file(*file, max_tokens - 50):
+                add(part, count_text_tokens(part))
+    if current:
+        chunks.append("".join(current).strip())
+    return chunks
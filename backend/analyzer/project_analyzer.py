@@ -4,6 +4,8 @@ import gitlab
 import os
 from dotenv import load_dotenv
 from backend.mongodb.MongoDB import get_collection, get_db_connection
+from backend.mongodb.project_migration import PROJECTS_COLLECTION
+from backend.gitlab.request_scheduler import get_scheduled_session
 
 load_dotenv()
 
@@ -12,7 +14,7 @@ GITLAB_TOKEN = os.getenv("GITLAB_TOKEN")
 
 class ProjectAnalyzer:
     def __init__(self):
-        self.gl = gitlab.Gitlab(GITLAB_URL, private_token=GITLAB_TOKEN)
+        self.gl = gitlab.Gitlab(GITLAB_URL, private_token=GITLAB_TOKEN, session=get_scheduled_session())
         self.code_analyzer = CodeAnalyzer()
         self.db = get_db_connection("students")
         
@@ -26,8 +28,8 @@ class ProjectAnalyzer:
         Returns:
             dict: Analysis results
         """
-        collection = get_collection(student_id, self.db)
-        projects = list(collection.find({}))
+        collection = get_collection(PROJECTS_COLLECTION, self.db)
+        projects = list(collection.find({"student_id": student_id}))
         
         if not projects:
             return {"error": f"No projects found for student {student_id}"}
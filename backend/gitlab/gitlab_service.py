@@ -5,6 +5,16 @@ import requests
 from dotenv import load_dotenv
 from datetime import datetime
 from ..mongodb.MongoDB import get_collection, get_db_connection
+from ..mongodb.bulk_writer import BulkWriter
+from ..mongodb.project_migration import PROJECTS_COLLECTION, migrate_student
+from ..services.blob_service import BlobService, build_manifest, project_file_shas
+from .http_cache import GITLAB_HTTP_CACHE_ENABLED, GitlabHttpCache, get_cached_session
+from .sync_engine import (
+    commit_count_from_headers,
+    commit_count_from_statistics,
+    fetch_user_projects,
+    is_text_file,
+)
 from pymongo.collection import Collection
 
 
@@ -15,17 +25,42 @@ GITLAB_TOKEN = os.getenv("GITLAB_TOKEN")
 
 class GitlabService:
     def __init__(self):
+        # All outbound GitLab calls share the rate-limit aware scheduler and the ETag cache
+        self.session = get_cached_session()
+        self.http_cache = GitlabHttpCache.get_instance() if GITLAB_HTTP_CACHE_ENABLED else None
         # Initialize with default token if available
         if GITLAB_TOKEN:
-            self.gl = gitlab.Gitlab(GITLAB_URL, private_token=GITLAB_TOKEN)
+            self.gl = gitlab.Gitlab(GITLAB_URL, private_token=GITLAB_TOKEN, session=self.session)
         else:
             self.gl = None
+        self.blob_service = BlobService()
     
+    def _iter_pages(self, url: str, headers: dict, params: dict | None = None):
+        """
+        Lazily yield all items of a paginated GitLab list endpoint.
+
+        Follows the Link rel="next" header (keyset pagination) or X-Next-Page
+        (offset pagination). Raises requests.HTTPError if a page fails.
+        """
+        params = {"per_page": 100, **(params or {})}
+        while url:
+            response = self.session.get(url, headers=headers, params=params)
+            response.raise_for_status()
+            yield from response.json()
+
+            next_link = response.links.get("next", {}).get("url")
+            next_page = response.headers.get("X-Next-Page")
+            if next_link:
+                url, params = next_link, None
+            elif next_page:
+                params = {**(params or {}), "page": next_page}
+            else:
+                url = None
+
     def get_user_projects_with_user_token(self, gitlab_username: str, user_token: str):
         """
         Get user projects using direct HTTP requests (bypassing python-gitlab library)
         """
-        import requests
         
         print(f"🔗 Using GitLab URL: {GITLAB_URL}")
         print(f"👤 Fetching projects for user: {gitlab_username}")
@@ -36,7 +71,7 @@ class GitlabService:
         try:
             # Test authentication first
             print("🔍 Testing authentication with direct API call...")
-            user_response = requests.get(f"{GITLAB_URL}/api/v4/user", headers=headers)
+            user_response = self.session.get(f"{GITLAB_URL}/api/v4/user", headers=headers)
             
             if user_response.status_code != 200:
                 print(f"❌ Authentication failed: {user_response.status_code} - {user_response.text}")
@@ -45,30 +80,24 @@ class GitlabService:
             user_data = user_response.json()
             print(f"✅ Authentication successful! User: {user_data.get('username')}")
             
-            # Fetch user's projects
+            # Fetch user's projects, following every page
             print("📁 Fetching user projects...")
-            projects_response = requests.get(
-                f"{GITLAB_URL}/api/v4/projects",
-                headers=headers,
-                params={"owned": "true", "membership": "true", "per_page": 100}
-            )
-            
-            if projects_response.status_code != 200:
-                print(f"❌ Failed to fetch projects: {projects_response.status_code} - {projects_response.text}")
-                return {"error": "Failed to fetch projects", "message": f"Status {projects_response.status_code}: {projects_response.text}"}
-            
-            projects_data = projects_response.json()
-            print(f"📁 Found {len(projects_data)} projects")
-            
-            # Process each project
             processed_projects = []
-            for project in projects_data:
-                try:
-                    processed_project = self._extract_project_data_with_direct_api(project, user_token)
-                    processed_projects.append(processed_project)
-                except Exception as e:
-                    print(f"⚠️ Failed to process project {project.get('name', 'unknown')}: {e}")
-                    continue
+            try:
+                for project in self._iter_pages(
+                    f"{GITLAB_URL}/api/v4/projects",
+                    headers=headers,
+                    params={"owned": "true", "membership": "true", "order_by": "id", "sort": "asc", "statistics": "true"}
+                ):
+                    try:
+                        processed_project = self._extract_project_data_with_direct_api(project, user_token)
+                        processed_projects.append(processed_project)
+                    except Exception as e:
+                        print(f"⚠️ Failed to process project {project.get('name', 'unknown')}: {e}")
+                        continue
+            except requests.HTTPError as e:
+                print(f"❌ Failed to fetch projects: {e.response.status_code} - {e.response.text}")
+                return {"error": "Failed to fetch projects", "message": f"Status {e.response.status_code}: {e.response.text}"}
             
             print(f"✅ Successfully processed {len(processed_projects)} projects")
             return processed_projects
@@ -76,11 +105,26 @@ class GitlabService:
         except Exception as e:
             print(f"❌ Error in get_user_projects_with_user_token: {e}")
             return {"error": "Error fetching projects", "message": str(e)}
+
+    def get_user_projects_concurrently(self, gitlab_username: str, user_token: str, **engine_kwargs):
+        """
+        Same result as get_user_projects_with_user_token, but projects, languages,
+        commit stats and files are fetched in parallel by the async sync engine.
+        """
+        print(f"🔗 Using GitLab URL: {GITLAB_URL}")
+        print(f"👤 Fetching projects for user: {gitlab_username}")
+
+        engine_kwargs.setdefault("cache", self.http_cache)
+        try:
+            return fetch_user_projects(user_token, base_url=GITLAB_URL, **engine_kwargs)
+        except Exception as e:
+            print(f"❌ Error in get_user_projects_concurrently: {e}")
+            return {"error": "Error fetching projects", "message": str(e)}
     
     def _extract_project_data_with_user_token(self, project, user_token: str):
         """Extract project data using the user's token"""
-        user_gl = gitlab.Gitlab(GITLAB_URL, private_token=user_token)
-        project_obj = user_gl.projects.get(project.id)
+        user_gl = gitlab.Gitlab(GITLAB_URL, private_token=user_token, session=self.session)
+        project_obj = user_gl.projects.get(project.id, statistics=True)
         
         # Now you can access private repository files!
         default_ref = getattr(project_obj, 'default_branch', 'main')
@@ -103,10 +147,12 @@ class GitlabService:
             }
         }
         
-        # Get commit count
+        # Get commit count from the project statistics, or X-Total of a one-item page
         try:
-            commits = project_obj.commits.list(all=True)
-            data["stats"]["commit_count"] = len(commits)
+            commit_count = commit_count_from_statistics(project_obj.attributes)
+            if commit_count is None:
+                commit_count = project_obj.commits.list(per_page=1, iterator=True).total
+            data["stats"]["commit_count"] = commit_count or 0
         except:
             pass
         
@@ -127,7 +173,6 @@ class GitlabService:
     
     def _extract_project_data_with_direct_api(self, project_json: dict, user_token: str):
         """Extract project data using direct GitLab API calls (bypassing python-gitlab library)"""
-        import requests
         
         project_id = project_json["id"]
         project_name = project_json["name"]
@@ -140,7 +185,7 @@ class GitlabService:
         # Get project languages
         languages = {}
         try:
-            lang_response = requests.get(
+            lang_response = self.session.get(
                 f"{GITLAB_URL}/api/v4/projects/{project_id}/languages",
                 headers=headers
             )
@@ -152,19 +197,20 @@ class GitlabService:
         # Get project files
         files = self.get_project_files_with_direct_api(project_id, default_branch, user_token)
         
-        # Get commit count
-        commit_count = 0
-        try:
-            commits_response = requests.get(
-                f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/commits",
-                headers=headers,
-                params={"per_page": 1}
-            )
-            if commits_response.status_code == 200:
-                # Get total count from headers if available
-                commit_count = len(commits_response.json()) if commits_response.json() else 0
-        except Exception as e:
-            print(f"⚠️ Failed to get commit count for {project_name}: {e}")
+        # Get commit count from the listing statistics, or X-Total of a one-item page
+        commit_count = commit_count_from_statistics(project_json)
+        if commit_count is None:
+            try:
+                commits_response = self.session.get(
+                    f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/commits",
+                    headers=headers,
+                    params={"per_page": 1}
+                )
+                if commits_response.status_code == 200:
+                    commit_count = commit_count_from_headers(commits_response.headers)
+            except Exception as e:
+                print(f"⚠️ Failed to get commit count for {project_name}: {e}")
+        commit_count = commit_count or 0
         
         # Build project data
         data = {
@@ -192,7 +238,6 @@ class GitlabService:
         """
         Fetch project files using direct GitLab API calls (bypassing python-gitlab library)
         """
-        import requests
         
         if not user_token:
             raise ValueError("User token must be provided for this method.")
@@ -201,24 +246,18 @@ class GitlabService:
         files = {}
         
         try:
-            # Get repository tree
-            tree_response = requests.get(
+            # Walk the whole repository tree page by page
+            tree_items = self._iter_pages(
                 f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/tree",
                 headers=headers,
-                params={"recursive": "true", "ref": ref, "per_page": 100}
+                params={"recursive": "true", "ref": ref, "pagination": "keyset"}
             )
             
-            if tree_response.status_code != 200:
-                print(f"❌ Failed to get repository tree: {tree_response.status_code}")
-                return files
-            
-            tree_items = tree_response.json()
-            
             for item in tree_items:
                 if item["type"] == "blob":
                     path = item["path"]
                     # Filter by file extension
-                    if any(path.endswith(ext) for ext in [".py", ".js", ".md", ".txt", ".json", ".yaml", ".java"]):
+                    if is_text_file(path):
                         content = self.get_file_content_with_direct_api(project_id, path, ref, user_token)
                         if content is not None:
                             files[path] = content
@@ -230,7 +269,6 @@ class GitlabService:
     
     def get_file_content_with_direct_api(self, project_id: int, file_path: str, ref: str = "main", user_token: str = None) -> str | None:
         """Fetch a single file's content using direct GitLab API calls"""
-        import requests
         import base64
         
         if not user_token:
@@ -239,7 +277,7 @@ class GitlabService:
         headers = {"Authorization": f"Bearer {user_token}"}
         
         try:
-            file_response = requests.get(
+            file_response = self.session.get(
                 f"{GITLAB_URL}/api/v4/projects/{project_id}/repository/files/{file_path.replace('/', '%2F')}",
                 headers=headers,
                 params={"ref": ref}
@@ -258,49 +296,116 @@ class GitlabService:
             print(f"⚠️ Error getting file {file_path}: {e}")
             return None
     
-    def store_projects_for_student(self, student_id: str, gitlab_username: str, gitlab_token: str):
+    def store_projects_for_student(self, student_id: str, gitlab_username: str, gitlab_token: str, progress=None):
         """
         Fetch and store all GitLab projects for a student
         
         Args:
             student_id (str): Internal student ID
             gitlab_username (str): GitLab username
+            progress (callable): Optional (project_id, name, status) callback reporting per-project progress
             
         Returns:
             dict: Result of the operation with count of stored projects
         """
-        projects = self.get_user_projects_with_user_token(gitlab_username, gitlab_token)
+        # Projects of all students live in one collection, scoped by student_id
+        projects_collection = self.get_projects_collection()
+        migrate_student(projects_collection.database, student_id)
+
+        # Head commit SHAs from the last sync decide which projects have to be fetched again,
+        # and the blob store decides which file contents have to be downloaded.
+        # Projects stored before manifests existed are always fetched again to get one.
+        previous = {
+            doc["project_id"]: {
+                "head_commit_sha": doc.get("head_commit_sha") if "manifest" in doc else None,
+                "file_shas": project_file_shas(doc),
+            }
+            for doc in projects_collection.find(
+                {"student_id": student_id}, {"_id": 0, "project_id": 1, "head_commit_sha": 1, "manifest": 1, "file_shas": 1}
+            )
+        }
+
+        projects = self.get_user_projects_concurrently(
+            gitlab_username, gitlab_token, previous=previous, known_blobs=self.blob_service.existing_shas, progress=progress
+        )
         if isinstance(projects, dict) and "error" in projects:
             return projects
         
-        # Get the MongoDB collection for this student
-        student_collection = self.get_student_collection(student_id)
-        
-        # Store each project
+        projects = [project for project in projects if isinstance(project, dict)]
+        # Sizes of the blobs that were not downloaded again come from the blob store
+        sizes = self.blob_service.get_sizes(
+            sha for project in projects for path, sha in (project.get("file_shas") or {}).items()
+            if path not in (project.get("files") or {})
+        )
+
+        # Build one upsert per project and write them in unordered batches
+        unchanged_count = 0
+        updates = []
+        blob_refs = []
         for project in projects:
-            if isinstance(project, dict):
-                # Use GitLab project ID as document ID for upsert
-                update_doc = {
-                    **project,
-                    "last_sync_date": datetime.now().isoformat()
-                }
-                student_collection.update_one(
-                    {"project_id": project["project_id"]},
-                    {"$set": update_doc},
-                    upsert=True
-                )
+            update = {}
+            if project.get("sync_status") == "unchanged":
+                # Only metadata was fetched, files and stats are kept as stored
+                unchanged_count += 1
+                blob_refs.append(None)
+            else:
+                # File contents go to the blob store, the project keeps a manifest of them
+                old_shas = (previous.get(project["project_id"]) or {}).get("file_shas") or {}
+                files = project.pop("files", {})
+                file_shas = project.pop("file_shas")
+                blob_refs.append((files, file_shas, old_shas))
+                for path, content in files.items():
+                    sizes[file_shas[path]] = len(content.encode("utf-8"))
+                project["manifest"] = build_manifest(file_shas, sizes)
+                update["$unset"] = {"files": "", "file_shas": ""}
+
+            # (student_id, GitLab project ID) identifies the stored project
+            update["$set"] = {
+                **project,
+                "student_id": student_id,
+                "last_sync_date": datetime.now().isoformat()
+            }
+            updates.append(({"student_id": student_id, "project_id": project["project_id"]}, update))
+
+        # Blobs are stored and referenced before the manifests and head SHAs
+        # pointing at them, a sync that stops in between leaves the old
+        # manifest and head SHA in place, so the next one fetches the project again
+        for refs in blob_refs:
+            if refs is not None:
+                self.blob_service.add_refs(*refs)
+
+        report = BulkWriter(projects_collection).update_many(updates, upsert=True)
+        failed = {failure["index"] for failure in report["failed"]}
+
+        # The old file sets are released once the new manifest is stored, otherwise the new one is
+        for index, refs in enumerate(blob_refs):
+            if refs is None:
+                continue
+            _, file_shas, old_shas = refs
+            if index in failed:
+                self.blob_service.release_refs(old_shas, file_shas)
+            else:
+                self.blob_service.release_refs(file_shas, old_shas)
         
+        if self.http_cache is not None:
+            print(f"📦 GitLab cache: {self.http_cache.hits} hits, {self.http_cache.misses} misses")
+        stored_count = len(updates) - len(failed)
+        message = f"Stored {stored_count} projects for student {student_id} ({unchanged_count} unchanged)"
+        if failed:
+            message += f", {len(failed)} failed"
         return {
             "success": True,
-            "message": f"Stored {len(projects)} projects for student {student_id}",
-            "project_count": len(projects)
+            "message": message,
+            "project_count": stored_count,
+            "unchanged_count": unchanged_count,
+            "failed_projects": [updates[index][0]["project_id"] for index in sorted(failed)],
         }
         
     def get_file_content(self, project_id: int, file_path: str, ref: str = "main", user_token: str | None = None) -> str | None:
         """Fetch a single file's text content (decoded) from a project."""
         try:
             if user_token:
-                gl = gitlab.Gitlab(GITLAB_URL, private_token=user_token)
+                gl = gitlab.Gitlab(GITLAB_URL, private_token=user_token, session=self.session)
             elif self.gl:
                 gl = self.gl
             else:
@@ -355,7 +460,7 @@ class GitlabService:
         if not user_token:
             raise ValueError("User token must be provided for this method.")
 
-        user_gl = gitlab.Gitlab(GITLAB_URL, private_token=user_token)
+        user_gl = gitlab.Gitlab(GITLAB_URL, private_token=user_token, session=self.session)
         files = {}
         try:
             # Add all=True to fetch all items from the repository tree
@@ -380,8 +485,8 @@ class GitlabService:
         
         return files
 
-    def get_student_collection(self, student_id: str) -> Collection:
+    def get_projects_collection(self) -> Collection:
+        """The collection holding every student's projects, keyed by (student_id, project_id)"""
         db = get_db_connection("students")
-        collection = get_collection(student_id, db)
-        return collection
+        return get_collection(PROJECTS_COLLECTION, db)
         
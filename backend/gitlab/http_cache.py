@@ -0,0 +1,198 @@
+import hashlib
+import os
+import threading
+from datetime import datetime
+
+import requests
+from dotenv import load_dotenv
+from requests.structures import CaseInsensitiveDict
+
+from backend.mongodb.MongoDB import get_db_connection
+from .request_scheduler import ScheduledHTTPAdapter, get_scheduled_session
+
+
+load_dotenv()
+
+GITLAB_HTTP_CACHE_ENABLED = os.getenv("GITLAB_HTTP_CACHE", "true").lower() not in ("0", "false", "no")
+# Entries not revalidated for this long are dropped by a TTL index
+GITLAB_HTTP_CACHE_TTL = int(os.getenv("GITLAB_HTTP_CACHE_TTL") or 7 * 24 * 3600)
+# Larger bodies are not cached, they would come close to the BSON document limit
+GITLAB_HTTP_CACHE_MAX_BYTES = int(os.getenv("GITLAB_HTTP_CACHE_MAX_BYTES") or 4 * 1024 * 1024)
+
+# File contents are deduplicated by the blob store and archives are streamed, so only API listings are cached
+UNCACHED_PATH_SUFFIXES = ("/raw", "/archive.tar.gz", "/archive")
+# Response headers needed to replay a cached page, including pagination
+STORED_HEADERS = (
+    "content-type", "etag", "last-modified", "link",
+    "x-next-page", "x-page", "x-per-page", "x-prev-page", "x-total", "x-total-pages",
+)
+
+
+class GitlabHttpCache:
+    """
+    Persistent conditional-request cache for GitLab API GETs.
+
+    Responses carrying an ETag or Last-Modified are stored in the
+    "gitlab_http_cache" collection per URL and token scope. The next request
+    for the same URL sends If-None-Match/If-Modified-Since, and a 304 is
+    answered with the stored body. The scope is a hash of the token, so
+    users never see each other's responses and tokens are never stored.
+    """
+    _instance = None
+
+    def __init__(self, db=None, max_body_bytes: int = GITLAB_HTTP_CACHE_MAX_BYTES):
+        self.db = db if db is not None else get_db_connection("students")
+        self.collection = self.db["gitlab_http_cache"]
+        self.max_body_bytes = max_body_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the process-wide cache.
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def scope_for_token(token: str | None) -> str:
+        return hashlib.sha256((token or "anonymous").encode()).hexdigest()
+
+    @classmethod
+    def scope_for_headers(cls, headers) -> str:
+        """Scope of a request, from its Bearer or PRIVATE-TOKEN credentials"""
+        token = headers.get("PRIVATE-TOKEN")
+        authorization = headers.get("Authorization")
+        if not token and authorization:
+            token = authorization.removeprefix("Bearer ").strip()
+        return cls.scope_for_token(token)
+
+    def is_cacheable(self, method: str, url: str) -> bool:
+        return method.upper() == "GET" and not url.split("?", 1)[0].endswith(UNCACHED_PATH_SUFFIXES)
+
+    def lookup(self, scope: str, url: str) -> dict | None:
+        return self.collection.find_one({"_id": self._key(scope, url)})
+
+    def conditional_headers(self, entry: dict | None) -> dict:
+        """Validators to send with a request for a cached URL"""
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def record_hit(self, entry: dict):
+        with self.lock:
+            self.hits += 1
+        self.collection.update_one(
+            {"_id": entry["_id"]},
+            {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}}
+        )
+
+    def record_miss(self):
+        with self.lock:
+            self.misses += 1
+
+    def store(self, scope: str, url: str, headers, body: bytes) -> bool:
+        """Store a 200 response if it carries a validator. Returns True if it was stored."""
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not (etag or last_modified) or len(body) > self.max_body_bytes:
+            return False
+
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"_id": self._key(scope, url)},
+            {
+                "$set": {
+                    "url": url,
+                    "scope": scope,
+                    "etag": etag,
+                    "last_modified": last_modified,
+                    "headers": {name: headers[name] for name in STORED_HEADERS if name in headers},
+                    "body": body,
+                    "last_used_at": now,
+                },
+                "$setOnInsert": {"created_at": now, "hits": 0},
+            },
+            upsert=True
+        )
+        return True
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "entries": self.collection.estimated_document_count(),
+        }
+
+    def _key(self, scope: str, url: str) -> str:
+        return hashlib.sha256(f"{scope} {url}".encode()).hexdigest()
+
+
+class CachedHTTPAdapter(ScheduledHTTPAdapter):
+    """Scheduled requests adapter that revalidates GETs against a GitlabHttpCache"""
+
+    def __init__(self, cache: GitlabHttpCache | None = None, **kwargs):
+        self.cache = cache or GitlabHttpCache.get_instance()
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("stream") or not self.cache.is_cacheable(request.method, request.url):
+            return super().send(request, **kwargs)
+
+        scope = self.cache.scope_for_headers(request.headers)
+        entry = self.cache.lookup(scope, request.url)
+        request.headers.update(self.cache.conditional_headers(entry))
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.cache.record_hit(entry)
+            response.close()
+            return self._cached_response(request, entry)
+
+        self.cache.record_miss()
+        if response.status_code == 200:
+            self.cache.store(scope, request.url, response.headers, response.content)
+        return response
+
+    def _cached_response(self, request, entry: dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = bytes(entry["body"])
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+_session = None
+
+
+def get_cached_session() -> requests.Session:
+    """
+    Shared requests session whose GETs are scheduled and revalidated against the
+    GitLab HTTP cache. Falls back to the plain scheduled session when
+    GITLAB_HTTP_CACHE is disabled.
+    """
+    global _session
+    if not GITLAB_HTTP_CACHE_ENABLED:
+        return get_scheduled_session()
+    if _session is None:
+        session = requests.Session()
+        adapter = CachedHTTPAdapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
@@ -0,0 +1,219 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import httpx
+import requests
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+
+load_dotenv()
+
+# Outbound GitLab requests per second shared by every sync in this process
+GITLAB_RATE_LIMIT = float(os.getenv("GITLAB_RATE_LIMIT") or 10)
+GITLAB_RATE_BURST = int(os.getenv("GITLAB_RATE_BURST") or 20)
+GITLAB_MAX_RETRIES = int(os.getenv("GITLAB_MAX_RETRIES") or 5)
+GITLAB_BACKOFF_BASE = float(os.getenv("GITLAB_BACKOFF_BASE") or 0.5)
+GITLAB_BACKOFF_MAX = float(os.getenv("GITLAB_BACKOFF_MAX") or 30)
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens are reserved in advance, so callers get the
+    time they have to wait and can sleep either blocking or with asyncio.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.paused_until - now)
+
+    def pause(self, seconds: float):
+        """Hold back all requests for the given number of seconds"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class RequestScheduler:
+    """
+    Shared scheduler for outbound GitLab calls.
+
+    Every request takes a token from one process-wide bucket. Responses are
+    inspected for RateLimit-Remaining/RateLimit-Reset and Retry-After, which
+    pause the whole bucket, and idempotent requests that fail with a transient
+    status are retried with jittered exponential backoff.
+    """
+    _instance = None
+
+    def __init__(
+        self,
+        rate: float = GITLAB_RATE_LIMIT,
+        burst: int = GITLAB_RATE_BURST,
+        max_retries: int = GITLAB_MAX_RETRIES,
+        backoff_base: float = GITLAB_BACKOFF_BASE,
+        backoff_max: float = GITLAB_BACKOFF_MAX,
+    ):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self.throttled = 0
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the process-wide scheduler.
+        """
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def acquire(self):
+        wait = self.bucket.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self.bucket.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def observe(self, status_code: int, headers) -> None:
+        """Pause the bucket when GitLab says the rate limit is used up"""
+        retry_after = self._retry_after(headers)
+        if status_code in (429, 503) and retry_after is not None:
+            self.throttled += 1
+            self.bucket.pause(retry_after)
+            return
+
+        remaining = headers.get("RateLimit-Remaining")
+        if remaining is not None and remaining.isdigit() and int(remaining) == 0:
+            self.throttled += 1
+            reset = headers.get("RateLimit-Reset")
+            wait = float(reset) - time.time() if reset and reset.isdigit() else 1.0
+            self.bucket.pause(min(max(wait, 0.0), self.backoff_max))
+
+    def should_retry(self, method: str, status_code: int | None, attempt: int) -> bool:
+        """status_code is None when the request failed before a response arrived"""
+        if attempt >= self.max_retries or method.upper() not in IDEMPOTENT_METHODS:
+            return False
+        return status_code is None or status_code in RETRY_STATUSES
+
+    def retry_delay(self, attempt: int, headers=None) -> float:
+        """Retry-After if the server sent one, otherwise full-jitter exponential backoff"""
+        retry_after = self._retry_after(headers or {})
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def send_async(self, method: str, send):
+        """
+        Run an httpx request through the scheduler.
+
+        Args:
+            method: HTTP method, only idempotent ones are retried
+            send: Zero-argument coroutine function performing the request
+        """
+        attempt = 0
+        while True:
+            await self.acquire_async()
+            try:
+                response = await send()
+            except httpx.TransportError:
+                if not self.should_retry(method, None, attempt):
+                    raise
+                await asyncio.sleep(self.retry_delay(attempt))
+                attempt += 1
+                self.retries += 1
+                continue
+
+            self.observe(response.status_code, response.headers)
+            if not self.should_retry(method, response.status_code, attempt):
+                return response
+            print(f"🔁 Retrying {method} {response.url} after {response.status_code} (attempt {attempt + 1})")
+            await response.aclose()
+            await asyncio.sleep(self.retry_delay(attempt, response.headers))
+            attempt += 1
+            self.retries += 1
+
+    def _retry_after(self, headers) -> float | None:
+        value = headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+
+
+class ScheduledHTTPAdapter(HTTPAdapter):
+    """requests adapter that sends every request through a RequestScheduler"""
+
+    def __init__(self, scheduler: RequestScheduler | None = None, **kwargs):
+        self.scheduler = scheduler or RequestScheduler.get_instance()
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        attempt = 0
+        while True:
+            self.scheduler.acquire()
+            try:
+                response = super().send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not self.scheduler.should_retry(request.method, None, attempt):
+                    raise
+                time.sleep(self.scheduler.retry_delay(attempt))
+                attempt += 1
+                self.scheduler.retries += 1
+                continue
+
+            self.scheduler.observe(response.status_code, response.headers)
+            if not self.scheduler.should_retry(request.method, response.status_code, attempt):
+                return response
+            print(f"🔁 Retrying {request.method} {request.url} after {response.status_code} (attempt {attempt + 1})")
+            response.close()
+            time.sleep(self.scheduler.retry_delay(attempt, response.headers))
+            attempt += 1
+            self.scheduler.retries += 1
+
+
+_session = None
+
+
+def get_scheduled_session() -> requests.Session:
+    """
+    Shared requests session whose calls all go through the process-wide scheduler.
+    Pass it to gitlab.Gitlab(..., session=...) or use it in place of requests.get.
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = ScheduledHTTPAdapter()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
@@ -0,0 +1,565 @@
+import asyncio
+import hashlib
+import io
+import os
+import tarfile
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import httpx
+from dotenv import load_dotenv
+
+from .request_scheduler import RETRY_STATUSES, RequestScheduler
+
+
+load_dotenv()
+
+GITLAB_URL = os.getenv("GITLAB_URL", "https://git.app.uib.no")
+GITLAB_SYNC_CONCURRENCY = int(os.getenv("GITLAB_SYNC_CONCURRENCY") or 8)
+GITLAB_SYNC_MAX_CONNECTIONS = int(os.getenv("GITLAB_SYNC_MAX_CONNECTIONS") or 20)
+GITLAB_SYNC_TIMEOUT = float(os.getenv("GITLAB_SYNC_TIMEOUT") or 30)
+# "api" fetches changed blobs one request each, "archive" downloads one tar.gz per project
+GITLAB_SYNC_MODE = os.getenv("GITLAB_SYNC_MODE", "api")
+SYNC_MODES = ("api", "archive")
+GITLAB_PAGE_SIZE = 100
+# The GraphQL projects connection returns at most 100 nodes per query
+GRAPHQL_BATCH_SIZE = 100
+COMMIT_COUNT_QUERY = """
+query($paths: [String!], $first: Int) {
+  projects(fullPaths: $paths, first: $first) {
+    nodes { fullPath statistics { commitCount } }
+  }
+}
+"""
+
+TEXT_FILE_EXTENSIONS = (".py", ".js", ".md", ".txt", ".json", ".yaml", ".java")
+
+
+def is_text_file(path: str) -> bool:
+    """Check if a repository path is one of the text files we store"""
+    return path.endswith(TEXT_FILE_EXTENSIONS)
+
+
+def git_blob_sha(content: bytes) -> str:
+    """Compute the SHA git (and the GitLab tree endpoint) uses to identify a blob"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def commit_count_from_headers(headers) -> int | None:
+    """
+    Total number of commits from the X-Total header of a per_page=1 commits request.
+    GitLab leaves the header out for very large listings, in which case None is returned.
+    """
+    total = headers.get("X-Total")
+    return int(total) if total and total.isdigit() else None
+
+
+def commit_count_from_statistics(project_json: dict) -> int | None:
+    """Commit count from a project listed with statistics=true, if GitLab included it"""
+    statistics = project_json.get("statistics") or {}
+    commit_count = statistics.get("commit_count")
+    return int(commit_count) if commit_count is not None else None
+
+
+class ByteStreamReader(io.RawIOBase):
+    """
+    Blocking file-like view of an async byte stream, for reading a response
+    body from a worker thread while the event loop downloads it. Only the
+    chunk being read is held in memory.
+    """
+
+    def __init__(self, chunks, loop: asyncio.AbstractEventLoop):
+        self.chunks = chunks.__aiter__()
+        self.loop = loop
+        self.pending = b""
+
+    def readable(self) -> bool:
+        return True
+
+    async def _next_chunk(self) -> bytes | None:
+        try:
+            return await self.chunks.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    def readinto(self, buffer) -> int:
+        while not self.pending:
+            chunk = asyncio.run_coroutine_threadsafe(self._next_chunk(), self.loop).result()
+            if chunk is None:
+                return 0
+            self.pending = chunk
+        size = min(len(buffer), len(self.pending))
+        buffer[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+
+def extract_text_files_from_archive(fileobj) -> tuple[dict[str, str], dict[str, str]]:
+    """
+    Read a GitLab repository tar.gz as a stream and keep only text files.
+
+    Members are decompressed one at a time and anything that does not pass
+    is_text_file is skipped without being read. GitLab prefixes every path with
+    a "<project>-<ref>-<sha>/" directory, which is stripped.
+    Returns ({path: content}, {path: blob_sha}).
+    """
+    files = {}
+    file_shas = {}
+    with tarfile.open(fileobj=fileobj, mode="r|gz") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            path = member.name.split("/", 1)[1] if "/" in member.name else member.name
+            if not is_text_file(path):
+                continue
+            content = archive.extractfile(member).read()
+            try:
+                files[path] = content.decode("utf-8")
+            except UnicodeDecodeError:
+                print(f"⚠️ Skipping non UTF-8 file {path}")
+                continue
+            file_shas[path] = git_blob_sha(content)
+    return files, file_shas
+
+
+class GitlabSyncEngine:
+    """
+    Fetches a user's GitLab projects concurrently over one shared connection pool.
+
+    Projects, languages, commit stats and file blobs are requested in parallel,
+    limited per host by a semaphore so a single sync can't flood GitLab.
+    Use it as an async context manager:
+
+        async with GitlabSyncEngine(user_token) as engine:
+            projects = await engine.fetch_user_projects()
+    """
+
+    def __init__(
+        self,
+        user_token: str,
+        base_url: str = GITLAB_URL,
+        concurrency: int = GITLAB_SYNC_CONCURRENCY,
+        max_connections: int = GITLAB_SYNC_MAX_CONNECTIONS,
+        timeout: float = GITLAB_SYNC_TIMEOUT,
+        transport: httpx.AsyncBaseTransport | None = None,
+        mode: str = GITLAB_SYNC_MODE,
+        scheduler: RequestScheduler | None = None,
+        cache=None,
+    ):
+        if not user_token:
+            raise ValueError("User token must be provided for this method.")
+        if mode not in SYNC_MODES:
+            raise ValueError(f"Unknown sync mode '{mode}', expected one of {SYNC_MODES}")
+        self.mode = mode
+        self.scheduler = scheduler or RequestScheduler.get_instance()
+        # Optional GitlabHttpCache used to revalidate listings with If-None-Match
+        self.cache = cache
+        self.cache_scope = cache.scope_for_token(user_token) if cache is not None else None
+        self.user_token = user_token
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.max_connections = max(1, max_connections)
+        self.timeout = timeout
+        self.transport = transport
+        self.client: httpx.AsyncClient | None = None
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            base_url=f"{self.base_url}/api/v4",
+            headers={"Authorization": f"Bearer {self.user_token}"},
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+            timeout=self.timeout,
+            transport=self.transport,
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.client.aclose()
+        self.client = None
+
+    def _semaphore_for(self, url: httpx.URL) -> asyncio.Semaphore:
+        host = url.host or urlsplit(self.base_url).hostname or ""
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.concurrency)
+        return self._host_semaphores[host]
+
+    async def _get(self, path: str, params: dict | None = None, stream: bool = False) -> httpx.Response:
+        """
+        GET a GitLab API path through the shared rate-limit scheduler, waiting for
+        a free slot on the target host. Streamed responses must be closed by the caller.
+
+        With a cache, stored validators are sent along and a 304 is answered
+        with the stored body as a regular 200 response.
+        """
+        url = self.client.base_url.join(path.lstrip("/"))
+        semaphore = self._semaphore_for(url)
+        headers = {}
+
+        entry = None
+        use_cache = False
+        if self.cache is not None and not stream:
+            cache_url = str(self.client.build_request("GET", url, params=params).url)
+            use_cache = self.cache.is_cacheable("GET", cache_url)
+        if use_cache:
+            entry = await asyncio.to_thread(self.cache.lookup, self.cache_scope, cache_url)
+            headers = self.cache.conditional_headers(entry)
+
+        async def send():
+            async with semaphore:
+                request = self.client.build_request("GET", url, params=params, headers=headers)
+                return await self.client.send(request, stream=stream)
+
+        response = await self.scheduler.send_async("GET", send)
+        if not use_cache:
+            return response
+
+        if response.status_code == 304 and entry is not None:
+            await asyncio.to_thread(self.cache.record_hit, entry)
+            return httpx.Response(200, headers=entry["headers"], content=bytes(entry["body"]), request=response.request)
+
+        self.cache.record_miss()
+        if response.status_code == 200:
+            await asyncio.to_thread(self.cache.store, self.cache_scope, cache_url, response.headers, response.content)
+        return response
+
+    async def paginate(self, path: str, params: dict | None = None):
+        """
+        Yield every item of a paginated GitLab list endpoint, one page at a time.
+
+        Follows the Link rel="next" header (keyset pagination) and falls back to
+        X-Next-Page (offset pagination). Raises httpx.HTTPStatusError if any
+        page fails, so callers never mistake a truncated listing for a full one.
+        """
+        params = {"per_page": GITLAB_PAGE_SIZE, **(params or {})}
+        next_path = path
+        while next_path:
+            response = await self._get(next_path, params=params)
+            response.raise_for_status()
+            for item in response.json():
+                yield item
+
+            next_link = response.links.get("next", {}).get("url")
+            next_page = response.headers.get("X-Next-Page")
+            if next_link:
+                next_path, params = next_link, None
+            elif next_page:
+                params = {**(params or {}), "page": next_page}
+            else:
+                next_path = None
+
+    def _raise_if_transient(self, response: httpx.Response):
+        """
+        Fail the whole project when GitLab is still throttling or erroring after all
+        retries, so a partially fetched project never overwrites the stored one.
+        """
+        if response.status_code in RETRY_STATUSES:
+            response.raise_for_status()
+
+    async def fetch_user_projects(self, previous: dict[int, dict] | None = None, known_blobs=None, progress=None):
+        """
+        Fetch all projects of the authenticated user with files, languages and stats.
+
+        Args:
+            previous: Already stored projects keyed by project_id, each with at least
+                "head_commit_sha". Projects whose head commit did not move are
+                returned as metadata only with sync_status "unchanged".
+            known_blobs: Optional callable (list of blob SHAs) -> set of the SHAs that
+                are already stored. Those blobs are listed in "file_shas" but not
+                downloaded, so "files" only holds the newly fetched contents.
+            progress: Optional callable (project_id, name, status) called with status
+                "pending" when a project is listed and "new", "updated", "unchanged"
+                or "failed" when it is done.
+
+        Returns the list of project documents, or an error dict in the same
+        format as GitlabService.get_user_projects_with_user_token.
+        """
+        previous = previous or {}
+
+        user_response = await self._get("/user")
+        if user_response.status_code != 200:
+            print(f"❌ Authentication failed: {user_response.status_code} - {user_response.text}")
+            return {"error": "Authentication failed", "message": f"Status {user_response.status_code}: {user_response.text}"}
+
+        # Projects are processed as soon as their listing page arrives
+        tasks = []
+        try:
+            async for project in self.paginate(
+                "/projects",
+                params={"owned": "true", "membership": "true", "order_by": "id", "sort": "asc", "statistics": "true"}
+            ):
+                task = asyncio.create_task(self._track_project(project, previous.get(project["id"]), known_blobs, progress))
+                tasks.append((project, task))
+        except httpx.HTTPStatusError as e:
+            for _, task in tasks:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in tasks), return_exceptions=True)
+            print(f"❌ Failed to fetch projects: {e.response.status_code} - {e.response.text}")
+            return {"error": "Failed to fetch projects", "message": f"Status {e.response.status_code}: {e.response.text}"}
+
+        print(f"📁 Found {len(tasks)} projects")
+        results = await asyncio.gather(*(task for _, task in tasks), return_exceptions=True)
+
+        processed_projects = []
+        for (project, _), result in zip(tasks, results):
+            if isinstance(result, Exception):
+                print(f"⚠️ Failed to process project {project.get('name', 'unknown')}: {result}")
+                continue
+            processed_projects.append(result)
+
+        await self._fill_missing_commit_counts(processed_projects, {project["id"]: project for project, _ in tasks})
+
+        print(f"✅ Successfully processed {len(processed_projects)} projects")
+        return processed_projects
+
+    async def _track_project(self, project_json: dict, previous: dict | None, known_blobs, progress) -> dict:
+        """Run extract_project_data and report its progress"""
+        if progress is None:
+            return await self.extract_project_data(project_json, previous, known_blobs)
+
+        progress(project_json["id"], project_json["name"], "pending")
+        try:
+            data = await self.extract_project_data(project_json, previous, known_blobs)
+        except Exception:
+            progress(project_json["id"], project_json["name"], "failed")
+            raise
+        progress(project_json["id"], project_json["name"], data["sync_status"])
+        return data
+
+    async def extract_project_data(self, project_json: dict, previous: dict | None = None, known_blobs=None) -> dict:
+        """
+        Build the stored project document, fetching languages, files and commits in parallel.
+
+        If the head commit matches the previously stored one the project is skipped
+        and only its listing metadata is returned. Otherwise only blobs that are
+        not already stored are downloaded.
+        """
+        project_id = project_json["id"]
+        project_name = project_json["name"]
+        default_branch = project_json.get("default_branch") or "main"
+
+        metadata = {
+            "project_id": project_id,
+            "name": project_name,
+            "description": project_json.get("description", ""),
+            "url": project_json.get("web_url", ""),
+            "created_at": project_json.get("created_at", ""),
+            "last_activity_at": project_json.get("last_activity_at", ""),
+        }
+
+        head_commit_sha, commit_count = await self.get_head_commit(project_id, default_branch)
+        listed_count = commit_count_from_statistics(project_json)
+        if listed_count is not None:
+            commit_count = listed_count
+        if previous and head_commit_sha and previous.get("head_commit_sha") == head_commit_sha:
+            print(f"⏭️ Skipping {project_name}: head commit unchanged")
+            return {**metadata, "head_commit_sha": head_commit_sha, "sync_status": "unchanged"}
+
+        if self.mode == "archive":
+            files_request = self.get_project_files_from_archive(project_id, head_commit_sha or default_branch)
+        else:
+            files_request = self.get_project_files(project_id, default_branch, known_blobs)
+
+        languages, (files, file_shas) = await asyncio.gather(
+            self.get_languages(project_id),
+            files_request,
+        )
+
+        data = {
+            **metadata,
+            "files": files,
+            "file_shas": file_shas,
+            "head_commit_sha": head_commit_sha,
+            "sync_status": "updated" if previous else "new",
+            "fetched_at": datetime.now().isoformat(),
+            "languages": languages,
+            "stats": {
+                "commit_count": commit_count,
+                "file_count": len(file_shas),
+                "languages": languages,
+                "readme_exists": any("readme" in filename.lower() for filename in file_shas.keys())
+            }
+        }
+
+        print(f"✅ Processed {project_name}: {len(file_shas)} files, {len(languages)} languages")
+        return data
+
+    async def get_languages(self, project_id: int) -> dict:
+        response = await self._get(f"/projects/{project_id}/languages")
+        self._raise_if_transient(response)
+        if response.status_code == 200:
+            return response.json()
+        print(f"⚠️ Failed to get languages for project {project_id}: {response.status_code}")
+        return {}
+
+    async def get_head_commit(self, project_id: int, ref: str) -> tuple[str | None, int | None]:
+        """
+        Return the head commit SHA of a ref and the commit count from X-Total.
+        The count is None when GitLab did not send the header.
+        """
+        response = await self._get(
+            f"/projects/{project_id}/repository/commits",
+            params={"ref_name": ref, "per_page": 1}
+        )
+        self._raise_if_transient(response)
+        if response.status_code == 200:
+            commits = response.json()
+            head_commit_sha = commits[0]["id"] if commits else None
+            commit_count = commit_count_from_headers(response.headers)
+            if commit_count is None and not commits:
+                commit_count = 0
+            return head_commit_sha, commit_count
+        print(f"⚠️ Failed to get commit count for project {project_id}: {response.status_code}")
+        return None, None
+
+    async def _fill_missing_commit_counts(self, projects: list[dict], listed: dict[int, dict]):
+        """Fetch the commit counts neither the listing nor X-Total provided in one batched query"""
+        missing = [
+            project for project in projects
+            if "stats" in project and project["stats"]["commit_count"] is None
+        ]
+        paths = [listed[project["project_id"]].get("path_with_namespace") for project in missing]
+        counts = await self.get_commit_counts([path for path in paths if path]) if any(paths) else {}
+        for project, path in zip(missing, paths):
+            project["stats"]["commit_count"] = counts.get(path, 0)
+
+    async def get_commit_counts(self, full_paths: list[str]) -> dict[str, int]:
+        """
+        Commit counts of many projects with batched GraphQL queries, one per
+        GRAPHQL_BATCH_SIZE projects. Returns {full_path: commit_count} for the
+        projects GitLab reported statistics for.
+        """
+        counts = {}
+        url = httpx.URL(f"{self.base_url}/api/graphql")
+        semaphore = self._semaphore_for(url)
+        for start in range(0, len(full_paths), GRAPHQL_BATCH_SIZE):
+            batch = full_paths[start:start + GRAPHQL_BATCH_SIZE]
+
+            async def send():
+                async with semaphore:
+                    return await self.client.post(
+                        url, json={"query": COMMIT_COUNT_QUERY, "variables": {"paths": batch, "first": len(batch)}}
+                    )
+
+            try:
+                response = await self.scheduler.send_async("POST", send)
+            except httpx.HTTPError as e:
+                print(f"⚠️ Failed to get commit counts: {e}")
+                continue
+            if response.status_code != 200:
+                print(f"⚠️ Failed to get commit counts: {response.status_code}")
+                continue
+            nodes = ((response.json().get("data") or {}).get("projects") or {}).get("nodes") or []
+            for node in nodes:
+                statistics = node.get("statistics") or {}
+                if statistics.get("commitCount") is not None:
+                    counts[node["fullPath"]] = int(statistics["commitCount"])
+        return counts
+
+    async def get_project_files(
+        self,
+        project_id: int,
+        ref: str = "main",
+        known_blobs=None,
+    ) -> tuple[dict[str, str], dict[str, str]]:
+        """
+        Fetch all text files of a project concurrently.
+
+        The repository tree is paginated in full. Blobs reported by
+        known_blobs(shas) as already stored are not downloaded again.
+        Returns ({path: content} of downloaded files, {path: blob_sha} of all files).
+        """
+        blob_shas = {}
+        pending = {}
+        fetches = {}
+
+        async def start_fetches():
+            # Ask the blob store once per batch which blobs it already has
+            known = await asyncio.to_thread(known_blobs, list(set(pending.values()))) if known_blobs else set()
+            for path, sha in pending.items():
+                if sha not in known:
+                    fetches[path] = asyncio.create_task(self.get_blob_content(project_id, sha, path))
+            pending.clear()
+
+        # Blob downloads start while later tree pages are still being listed
+        try:
+            async for item in self.paginate(
+                f"/projects/{project_id}/repository/tree",
+                params={"recursive": "true", "ref": ref, "pagination": "keyset"}
+            ):
+                path = item["path"]
+                if item["type"] != "blob" or not is_text_file(path):
+                    continue
+                blob_shas[path] = item["id"]
+                pending[path] = item["id"]
+                if len(pending) >= GITLAB_PAGE_SIZE:
+                    await start_fetches()
+            await start_fetches()
+        except BaseException as e:
+            for task in fetches.values():
+                task.cancel()
+            await asyncio.gather(*fetches.values(), return_exceptions=True)
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 404 and not blob_shas:
+                # GitLab answers 404 for the tree of an empty repository
+                return {}, {}
+            raise
+
+        contents = await asyncio.gather(*fetches.values())
+        files = {path: content for path, content in zip(fetches, contents) if content is not None}
+        failed = {path for path, content in zip(fetches, contents) if content is None}
+
+        print(f"📄 Project {project_id}: {len(blob_shas) - len(fetches)} files already stored, fetched {len(fetches)}")
+        return files, {path: sha for path, sha in blob_shas.items() if path not in failed}
+
+    async def get_project_files_from_archive(self, project_id: int, ref: str = "main") -> tuple[dict[str, str], dict[str, str]]:
+        """
+        Fetch all text files of a project with a single archive download.
+
+        The archive is decompressed in a worker thread while it downloads, so
+        neither the compressed nor the full archive is held in memory and only
+        matching files are ever expanded.
+        Returns ({path: content}, {path: blob_sha}).
+        """
+        response = await self._get(
+            f"/projects/{project_id}/repository/archive.tar.gz", params={"sha": ref}, stream=True
+        )
+        try:
+            if response.status_code == 404:
+                print(f"❌ Repository archive not found for project {project_id}")
+                return {}, {}
+            response.raise_for_status()
+            reader = ByteStreamReader(response.aiter_bytes(), asyncio.get_running_loop())
+            return await asyncio.to_thread(extract_text_files_from_archive, reader)
+        except tarfile.TarError as e:
+            print(f"❌ Invalid repository archive for project {project_id}: {e}")
+            return {}, {}
+        finally:
+            await response.aclose()
+
+    async def get_blob_content(self, project_id: int, blob_sha: str, file_path: str = "") -> str | None:
+        """
+        Fetch a single blob's raw content by its SHA. Returns None for missing or
+        binary blobs and raises if GitLab keeps failing after all retries.
+        """
+        response = await self._get(f"/projects/{project_id}/repository/blobs/{blob_sha}/raw")
+        self._raise_if_transient(response)
+        if response.status_code != 200:
+            print(f"⚠️ Failed to get file {file_path or blob_sha}: {response.status_code}")
+            return None
+        try:
+            return response.content.decode("utf-8")
+        except UnicodeDecodeError as e:
+            print(f"⚠️ Error getting file {file_path or blob_sha}: {e}")
+            return None
+
+
+def fetch_user_projects(user_token: str, previous: dict[int, dict] | None = None, known_blobs=None, progress=None, **engine_kwargs):
+    """Run a full concurrent project fetch from synchronous code"""
+    async def run():
+        async with GitlabSyncEngine(user_token, **engine_kwargs) as engine:
+            return await engine.fetch_user_projects(previous, known_blobs, progress)
+
+    return asyncio.run(run())
@@ -1,5 +1,6 @@
 from pymongo import MongoClient
 import os
+import threading
 from dotenv import load_dotenv
 import certifi
 
@@ -7,9 +8,60 @@ load_dotenv()
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
 DB_NAME = os.getenv("DB_NAME", "MasterUIB")
 
+# Connection pool settings for the shared client
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE") or 100)
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE") or 0)
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS") or 300_000)
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS") or 10_000)
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS") or 10_000)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS") or 10_000)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def pool_options():
+    """Connection pool settings shared by the sync and async clients"""
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    }
+
+
+def create_client(uri=MONGO_URI):
+    """Create a MongoClient with the configured pool settings"""
+    return MongoClient(uri, **pool_options())
+
+
+def get_client():
+    """
+    Get the process-wide MongoClient. It is created by the app lifespan on
+    startup, or lazily on first use outside the app (scripts, workers).
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_client()
+    return _client
+
+
+def close_client():
+    """Close the shared client, the next get_client() call creates a new one"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
 def get_db_connection(db_name=None):
-    """Get MongoDB client connection"""
-    client = MongoClient(MONGO_URI)
+    """Get a database from the shared MongoDB client"""
+    client = get_client()
     if db_name:
         return client[db_name]
     return client[DB_NAME]
@@ -21,4 +73,3 @@ def get_collection(collection_name, db):
 
 
 # Create a new client and connect to the serve
-
@@ -0,0 +1,161 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+
+from backend.mongodb import MongoDB
+
+load_dotenv()
+
+# "native" uses PyMongo's AsyncMongoClient, "thread" runs the sync client in worker threads
+MONGO_ASYNC_DRIVER = os.getenv("MONGO_ASYNC_DRIVER", "native")
+
+_async_client = None
+# The event loop the AsyncMongoClient was created on, it cannot be used from another one
+_async_client_loop = None
+
+
+def get_async_client():
+    """
+    Get the process-wide AsyncMongoClient, created with the same pool settings
+    as the sync client. It is bound to the event loop it is created on: the app
+    lifespan opens it on the server's loop, and it is only ever used from there.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None:
+        from pymongo import AsyncMongoClient
+
+        _async_client = AsyncMongoClient(MongoDB.MONGO_URI, **MongoDB.pool_options())
+        _async_client_loop = loop
+    elif _async_client_loop is not loop:
+        raise RuntimeError(
+            "The AsyncMongoClient belongs to the server's event loop. Code running in "
+            "asyncio.run or a worker thread has to use the sync client (MongoDB.get_db_connection)."
+        )
+    return _async_client
+
+
+async def open_async_client():
+    """Create the AsyncMongoClient on the running loop and start its connection pool"""
+    client = get_async_client()
+    await client.aconnect()
+    return client
+
+
+async def close_async_client():
+    global _async_client, _async_client_loop
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+        _async_client_loop = None
+
+
+def get_async_db_connection(db_name=None):
+    """
+    Get a database whose collection methods are coroutines.
+
+    With the native driver this is an AsyncMongoClient database. With the
+    thread driver it is a ThreadedDatabase wrapping get_db_connection, which
+    gives the same async interface on top of any sync client (including mongomock).
+    """
+    if MONGO_ASYNC_DRIVER == "thread":
+        return ThreadedDatabase(MongoDB.get_db_connection(db_name))
+    client = get_async_client()
+    return client[db_name or MongoDB.DB_NAME]
+
+
+class ThreadedDatabase:
+    """Sync facade: a pymongo Database whose collections are ThreadedCollections"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __getitem__(self, name: str):
+        return ThreadedCollection(self.db[name])
+
+    @property
+    def name(self):
+        return self.db.name
+
+
+class ThreadedCollection:
+    """
+    Sync facade with the AsyncCollection interface the services use.
+    Every call runs the wrapped pymongo collection method in a worker thread.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    @property
+    def name(self):
+        return self.collection.name
+
+    def find(self, *args, **kwargs):
+        return ThreadedCursor(self.collection, args, kwargs)
+
+    async def aggregate(self, pipeline, **kwargs):
+        cursor = await asyncio.to_thread(self.collection.aggregate, pipeline, **kwargs)
+        return ThreadedCursor.from_results(cursor)
+
+    def __getattr__(self, name: str):
+        method = getattr(self.collection, name)
+        if not callable(method):
+            return method
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        return call
+
+
+class ThreadedCursor:
+    """find() cursor of a ThreadedCollection, supporting sort/skip/limit and to_list"""
+
+    def __init__(self, collection, args=(), kwargs=None):
+        self.collection = collection
+        self.args = args
+        self.kwargs = kwargs or {}
+        self.modifiers = []
+        self.results = None
+
+    @classmethod
+    def from_results(cls, results):
+        cursor = cls(None)
+        cursor.results = results
+        return cursor
+
+    def sort(self, *args, **kwargs):
+        self.modifiers.append(("sort", args, kwargs))
+        return self
+
+    def skip(self, *args):
+        self.modifiers.append(("skip", args, {}))
+        return self
+
+    def limit(self, *args):
+        self.modifiers.append(("limit", args, {}))
+        return self
+
+    def _run(self, length=None):
+        if self.results is not None:
+            results = self.results
+        else:
+            results = self.collection.find(*self.args, **self.kwargs)
+            for name, args, kwargs in self.modifiers:
+                results = getattr(results, name)(*args, **kwargs)
+        documents = []
+        for document in results:
+            if length is not None and len(documents) >= length:
+                break
+            documents.append(document)
+        return documents
+
+    async def to_list(self, length=None):
+        return await asyncio.to_thread(self._run, length)
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in await self.to_list():
+            yield document
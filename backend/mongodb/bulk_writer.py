@@ -0,0 +1,102 @@
+import os
+from typing import Dict, Iterable, List, Tuple
+
+import bson
+from dotenv import load_dotenv
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+load_dotenv()
+
+# Largest BSON document MongoDB accepts
+MAX_BSON_SIZE = 16 * 1024 * 1024
+# Batches stay below the BSON limit so one command never carries more than a document's worth of data
+MONGO_BULK_MAX_BYTES = int(os.getenv("MONGO_BULK_MAX_BYTES") or MAX_BSON_SIZE - 1024 * 1024)
+MONGO_BULK_MAX_OPS = int(os.getenv("MONGO_BULK_MAX_OPS") or 1000)
+
+
+class BulkWriter:
+    """
+    Batches writes to one collection into unordered bulk_write calls.
+
+    Operations are grouped into batches below max_batch_bytes of BSON and
+    max_batch_size operations. Unordered batches keep going past a failing
+    item, and every failure is reported with the index of the item in the
+    caller's input, so one bad document never loses the rest of the batch.
+    """
+
+    def __init__(self, collection, max_batch_bytes: int = MONGO_BULK_MAX_BYTES, max_batch_size: int = MONGO_BULK_MAX_OPS):
+        self.collection = collection
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_size = max_batch_size
+
+    def update_many(self, updates: Iterable[Tuple[Dict, Dict]], upsert: bool = False) -> Dict:
+        """
+        Apply (filter, update) pairs, one UpdateOne each.
+
+        Returns:
+            dict: matched/modified/upserted counts and a "failed" list of
+            {"index", "code", "message"} for items that were not written
+        """
+        operations = []
+        sizes = []
+        for query, update in updates:
+            operations.append(UpdateOne(query, update, upsert=upsert))
+            sizes.append(len(bson.encode(query)) + len(bson.encode(update)))
+        return self._write(operations, sizes)
+
+    def insert_many(self, documents: Iterable[Dict]) -> Dict:
+        """Insert documents, reporting failures the same way as update_many"""
+        operations = []
+        sizes = []
+        for document in documents:
+            operations.append(InsertOne(document))
+            sizes.append(len(bson.encode(document)))
+        return self._write(operations, sizes)
+
+    def _write(self, operations: List, sizes: List[int]) -> Dict:
+        report = {"inserted": 0, "matched": 0, "modified": 0, "upserted": 0, "batches": 0, "failed": []}
+        for indexes in self._batches(sizes, report["failed"]):
+            report["batches"] += 1
+            try:
+                result = self.collection.bulk_write([operations[i] for i in indexes], ordered=False)
+                details = result.bulk_api_result
+            except BulkWriteError as e:
+                details = e.details
+                for error in details.get("writeErrors", []):
+                    report["failed"].append({
+                        "index": indexes[error["index"]],
+                        "code": error.get("code"),
+                        "message": error.get("errmsg"),
+                    })
+            except PyMongoError as e:
+                print(f"❌ Bulk write of {len(indexes)} operations failed: {e}")
+                report["failed"].extend({"index": i, "code": None, "message": str(e)} for i in indexes)
+                continue
+
+            report["inserted"] += details.get("nInserted", 0)
+            report["matched"] += details.get("nMatched", 0)
+            report["modified"] += details.get("nModified", 0)
+            report["upserted"] += details.get("nUpserted", 0)
+
+        report["failed"].sort(key=lambda failure: failure["index"])
+        if report["failed"]:
+            print(f"⚠️ {len(report['failed'])} of {len(operations)} writes to {self.collection.name} failed")
+        return report
+
+    def _batches(self, sizes: List[int], failed: List[Dict]):
+        """Yield lists of operation indexes; items too large for a BSON document are reported as failed"""
+        batch = []
+        batch_bytes = 0
+        for index, size in enumerate(sizes):
+            if size > MAX_BSON_SIZE:
+                failed.append({"index": index, "code": 10334, "message": f"Document of {size} bytes exceeds the BSON size limit"})
+                continue
+            if batch and (batch_bytes + size > self.max_batch_bytes or len(batch) >= self.max_batch_size):
+                yield batch
+                batch = []
+                batch_bytes = 0
+            batch.append(index)
+            batch_bytes += size
+        if batch:
+            yield batch
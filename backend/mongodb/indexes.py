@@ -0,0 +1,119 @@
+"""
+Index declarations for the "students" database.
+
+ensure_indexes() creates every declared index and is run by the app lifespan
+on startup. find_collscans() explains the hot queries and reports the ones
+MongoDB answers with a collection scan:
+
+    python -m backend.mongodb.indexes            # create indexes, then check
+    python -m backend.mongodb.indexes --check    # only check
+"""
+import sys
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from backend.ai.response_cache import AI_RESPONSE_CACHE_TTL
+from backend.ai.session_store import ASSISTANT_SESSION_TTL
+from backend.gitlab.http_cache import GITLAB_HTTP_CACHE_TTL
+from backend.mongodb.MongoDB import get_db_connection
+
+# Indexes of the shared collections, by collection name
+INDEXES = {
+    # Queries are always scoped to one student, so the index doubles as the shard key
+    "projects": [IndexModel([("student_id", ASCENDING), ("project_id", ASCENDING)], unique=True, name="student_id_project_id_unique")],
+    "blob_chunks": [IndexModel([("sha", ASCENDING), ("n", ASCENDING)], name="sha_n")],
+    "student_registry": [IndexModel([("gitlab_username", ASCENDING)], unique=True, name="gitlab_username_unique")],
+    "suggested_tasks": [IndexModel([("student_id", ASCENDING), ("created_at", ASCENDING)], name="student_id_created_at")],
+    "code_analyses": [IndexModel([("student_id", ASCENDING)], unique=True, name="student_id_unique")],
+    "editor_state": [IndexModel([("user_id", ASCENDING)], unique=True, name="user_id_unique")],
+    "pre_survey": [IndexModel([("participant_id", ASCENDING)], name="participant_id")],
+    "post_survey": [IndexModel([("participant_id", ASCENDING)], name="participant_id")],
+    "task_result": [IndexModel([("participant_id", ASCENDING)], name="participant_id")],
+    "overall_survey": [IndexModel([("participant_id", ASCENDING)], name="participant_id")],
+    "survey_sessions": [IndexModel([("participant_id", ASCENDING)], name="participant_id")],
+    # One queued or running job per student, the key is removed when the job finishes
+    "sync_jobs": [
+        IndexModel([("active_key", ASCENDING)], unique=True, sparse=True, name="active_key_1"),
+        IndexModel([("student_id", ASCENDING), ("created_at", DESCENDING)], name="student_id_1_created_at_-1"),
+    ],
+    # Caches and idle sessions expire through TTL indexes
+    "ai_response_cache": [IndexModel([("last_used_at", ASCENDING)], expireAfterSeconds=AI_RESPONSE_CACHE_TTL, name="last_used_at_ttl")],
+    "assistant_sessions": [IndexModel([("updated_at", ASCENDING)], expireAfterSeconds=ASSISTANT_SESSION_TTL, name="updated_at_ttl")],
+    "gitlab_http_cache": [IndexModel([("last_used_at", ASCENDING)], expireAfterSeconds=GITLAB_HTTP_CACHE_TTL, name="last_used_at_1")],
+}
+
+# Queries run on every page load, as (collection, filter)
+HOT_QUERIES = [
+    ("projects", {"student_id": "x"}),
+    ("student_registry", {"gitlab_username": "x"}),
+    ("suggested_tasks", {"student_id": "x"}),
+    ("code_analyses", {"student_id": "x"}),
+    ("editor_state", {"user_id": "x"}),
+    ("pre_survey", {"participant_id": "x"}),
+    ("post_survey", {"participant_id": "x"}),
+    ("task_result", {"participant_id": "x"}),
+    ("overall_survey", {"participant_id": "x"}),
+    ("survey_sessions", {"participant_id": "x"}),
+    ("sync_jobs", {"active_key": "x"}),
+]
+
+
+def ensure_indexes(db=None) -> int:
+    """
+    Create all declared indexes. Creating an index that already exists is a no-op.
+    Returns the number of collections that were indexed.
+    """
+    db = db if db is not None else get_db_connection("students")
+    for name, indexes in INDEXES.items():
+        _create(db[name], indexes)
+    print(f"🗂️ Ensured indexes on {len(INDEXES)} collections")
+    return len(INDEXES)
+
+
+def plan_stages(plan: dict) -> list[str]:
+    """All stage names of an explain() plan tree, outermost first"""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for child in [plan.get("inputStage"), *plan.get("inputStages", [])]:
+        if child:
+            stages.extend(plan_stages(child))
+    if "queryPlan" in plan:
+        stages.extend(plan_stages(plan["queryPlan"]))
+    return stages
+
+
+def winning_stages(explain: dict) -> list[str]:
+    return plan_stages(explain["queryPlanner"]["winningPlan"])
+
+
+def find_collscans(db=None) -> list[dict]:
+    """
+    Explain every hot query and return {"collection", "filter", "stages"} for
+    the ones whose winning plan contains a COLLSCAN.
+    """
+    db = db if db is not None else get_db_connection("students")
+    collscans = []
+    for name, query in HOT_QUERIES:
+        stages = winning_stages(db[name].find(query).explain())
+        if "COLLSCAN" in stages:
+            collscans.append({"collection": name, "filter": query, "stages": stages})
+    return collscans
+
+
+def _create(collection, indexes):
+    try:
+        collection.create_indexes(indexes)
+    except OperationFailure as e:
+        # Usually duplicates in old data for a unique index, the app keeps working without it
+        print(f"⚠️ Could not create indexes on {collection.name}: {e}")
+
+
+if __name__ == "__main__":
+    if "--check" not in sys.argv:
+        ensure_indexes()
+    found = find_collscans()
+    for collscan in found:
+        print(f"❌ COLLSCAN on {collscan['collection']} for {collscan['filter']}: {' -> '.join(collscan['stages'])}")
+    if not found:
+        print("✅ No collection scans on hot queries")
+    sys.exit(1 if found else 0)
@@ -0,0 +1,88 @@
+"""
+Moves projects from the old one-collection-per-student layout into the
+unified "projects" collection.
+
+Every document is copied with its student_id added and keyed by
+(student_id, project_id). A project that already exists in "projects" (for
+example because the student synced during the migration) is left as is. Each
+legacy collection is dropped once all of its documents are copied. The
+migration is idempotent, so it can run in the background on every startup:
+
+    python -m backend.mongodb.project_migration
+
+"projects" is ready to be sharded on the same key:
+
+    sh.shardCollection("students.projects", {student_id: 1, project_id: 1})
+"""
+import re
+import threading
+
+from pymongo import UpdateOne
+
+from backend.mongodb.MongoDB import get_db_connection
+
+PROJECTS_COLLECTION = "projects"
+MIGRATION_BATCH_SIZE = 500
+# Legacy project collections are named by the student's uuid
+STUDENT_COLLECTION_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+def is_legacy_student_collection(name: str) -> bool:
+    return bool(STUDENT_COLLECTION_PATTERN.match(name))
+
+
+def migrate_student(db, student_id: str, drop: bool = True) -> int:
+    """
+    Copy one student's legacy collection into "projects".
+    Returns the number of documents that were copied.
+    """
+    if student_id not in db.list_collection_names():
+        return 0
+
+    projects = db[PROJECTS_COLLECTION]
+    copied = 0
+    batch = []
+    for doc in db[student_id].find({}):
+        doc.pop("_id", None)
+        doc["student_id"] = student_id
+        batch.append(UpdateOne(
+            {"student_id": student_id, "project_id": doc.get("project_id")},
+            {"$setOnInsert": doc},
+            upsert=True
+        ))
+        if len(batch) >= MIGRATION_BATCH_SIZE:
+            copied += projects.bulk_write(batch, ordered=False).upserted_count
+            batch = []
+    if batch:
+        copied += projects.bulk_write(batch, ordered=False).upserted_count
+
+    if drop:
+        db[student_id].drop()
+    print(f"📦 Migrated {copied} projects of student {student_id}")
+    return copied
+
+
+def migrate_all(db=None, drop: bool = True) -> dict:
+    """Migrate every legacy per-student collection, returning {student_id: copied}"""
+    db = db if db is not None else get_db_connection("students")
+    results = {}
+    for name in db.list_collection_names():
+        if is_legacy_student_collection(name):
+            try:
+                results[name] = migrate_student(db, name, drop=drop)
+            except Exception as e:
+                print(f"❌ Failed to migrate projects of student {name}: {e}")
+    if results:
+        print(f"✅ Migrated {len(results)} student collections into {PROJECTS_COLLECTION}")
+    return results
+
+
+def start_background_migration(db=None) -> threading.Thread:
+    """Run migrate_all in a daemon thread so startup is not delayed"""
+    thread = threading.Thread(target=migrate_all, args=(db,), name="project-migration", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    migrate_all()
@@ -0,0 +1,178 @@
+"""
+Compression of stored source files.
+
+File bodies in the blob store and the editor state are written through
+StorageCodec.pack() and read through StorageCodec.unpack(). Bodies below
+STORAGE_CODEC_MIN_BYTES, and everything when STORAGE_CODEC=none, are kept as
+plain strings. Larger ones are stored as compressed bytes next to a "codec"
+field, so documents written with any codec (or none) stay readable.
+
+zlib is the default since it needs nothing beyond the standard library.
+STORAGE_CODEC=zstd compresses faster and smaller but needs the zstandard
+package (pip install zstandard); without it zlib is used. A zstd dictionary
+trained on the stored blobs compresses the boilerplate shared by a cohort's
+projects much better than per-file compression:
+
+    python -m backend.mongodb.storage_codec train --samples 2000
+
+New writes use the latest trained dictionary. Every process looks for a newer
+one every STORAGE_CODEC_DICTIONARY_REFRESH seconds, so a dictionary trained
+from the CLI is picked up without a restart. Dictionaries are never deleted,
+since blobs refer to the one they were written with.
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from bson import Binary
+from dotenv import load_dotenv
+
+from backend.mongodb.MongoDB import get_db_connection
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+load_dotenv()
+
+# "zstd", "zlib" or "none"
+STORAGE_CODEC = os.getenv("STORAGE_CODEC", "zlib")
+STORAGE_CODEC_LEVEL = int(os.getenv("STORAGE_CODEC_LEVEL") or 6)
+STORAGE_CODEC_MIN_BYTES = int(os.getenv("STORAGE_CODEC_MIN_BYTES") or 256)
+DICTIONARY_SIZE = int(os.getenv("STORAGE_CODEC_DICTIONARY_SIZE") or 112 * 1024)
+# Seconds between checks for a newly trained dictionary
+DICTIONARY_REFRESH = float(os.getenv("STORAGE_CODEC_DICTIONARY_REFRESH") or 300)
+CODEC_FIELDS = ("codec", "dict_id")
+
+
+class StorageCodec:
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, db=None, codec: str = STORAGE_CODEC, level: int = STORAGE_CODEC_LEVEL):
+        self.db = db if db is not None else get_db_connection("students")
+        self.dictionaries = self.db["codec_dictionaries"]
+        if codec == "zstd" and zstandard is None:
+            print("⚠️ zstandard is not installed, compressing stored files with zlib")
+            codec = "zlib"
+        if codec not in ("zstd", "zlib", "none"):
+            raise ValueError(f"Unknown storage codec {codec!r}")
+        self.codec = codec
+        self.level = level
+        self._loaded = {}
+        self._active_dict_id = None
+        self._active_checked_at = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def encode(self, text: str) -> dict:
+        """Stored fields for a file body: {"content"} and, when compressed, {"codec", "dict_id"}"""
+        data = text.encode("utf-8")
+        if self.codec == "none" or len(data) < STORAGE_CODEC_MIN_BYTES:
+            return {"content": text}
+        if self.codec == "zlib":
+            return {"content": Binary(zlib.compress(data, self.level)), "codec": "zlib"}
+
+        dict_id = self._active_dictionary()
+        compressor = zstandard.ZstdCompressor(level=self.level, dict_data=self._dictionary(dict_id) if dict_id else None)
+        fields = {"content": Binary(compressor.compress(data)), "codec": "zstd"}
+        if dict_id:
+            fields["dict_id"] = dict_id
+        return fields
+
+    def decode(self, fields: dict) -> str:
+        """File body from stored fields written by encode(), with any codec"""
+        content = fields["content"]
+        codec = fields.get("codec")
+        if codec is None:
+            return content if isinstance(content, str) else bytes(content).decode("utf-8")
+        if codec == "zlib":
+            return zlib.decompress(content).decode("utf-8")
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read files stored with zstd")
+            dict_id = fields.get("dict_id")
+            decompressor = zstandard.ZstdDecompressor(dict_data=self._dictionary(dict_id) if dict_id else None)
+            return decompressor.decompress(content).decode("utf-8")
+        raise ValueError(f"Unknown storage codec {codec!r}")
+
+    def pack(self, doc: dict, field: str = "content") -> dict:
+        """Copy of doc with its text field encoded"""
+        fields = self.encode(doc[field])
+        packed = {key: value for key, value in doc.items() if key not in CODEC_FIELDS}
+        packed[field] = fields.pop("content")
+        packed.update(fields)
+        return packed
+
+    def unpack(self, doc: dict, field: str = "content") -> dict:
+        """Copy of a packed doc with its text field decoded and the codec fields removed"""
+        if field not in doc:
+            return doc
+        unpacked = {key: value for key, value in doc.items() if key not in CODEC_FIELDS}
+        unpacked[field] = self.decode({**doc, "content": doc[field]})
+        return unpacked
+
+    def train_dictionary(self, samples: list[str], size: int = DICTIONARY_SIZE) -> str:
+        """Train a zstd dictionary on the samples, store it and use it for new writes"""
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to train a dictionary")
+        dictionary = zstandard.train_dictionary(size, [sample.encode("utf-8") for sample in samples])
+        data = dictionary.as_bytes()
+        dict_id = hashlib.sha1(data).hexdigest()[:16]
+        self.dictionaries.update_one(
+            {"_id": dict_id},
+            {"$setOnInsert": {"data": Binary(data), "samples": len(samples), "created_at": datetime.utcnow()}},
+            upsert=True
+        )
+        self._loaded[dict_id] = dictionary
+        self._active_dict_id = dict_id
+        self._active_checked_at = time.monotonic()
+        print(f"📚 Trained storage dictionary {dict_id} ({len(data)} bytes) on {len(samples)} files")
+        return dict_id
+
+    def _active_dictionary(self) -> str | None:
+        now = time.monotonic()
+        if self._active_checked_at is None or now - self._active_checked_at >= DICTIONARY_REFRESH:
+            latest = self.dictionaries.find_one({}, {"_id": 1}, sort=[("created_at", -1)])
+            self._active_dict_id = latest["_id"] if latest else None
+            self._active_checked_at = now
+        return self._active_dict_id
+
+    def _dictionary(self, dict_id: str):
+        if dict_id not in self._loaded:
+            doc = self.dictionaries.find_one({"_id": dict_id})
+            if doc is None:
+                raise LookupError(f"Storage dictionary {dict_id} not found")
+            self._loaded[dict_id] = zstandard.ZstdCompressionDict(bytes(doc["data"]))
+        return self._loaded[dict_id]
+
+
+def sample_blobs(db, limit: int) -> list[str]:
+    """Random file bodies from the blob store, decoded"""
+    codec = StorageCodec.get_instance()
+    samples = []
+    for doc in db["blobs"].aggregate([{"$match": {"content": {"$exists": True}}}, {"$sample": {"size": limit}}]):
+        samples.append(codec.decode(doc))
+    return samples
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--size", type=int, default=DICTIONARY_SIZE)
+    args = parser.parse_args()
+
+    db = get_db_connection("students")
+    StorageCodec.get_instance().train_dictionary(sample_blobs(db, args.samples), args.size)
@@ -1,8 +1,13 @@
+import asyncio
+import json
+import uuid
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from backend.analyzer.project_analyzer import ProjectAnalyzer
 from backend.models.promt import AssistantRequest, AssistantResponse, SystemMessageRequest, SessionRequest
 from backend.ai.assistant import Assistant
 from backend.ai.session_assistant import SessionAssistantManager
+from backend.ai.ai_analyzer import AIAnalyzer
 from backend.analyzer.ai_project_analyzer import AIProjectAnalyzer
 from backend.dependencies import get_current_user
 
@@ -17,7 +22,7 @@ async def analyze_student_projects(student_id: str, current_user = Depends(get_c
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
         analyzer = AIProjectAnalyzer(student_id)
-        analysis = analyzer.analyze_and_store_student_projects()
+        analysis = await analyzer.analyze_and_store_student_projects()
         return {"analysis": analysis}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -31,7 +36,7 @@ async def suggest_projects(student_id: str, current_user = Depends(get_current_u
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
         analyzer = AIProjectAnalyzer(student_id)
-        suggestions = analyzer.create_project_suggestions()
+        suggestions = await analyzer.create_project_suggestions()
         return {"suggestions": suggestions}
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
@@ -47,11 +52,21 @@ async def get_suggestions(student_id: str, current_user = Depends(get_current_us
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
         analyzer = AIProjectAnalyzer(student_id)
-        suggestions = analyzer.get_project_suggestions()
+        suggestions = await analyzer.get_project_suggestions()
         return {"suggestions": suggestions}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/ai/cache/stats")
+async def get_ai_cache_stats(current_user = Depends(get_current_user)):
+    """
+    Hit/miss counters of the AI response cache in this process.
+    """
+    cache = AIAnalyzer.get_instance().cache
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **await cache.stats()}
+
 @router.post("/assistant/add-system-message")
 async def add_system_message(request: SystemMessageRequest, current_user = Depends(get_current_user)):
     """
@@ -64,8 +79,8 @@ async def add_system_message(request: SystemMessageRequest, current_user = Depen
         # Use user ID as default session if none provided
         session_id = request.session_id or f"user_{current_user['id']}_default"
         
-        session_assistant.get_or_create_session(session_id)
-        session_assistant.add_system_message(session_id, request.message)
+        await session_assistant.get_or_create_session(session_id)
+        await session_assistant.add_system_message(session_id, request.message)
         
         return {"message": "System message added", "session_id": session_id}
     except Exception as e:
@@ -80,7 +95,7 @@ async def delete_all_suggestions(student_id: str, current_user = Depends(get_cur
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
         analyzer = AIProjectAnalyzer(student_id)
-        result = analyzer.delete_all_project_suggestions()
+        result = await analyzer.delete_all_project_suggestions()
         return {"message": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -94,7 +109,7 @@ async def get_stored_analysis(student_id: str, current_user = Depends(get_curren
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
         analyzer = AIProjectAnalyzer(student_id)
-        analysis = analyzer.get_stored_analysis()
+        analysis = await analyzer.get_stored_analysis()
 
         if analysis:
             return {"analysis": analysis}
@@ -112,7 +127,7 @@ async def delete_suggestion(student_id: str, suggestion_id: str, current_user =
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
         analyzer = AIProjectAnalyzer(student_id)
-        result = analyzer.delete_project_suggestions(suggestion_id)
+        result = await analyzer.delete_project_suggestions(suggestion_id)
         return {"message": result}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -129,7 +144,7 @@ async def clear_assistant_messages(request: SessionRequest, current_user = Depen
         # Use user ID as default session if none provided
         session_id = request.session_id or f"user_{current_user['id']}_default"
         
-        session_assistant.clear_session(session_id, request.system_message)
+        await session_assistant.clear_session(session_id, request.system_message)
         
         return {"message": "Assistant messages cleared", "session_id": session_id}
     except Exception as e:
@@ -148,13 +163,55 @@ async def get_assistant_response(request: AssistantRequest, current_user = Depen
         session_id = request.session_id or f"user_{current_user['id']}_default"
         
         # Create session if it doesn't exist (with default system prompt)
-        session_assistant.get_or_create_session(session_id)
+        await session_assistant.get_or_create_session(session_id)
         
-        response = session_assistant.get_assistant_response(session_id, request.prompt, request.code)
+        response = await session_assistant.get_assistant_response(session_id, request.prompt, request.code)
         return AssistantResponse(response=response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/assistant/stream")
+async def stream_assistant_response(request: AssistantRequest, current_user = Depends(get_current_user)):
+    """
+    Stream the assistant response for a session as Server-Sent Events.
+
+    Sends a "token" event per chunk of text, then "done" with the full reply,
+    or "error" if the completion failed.
+    """
+    session_assistant = SessionAssistantManager.get_instance().get_assistant()
+    session_id = request.session_id or f"user_{current_user['id']}_default"
+    await session_assistant.get_or_create_session(session_id)
+
+    async def events():
+        parts = []
+        try:
+            async for token in session_assistant.stream_assistant_response(session_id, request.prompt, request.code):
+                parts.append(token)
+                yield _sse("token", {"token": token})
+        except asyncio.TimeoutError:
+            print(f"⏱️ Assistant stream timed out for session {session_id}")
+            yield _sse("error", {"detail": "I'm sorry, that took too long. Please try again."})
+            return
+        except Exception as e:
+            print(f"Error streaming assistant response: {e}")
+            yield _sse("error", {"detail": "I'm sorry, I encountered an error. Please try again."})
+            return
+        yield _sse("done", {"response": "".join(parts).strip(), "session_id": session_id})
+
+    # No caching or proxy buffering, tokens have to reach the browser as they are sent
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+@router.get("/assistant/sessions/stats")
+async def get_assistant_session_stats(current_user = Depends(get_current_user)):
+    """
+    Gauges of the assistant session store.
+    """
+    return await SessionAssistantManager.get_instance().get_assistant().store.stats()
+
 @router.post("/assistant/create-session")
 async def create_assistant_session(request: SessionRequest, current_user = Depends(get_current_user)):
     """
@@ -165,8 +222,8 @@ async def create_assistant_session(request: SessionRequest, current_user = Depen
         session_assistant = session_manager.get_assistant()
         
         # Generate session ID if not provided
-        session_id = request.session_id or f"user_{current_user['id']}_survey_{len(session_assistant.list_sessions())}"
-        session_id = session_assistant.create_session(session_id, request.system_message)
+        session_id = request.session_id or f"user_{current_user['id']}_survey_{uuid.uuid4().hex}"
+        session_id = await session_assistant.create_session(session_id, request.system_message)
         
         return {"session_id": session_id, "message": "Session created successfully"}
     except Exception as e:
@@ -181,7 +238,7 @@ async def delete_assistant_session(session_id: str, current_user = Depends(get_c
         session_manager = SessionAssistantManager.get_instance()
         session_assistant = session_manager.get_assistant()
         
-        session_assistant.delete_session(session_id)
+        await session_assistant.delete_session(session_id)
         
         return {"message": "Session deleted successfully"}
     except Exception as e:
@@ -198,7 +255,8 @@ async def analyze_student_projects(student_id: str, current_user = Depends(get_c
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
         project_analyzer = ProjectAnalyzer()
-        feedback = project_analyzer.analyze_student_projects(student_id)
+        # The rule-based analyzer talks to GitLab synchronously, keep it off the event loop
+        feedback = await asyncio.to_thread(project_analyzer.analyze_student_projects, student_id)
         return feedback
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -43,7 +43,7 @@ async def auth_callback(
 
     if user_info and gitlab_access_token:
         # Create student record (no token storage in DB)
-        student = student_service.get_or_create_student(
+        student = await student_service.get_or_create_student(
             gitlab_username=user_info.get('preferred_username')
         )
         
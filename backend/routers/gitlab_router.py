@@ -1,46 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
 from backend.gitlab.gitlab_service import GitlabService
+from backend.services.blob_service import build_manifest
+from backend.services.project_stats_service import ProjectStatsService
 from backend.dependencies import get_current_user
 
 router = APIRouter()
 
 @router.get("/student/{student_id}/projects", tags=["GitLab"])
 async def get_student_projects(student_id: str, gitlab_service: GitlabService = Depends(GitlabService), current_user = Depends(get_current_user)):
-    """Get all stored projects for a student"""
+    """
+    Get all stored projects for a student with their file manifests.
+    File contents are not included, fetch them per project from /files.
+    """
     if current_user["id"] != student_id:
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
-        collection = gitlab_service.get_student_collection(student_id)
-        projects = list(collection.find({}, {'_id': 0}))
+        collection = gitlab_service.get_projects_collection()
+        # The projects collection is sync, it is read in a worker thread to keep the event loop free
+        projects = await asyncio.to_thread(
+            lambda: list(collection.find({"student_id": student_id}, {'_id': 0, 'files': 0}))
+        )
+        for project in projects:
+            # Projects synced before manifests existed get one from their path -> sha map
+            if "manifest" not in project:
+                project["manifest"] = build_manifest(project.pop("file_shas", None) or {}, {})
         return {"student_id": student_id, "projects": projects}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
 
+@router.get("/student/{student_id}/projects/{project_id}/files", tags=["GitLab"])
+async def get_student_project_files(
+    student_id: str,
+    project_id: int,
+    path: list[str] | None = Query(default=None),
+    gitlab_service: GitlabService = Depends(GitlabService),
+    current_user = Depends(get_current_user)
+):
+    """Load the contents of the given files of one project, or of all its files if no path is given"""
+    if current_user["id"] != student_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    collection = gitlab_service.get_projects_collection()
+    project = await asyncio.to_thread(collection.find_one, {"student_id": student_id, "project_id": project_id}, {'_id': 0})
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    try:
+        # Reading blobs decompresses them, which is done off the event loop too
+        files = await asyncio.to_thread(gitlab_service.blob_service.load_files, project, paths=path)
+        return {"project_id": project_id, "files": files}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/student/{student_id}/projects/count", tags=["GitLab"])
-async def get_student_projects_count(student_id: str, gitlab_service: GitlabService = Depends(GitlabService), current_user = Depends(get_current_user)):
+async def get_student_projects_count(student_id: str, stats_service: ProjectStatsService = Depends(ProjectStatsService), current_user = Depends(get_current_user)):
     """Get the number of projects for a student"""
     if current_user["id"] != student_id:
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
-        collection = gitlab_service.get_student_collection(student_id)
-        count = collection.count_documents({})
+        count = await stats_service.count_projects(student_id)
         return {"count": count}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/student/{student_id}/files/count", tags=["GitLab"])
-async def get_student_files_count(student_id: str, gitlab_service: GitlabService = Depends(GitlabService), current_user = Depends(get_current_user)):
+async def get_student_files_count(student_id: str, stats_service: ProjectStatsService = Depends(ProjectStatsService), current_user = Depends(get_current_user)):
     """Get the total number of files across all stored projects for a student."""
     if current_user["id"] != student_id:
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
-        collection = gitlab_service.get_student_collection(student_id)
-        total = 0
-        for doc in collection.find({}, {"files": 1, "stats.file_count": 1, "_id": 0}):
-            if isinstance(doc.get("files"), dict):
-                total += len(doc["files"])
-            elif isinstance(doc.get("stats"), dict) and isinstance(doc["stats"].get("file_count"), int):
-                total += int(doc["stats"]["file_count"])
-        return {"count": total}
+        count = await stats_service.count_files(student_id)
+        return {"count": count}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e)) 
+
+@router.get("/student/{student_id}/projects/stats", tags=["GitLab"])
+async def get_student_projects_stats(student_id: str, stats_service: ProjectStatsService = Depends(ProjectStatsService), current_user = Depends(get_current_user)):
+    """File counts, sizes and language totals of a student's projects, computed in MongoDB"""
+    if current_user["id"] != student_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        return await stats_service.get_stats(student_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/gitlab/cache/stats", tags=["GitLab"])
+async def get_gitlab_cache_stats(gitlab_service: GitlabService = Depends(GitlabService), current_user = Depends(get_current_user)):
+    """Hit-rate counters of the GitLab conditional-request cache in this process"""
+    if gitlab_service.http_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **gitlab_service.http_cache.stats()}
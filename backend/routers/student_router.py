@@ -6,7 +6,8 @@ from backend.services.suggestion_service import SuggestionService
 from backend.models.suggestion import SuggestionInDB
 from typing import List, Optional, Dict
 from backend.models.editor_state import SaveEditorStateRequest, EditorStateResponse
-from backend.mongodb.MongoDB import get_db_connection
+from backend.mongodb.async_db import get_async_db_connection
+from backend.mongodb.storage_codec import StorageCodec
 from backend.dependencies import get_current_user
 import os
 router = APIRouter()
@@ -18,7 +19,7 @@ class StudentSyncRequest(BaseModel):
     gitlab_username: str
 
 @router.get("/students/{student_id}/suggestions", response_model=List[SuggestionInDB], tags=["Students", "Suggestions"])
-def get_student_suggestions(
+async def get_student_suggestions(
     student_id: str,
     suggestion_service: SuggestionService = Depends(SuggestionService),
     current_user: Dict[str, str] = Depends(get_current_user)
@@ -28,12 +29,12 @@ def get_student_suggestions(
     """
     if current_user["id"] != student_id:
         raise HTTPException(status_code=403, detail="Forbidden")
-    suggestions = suggestion_service.get_all_for_student(student_id)
+    suggestions = await suggestion_service.get_all_for_student(student_id)
     
     return suggestions
 
 @router.post("/students", response_model=Student, tags=["Students"])
-def create_student(
+async def create_student(
     request: StudentCreateRequest,
     student_service: StudentService = Depends(StudentService),
     current_user: Dict[str, str] = Depends(get_current_user)
@@ -42,13 +43,13 @@ def create_student(
     if current_user["gitlab_username"] != request.gitlab_username:
         raise HTTPException(status_code=403, detail="Can only create your own student record")
     try:
-        student = student_service.get_or_create_student(request.gitlab_username)
+        student = await student_service.get_or_create_student(request.gitlab_username)
         return student
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e)) 
 
 @router.get("/students/test-cookies", tags=["Students"])
-def test_cookies(request: Request, current_user: Dict[str, str] = Depends(get_current_user)):
+async def test_cookies(request: Request, current_user: Dict[str, str] = Depends(get_current_user)):
     """Test endpoint to check if cookies are being received"""
     all_cookies = dict(request.cookies)
     gitlab_token = request.cookies.get("gitlab_token")
@@ -57,8 +58,8 @@ def test_cookies(request: Request, current_user: Dict[str, str] = Depends(get_cu
         "gitlab_token_present": bool(gitlab_token)
     }
 
-@router.post("/students/sync", tags=["Students"])
-def sync_student(
+@router.post("/students/sync", status_code=202, tags=["Students"])
+async def sync_student(
     sync_request: StudentSyncRequest,
     request: Request,
     student_service: StudentService = Depends(StudentService),
@@ -83,43 +84,65 @@ def sync_student(
                 detail="No GitLab token found. Please re-authenticate."
             )
         
-        result = student_service.sync_student_with_token(
+        # The crawl runs in the background; the client polls /students/sync/{job_id}
+        job = await student_service.enqueue_sync_with_token(
             gitlab_username=sync_request.gitlab_username,
             encrypted_gitlab_token=gitlab_token_cookie
         )
         
-        return result
+        return job
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/students/sync/{job_id}", tags=["Students"])
+async def get_sync_status(
+    job_id: str,
+    student_service: StudentService = Depends(StudentService),
+    current_user: Dict[str, str] = Depends(get_current_user)
+):
+    """
+    Returns the status and per-project progress of a sync job.
+    """
+    job = await student_service.get_sync_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Sync job not found")
+    if job["gitlab_username"] != current_user["gitlab_username"]:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return job
+
 @router.post("/students/{user_id}/editor-state", tags=["Students"], response_model=EditorStateResponse)
-def save_editor_state(user_id: str, payload: SaveEditorStateRequest, current_user: Dict[str, str] = Depends(get_current_user)):
+async def save_editor_state(user_id: str, payload: SaveEditorStateRequest, current_user: Dict[str, str] = Depends(get_current_user)):
     """Save the current editor files/active file and optional task for a user."""
     if current_user["id"] != user_id:
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
-        db = get_db_connection("students")
+        db = get_async_db_connection("students")
         coll = db["editor_state"]
         doc = payload.model_dump()
-        coll.update_one({"user_id": user_id}, {"$set": doc}, upsert=True)
-        saved = coll.find_one({"user_id": user_id}, {"_id": 0})
+        codec = StorageCodec.get_instance()
+        stored = {**doc, "files": [codec.pack(file) for file in doc["files"]]}
+        await coll.update_one({"user_id": user_id}, {"$set": stored}, upsert=True)
+        saved = await coll.find_one({"user_id": user_id}, {"_id": 0})
+        saved["files"] = [codec.unpack(file) for file in saved.get("files") or []]
         return saved
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/students/{user_id}/editor-state", tags=["Students"], response_model=EditorStateResponse)
-def load_editor_state(user_id: str, current_user: Dict[str, str] = Depends(get_current_user)):
+async def load_editor_state(user_id: str, current_user: Dict[str, str] = Depends(get_current_user)):
     """Load the last saved editor state for a user if present."""
     if current_user["id"] != user_id:
         raise HTTPException(status_code=403, detail="Forbidden")
     try:
-        db = get_db_connection("students")
+        db = get_async_db_connection("students")
         coll = db["editor_state"]
-        doc = coll.find_one({"user_id": user_id}, {"_id": 0})
+        doc = await coll.find_one({"user_id": user_id}, {"_id": 0})
         if not doc:
             raise HTTPException(status_code=404, detail="No editor state found")
+        codec = StorageCodec.get_instance()
+        doc["files"] = [codec.unpack(file) for file in doc.get("files") or []]
         return doc
     except HTTPException:
         raise
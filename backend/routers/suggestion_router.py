@@ -8,7 +8,7 @@ router = APIRouter()
 
 
 @router.delete("/suggestions/{suggestion_id}", tags=["Suggestions"])
-def delete_suggestion(
+async def delete_suggestion(
     suggestion_id: str,
     suggestion_service: SuggestionService = Depends(SuggestionService),
     current_user = Depends(get_current_user)
@@ -17,7 +17,7 @@ def delete_suggestion(
     Deletes a suggestion by its ID.
     """
     try:
-        suggestion = suggestion_service.get_one(suggestion_id)
+        suggestion = await suggestion_service.get_one(suggestion_id)
     except Exception:
         # Invalid ObjectId format or other DB errors
         raise HTTPException(status_code=404, detail="Suggestion not found")
@@ -28,7 +28,7 @@ def delete_suggestion(
     if suggestion.get("student_id") != current_user["id"]:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    success = suggestion_service.delete(suggestion_id)
+    success = await suggestion_service.delete(suggestion_id)
     if not success:
         raise HTTPException(status_code=404, detail="Suggestion not found")
     return {"message": "Suggestion deleted successfully"} 
\ No newline at end of file
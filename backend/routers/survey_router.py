@@ -6,27 +6,27 @@ from backend.dependencies import get_current_user
 router = APIRouter(prefix="/survey", tags=["Survey"])
 
 @router.post("/start")
-def start_survey(request: StartSurveyRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
+async def start_survey(request: StartSurveyRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
     """Start a new survey session"""
-    session = survey_service.start_session(current_user["id"], request.survey_type)
+    session = await survey_service.start_session(current_user["id"], request.survey_type)
     return {"message": "Survey session started", "session_id": session.survey_id}
 
 @router.post("/pre-task")
-def create_pre_task_survey(pre_task_survey: PreTaskSurveyRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
-    survey_service.create_pre_survey(pre_task_survey)
+async def create_pre_task_survey(pre_task_survey: PreTaskSurveyRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
+    await survey_service.create_pre_survey(pre_task_survey)
     return {"message": "Pre-task survey created successfully"}
 
 @router.post("/post-task")
-def create_post_task_survey(post_task_survey: PostTaskSurveyRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
-    survey_service.create_post_survey(post_task_survey)
+async def create_post_task_survey(post_task_survey: PostTaskSurveyRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
+    await survey_service.create_post_survey(post_task_survey)
     return {"message": "Post-task survey created successfully"}
 
 @router.post("/task-result")
-def create_task_result(task_result: TaskResultRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
-    survey_service.create_task_result(task_result)
+async def create_task_result(task_result: TaskResultRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
+    await survey_service.create_task_result(task_result)
     return {"message": "Task result created successfully"}
 
 @router.post("/overall")
-def create_overall_survey(overall_survey: OverallSurveyRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
-    survey_service.create_overall_survey(overall_survey)
+async def create_overall_survey(overall_survey: OverallSurveyRequest, survey_service: SurveyService = Depends(SurveyService), current_user = Depends(get_current_user)):
+    await survey_service.create_overall_survey(overall_survey)
     return {"message": "Overall survey created successfully"}
\ No newline at end of file
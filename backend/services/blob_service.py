@@ -0,0 +1,271 @@
+"""
+Content-addressed storage of synced file contents.
+
+Blobs no project references anymore are deleted by collect_garbage(). The
+app runs it every BLOB_GC_INTERVAL seconds (0 disables the job, for example
+when it is run from cron instead):
+
+    python -m backend.services.blob_service gc --grace-hours 1
+"""
+from backend.mongodb.MongoDB import get_db_connection
+from backend.mongodb.storage_codec import StorageCodec
+from collections import Counter
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from pymongo import ReplaceOne, UpdateOne
+from typing import Dict, Iterable, List, Set
+import argparse
+import asyncio
+import os
+
+load_dotenv()
+
+# Contents above this size are split into "blob_chunks" instead of being stored inline,
+# so no single document gets near MongoDB's 16 MB limit
+BLOB_INLINE_MAX_BYTES = int(os.getenv("BLOB_INLINE_MAX_BYTES") or 4 * 1024 * 1024)
+BLOB_CHUNK_BYTES = int(os.getenv("BLOB_CHUNK_BYTES") or 1024 * 1024)
+# Seconds between garbage collections of unreferenced blobs, 0 disables the periodic job
+BLOB_GC_INTERVAL = int(os.getenv("BLOB_GC_INTERVAL") or 3600)
+# How long a blob stays unreferenced before it may be deleted
+BLOB_GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS") or 3600)
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": "Python",
+    ".js": "JavaScript",
+    ".java": "Java",
+    ".md": "Markdown",
+    ".txt": "Text",
+    ".json": "JSON",
+    ".yaml": "YAML",
+}
+
+
+def language_for_path(path: str) -> str | None:
+    """Language of a stored file, guessed from its extension"""
+    return LANGUAGE_BY_EXTENSION.get(os.path.splitext(path)[1].lower())
+
+
+def build_manifest(file_shas: Dict[str, str], sizes: Dict[str, int]) -> List[Dict]:
+    """
+    The file list kept on a project document: one {path, sha, size, language}
+    entry per file, sorted by path. sizes maps blob SHA to its size in bytes.
+    """
+    return [
+        {"path": path, "sha": sha, "size": sizes.get(sha), "language": language_for_path(path)}
+        for path, sha in sorted(file_shas.items())
+    ]
+
+
+def project_file_shas(project: Dict) -> Dict[str, str]:
+    """{path: sha} of a stored project, from its manifest or the older "file_shas" map"""
+    if isinstance(project.get("manifest"), list):
+        return {entry["path"]: entry["sha"] for entry in project["manifest"]}
+    return dict(project.get("file_shas") or {})
+
+
+class BlobService:
+    """
+    Content-addressed store for synced file contents.
+
+    Every file body is stored once in the "blobs" collection, keyed by its git
+    blob SHA, no matter how many student projects contain it. Project documents
+    only keep a manifest of {path, sha, size, language} entries, and contents are
+    loaded on demand with load_files(). Bodies are compressed by the storage
+    codec, and the ones still larger than BLOB_INLINE_MAX_BYTES are split over
+    "blob_chunks" documents. Each blob carries a refcount of
+    how many project files point at it; blobs that drop to zero are removed by
+    collect_garbage().
+    """
+
+    def __init__(self, db=None, codec: StorageCodec | None = None):
+        self.db = db if db is not None else get_db_connection("students")
+        self.collection = self.db["blobs"]
+        self.chunks = self.db["blob_chunks"]
+        self.codec = codec or StorageCodec.get_instance()
+
+    def existing_shas(self, shas: Iterable[str]) -> Set[str]:
+        """Returns the subset of the given SHAs that are already stored."""
+        shas = list(set(shas))
+        if not shas:
+            return set()
+        return {doc["_id"] for doc in self.collection.find({"_id": {"$in": shas}}, {"_id": 1})}
+
+    def get_many(self, shas: Iterable[str]) -> Dict[str, str]:
+        """Fetches blob contents by SHA, returning {sha: content} for the ones found."""
+        shas = list(set(shas))
+        if not shas:
+            return {}
+        contents = {}
+        chunked = {}
+        for doc in self.collection.find({"_id": {"$in": shas}}, {"content": 1, "chunks": 1, "codec": 1, "dict_id": 1}):
+            if "content" in doc:
+                contents[doc["_id"]] = self.codec.decode(doc)
+            elif doc.get("chunks"):
+                chunked[doc["_id"]] = doc
+        if chunked:
+            parts = {}
+            for chunk in self.chunks.find({"sha": {"$in": list(chunked)}}).sort([("sha", 1), ("n", 1)]):
+                parts.setdefault(chunk["sha"], []).append(bytes(chunk["data"]))
+            for sha, data in parts.items():
+                contents[sha] = self.codec.decode({**chunked[sha], "content": b"".join(data)})
+        return contents
+
+    def get_sizes(self, shas: Iterable[str]) -> Dict[str, int]:
+        """Returns {sha: size in bytes} for the stored blobs, without reading their contents."""
+        shas = list(set(shas))
+        if not shas:
+            return {}
+        return {doc["_id"]: doc.get("size") for doc in self.collection.find({"_id": {"$in": shas}}, {"size": 1})}
+
+    def load_files(self, project: Dict, paths: Iterable[str] | None = None, languages: Iterable[str] | None = None) -> Dict[str, str]:
+        """
+        Loads file contents of one stored project, returning {path: content}.
+
+        Only the requested paths, or the files of the requested languages, are
+        read from the blob store. Legacy projects with embedded "files" are
+        served from the document itself.
+        """
+        wanted = set(paths) if paths is not None else None
+        wanted_languages = set(languages) if languages is not None else None
+
+        def selected(path):
+            return (wanted is None or path in wanted) and (
+                wanted_languages is None or language_for_path(path) in wanted_languages
+            )
+
+        file_shas = project_file_shas(project)
+        if not file_shas and isinstance(project.get("files"), dict):
+            return {path: content for path, content in project["files"].items() if selected(path)}
+
+        file_shas = {path: sha for path, sha in file_shas.items() if selected(path)}
+        contents = self.get_many(file_shas.values())
+        return {path: contents[sha] for path, sha in file_shas.items() if sha in contents}
+
+    def _split(self, content: str) -> tuple[Dict, List[bytes]]:
+        """
+        Fields of a new blob document and the chunks to store next to it.
+        "size" is the uncompressed size. Contents that are small once encoded
+        are inlined and get no chunks.
+        """
+        fields = {**self.codec.encode(content), "size": len(content.encode("utf-8"))}
+        stored = fields["content"]
+        data = stored.encode("utf-8") if isinstance(stored, str) else bytes(stored)
+        if len(data) <= BLOB_INLINE_MAX_BYTES:
+            return fields, []
+        del fields["content"]
+        chunks = [data[start:start + BLOB_CHUNK_BYTES] for start in range(0, len(data), BLOB_CHUNK_BYTES)]
+        return {**fields, "chunks": len(chunks)}, chunks
+
+    def update_refs(self, contents: Dict[str, str], new_shas: Dict[str, str], old_shas: Dict[str, str]):
+        """
+        Stores new blobs and moves refcounts from a project's old file set to its new one.
+
+        Args:
+            contents: {path: content} for files that were downloaded in this sync
+            new_shas: {path: sha} of the project after the sync
+            old_shas: {path: sha} of the project before the sync
+        """
+        self.add_refs(contents, new_shas, old_shas)
+        self.release_refs(new_shas, old_shas)
+
+    def add_refs(self, contents: Dict[str, str], new_shas: Dict[str, str], old_shas: Dict[str, str]):
+        """
+        Stores new blobs and takes the references the new file set has on top of the old one.
+
+        Done before a project's manifest is written, so a stored manifest never
+        points at a blob that is missing or can be collected. If the manifest
+        is not written, release_refs(old_shas, new_shas) gives them back.
+        """
+        delta = Counter(new_shas.values())
+        delta.subtract(Counter(old_shas.values()))
+        contents_by_sha = {new_shas[path]: content for path, content in contents.items() if path in new_shas}
+        now = datetime.utcnow()
+
+        operations = []
+        for sha, count in delta.items():
+            if count <= 0:
+                continue
+            if sha in contents_by_sha:
+                fields, chunks = self._split(contents_by_sha[sha])
+                if chunks:
+                    # Chunks are written before the blob that points at them, rewriting them is harmless
+                    self.chunks.bulk_write([
+                        ReplaceOne({"_id": f"{sha}:{n}"}, {"_id": f"{sha}:{n}", "sha": sha, "n": n, "data": data}, upsert=True)
+                        for n, data in enumerate(chunks)
+                    ], ordered=False)
+                operations.append(UpdateOne(
+                    {"_id": sha},
+                    {
+                        "$setOnInsert": {**fields, "created_at": now},
+                        "$inc": {"refcount": count},
+                        "$set": {"updated_at": now},
+                    },
+                    upsert=True
+                ))
+            else:
+                operations.append(UpdateOne(
+                    {"_id": sha},
+                    {"$inc": {"refcount": count}, "$set": {"updated_at": now}}
+                ))
+
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+    def release_refs(self, new_shas: Dict[str, str], old_shas: Dict[str, str]):
+        """
+        Drops the references the old file set has on top of the new one, once
+        the new manifest is stored.
+        """
+        delta = Counter(old_shas.values())
+        delta.subtract(Counter(new_shas.values()))
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne({"_id": sha}, {"$inc": {"refcount": -count}, "$set": {"updated_at": now}})
+            for sha, count in delta.items() if count > 0
+        ]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+    def collect_garbage(self, grace_period: timedelta = timedelta(seconds=BLOB_GC_GRACE_SECONDS)) -> int:
+        """
+        Deletes blobs no project references anymore.
+
+        Blobs are only removed after staying unreferenced for the grace period,
+        so a sync that has just seen a blob as stored can still take a reference to it.
+        Returns the number of deleted blobs.
+        """
+        unreferenced = {
+            "refcount": {"$lte": 0},
+            "updated_at": {"$lte": datetime.utcnow() - grace_period}
+        }
+        chunked = [doc["_id"] for doc in self.collection.find({**unreferenced, "chunks": {"$gt": 0}}, {"_id": 1})]
+        result = self.collection.delete_many(unreferenced)
+        if chunked:
+            # Chunks of a blob that was referenced again in the meantime are kept
+            deleted = set(chunked) - self.existing_shas(chunked)
+            self.chunks.delete_many({"sha": {"$in": list(deleted)}})
+        return result.deleted_count
+
+
+async def collect_garbage_periodically(
+    interval: float = BLOB_GC_INTERVAL, grace_period: timedelta = timedelta(seconds=BLOB_GC_GRACE_SECONDS)
+):
+    """Run collect_garbage every interval seconds until cancelled, started by the app lifespan"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            deleted = await asyncio.to_thread(BlobService().collect_garbage, grace_period)
+            if deleted:
+                print(f"🧹 Deleted {deleted} unreferenced blobs")
+        except Exception as e:
+            print(f"❌ Blob garbage collection failed: {e}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["gc"])
+    parser.add_argument("--grace-hours", type=float, default=BLOB_GC_GRACE_SECONDS / 3600)
+    args = parser.parse_args()
+
+    deleted = BlobService().collect_garbage(grace_period=timedelta(hours=args.grace_hours))
+    print(f"🧹 Deleted {deleted} unreferenced blobs")
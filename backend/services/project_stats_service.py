@@ -0,0 +1,85 @@
+from backend.mongodb.async_db import get_async_db_connection
+from backend.mongodb.project_migration import PROJECTS_COLLECTION
+from typing import Dict, List
+
+# Number of files of a stored project, whichever layout it was stored with:
+# the manifest list, the older {path: sha} map or the embedded {path: content} dict
+FILE_COUNT = {
+    "$cond": [
+        {"$isArray": "$manifest"},
+        {"$size": "$manifest"},
+        {"$size": {"$objectToArray": {"$ifNull": ["$file_shas", {"$ifNull": ["$files", {}]}]}}},
+    ]
+}
+
+
+class ProjectStatsService:
+    """
+    Dashboard statistics of a student's stored projects.
+
+    Everything is computed by aggregation pipelines on the server, so only
+    the counts are transferred and never the manifests or file contents.
+    """
+
+    def __init__(self):
+        self.db = get_async_db_connection("students")
+        self.collection = self.db[PROJECTS_COLLECTION]
+
+    async def count_projects(self, student_id: str) -> int:
+        return await self.collection.count_documents({"student_id": student_id})
+
+    async def count_files(self, student_id: str) -> int:
+        """Total number of files across all stored projects of the student."""
+        cursor = await self.collection.aggregate([
+            {"$match": {"student_id": student_id}},
+            {"$group": {"_id": None, "file_count": {"$sum": FILE_COUNT}}},
+        ])
+        totals = await cursor.to_list()
+        return totals[0]["file_count"] if totals else 0
+
+    async def get_project_stats(self, student_id: str) -> List[Dict]:
+        """File count and total size in bytes of every project, largest first."""
+        cursor = await self.collection.aggregate([
+            {"$match": {"student_id": student_id}},
+            {"$project": {
+                "_id": 0,
+                "project_id": 1,
+                "name": 1,
+                "file_count": FILE_COUNT,
+                "total_bytes": {"$sum": "$manifest.size"},
+            }},
+            {"$sort": {"total_bytes": -1, "project_id": 1}},
+        ])
+        projects = await cursor.to_list()
+        for project in projects:
+            project.setdefault("total_bytes", 0)
+        return projects
+
+    async def get_language_stats(self, student_id: str) -> List[Dict]:
+        """Number of files and bytes per language, from the project manifests."""
+        cursor = await self.collection.aggregate([
+            {"$match": {"student_id": student_id}},
+            {"$unwind": "$manifest"},
+            {"$group": {
+                "_id": "$manifest.language",
+                "file_count": {"$sum": 1},
+                "total_bytes": {"$sum": "$manifest.size"},
+            }},
+            {"$sort": {"file_count": -1}},
+        ])
+        return [
+            {"language": doc["_id"] or "Other", "file_count": doc["file_count"], "total_bytes": doc.get("total_bytes") or 0}
+            for doc in await cursor.to_list()
+        ]
+
+    async def get_stats(self, student_id: str) -> Dict:
+        """Totals, per-language and per-project statistics for the dashboard."""
+        projects = await self.get_project_stats(student_id)
+        return {
+            "student_id": student_id,
+            "project_count": len(projects),
+            "file_count": sum(project["file_count"] for project in projects),
+            "total_bytes": sum(project["total_bytes"] for project in projects),
+            "languages": await self.get_language_stats(student_id),
+            "projects": projects,
+        }
@@ -0,0 +1,233 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from backend.mongodb.MongoDB import get_db_connection
+
+
+load_dotenv()
+
+# Number of GitLab syncs that run at the same time in this process
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS") or 4)
+# A job that has not reported progress for this long is considered dead
+SYNC_JOB_STALE_AFTER = timedelta(seconds=int(os.getenv("SYNC_JOB_STALE_AFTER") or 900))
+# A running job refreshes its heartbeat this often, also while a single project takes long
+SYNC_JOB_HEARTBEAT_INTERVAL = SYNC_JOB_STALE_AFTER.total_seconds() / 5
+# Per-project progress is buffered and written at most this often, in one update
+SYNC_JOB_PROGRESS_INTERVAL = float(os.getenv("SYNC_JOB_PROGRESS_INTERVAL") or 1.0)
+
+ACTIVE_STATUSES = ("queued", "running")
+DONE_PROJECT_STATUSES = ("new", "updated", "unchanged", "failed")
+
+
+class SyncJobService:
+    """
+    Background queue for GitLab syncs.
+
+    Jobs are persisted in the "sync_jobs" collection so their status and
+    per-project progress can be polled from any request, and run on a bounded
+    thread pool. The GitLab token is only handed to the worker in memory and is
+    never written to the database, so a job that is still queued when the
+    process stops cannot be resumed; it is marked as failed once its heartbeat
+    goes stale. Each student has at most one queued or running job, enforced by
+    a unique "active_key" that is removed when the job finishes (its index is
+    declared in backend.mongodb.indexes).
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, db=None, runner: Optional[Callable] = None, max_workers: int = SYNC_WORKERS):
+        self.db = db if db is not None else get_db_connection("students")
+        self.collection = self.db["sync_jobs"]
+        self.runner = runner
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gitlab-sync")
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Get the process-wide job queue.
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _run_sync(self, student_id: str, gitlab_username: str, gitlab_token: str, progress):
+        if self.runner is None:
+            from backend.gitlab.gitlab_service import GitlabService
+            self.runner = GitlabService().store_projects_for_student
+        return self.runner(student_id, gitlab_username, gitlab_token, progress=progress)
+
+    def enqueue(self, student_id: str, gitlab_username: str, gitlab_token: str) -> Dict:
+        """
+        Queue a sync for the student, or return the sync that is already queued or running.
+
+        Returns:
+            dict: The job document, with "created" telling whether a new job was queued
+        """
+        now = datetime.utcnow()
+        job = {
+            "_id": str(uuid.uuid4()),
+            "student_id": student_id,
+            "gitlab_username": gitlab_username,
+            "status": "queued",
+            "active_key": student_id,
+            "projects": {},
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+            "heartbeat_at": now,
+        }
+
+        for _ in range(2):
+            try:
+                self.collection.insert_one(job)
+                break
+            except DuplicateKeyError:
+                active = self.collection.find_one({"active_key": student_id})
+                if active is None:
+                    continue
+                if not self._expire_if_stale(active):
+                    print(f"⏳ Sync already {active['status']} for student {student_id}: {active['_id']}")
+                    return {**self._to_status(active), "created": False}
+        else:
+            raise RuntimeError("Could not queue sync job")
+
+        print(f"📥 Queued sync job {job['_id']} for student {student_id}")
+        self.executor.submit(self._run, job["_id"], student_id, gitlab_username, gitlab_token)
+        return {**self._to_status(job), "created": True}
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Returns the status of a job, or None if it does not exist."""
+        job = self.collection.find_one({"_id": job_id})
+        if job is None:
+            return None
+        if self._expire_if_stale(job):
+            job = self.collection.find_one({"_id": job_id})
+        return self._to_status(job)
+
+    def _run(self, job_id: str, student_id: str, gitlab_username: str, gitlab_token: str):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"status": "running", "started_at": now, "heartbeat_at": now}}
+        )
+
+        # The sync engine calls this from its event loop, so it only buffers the
+        # update and the reporter thread writes it without holding up the fetches
+        pending = {}
+        pending_lock = threading.Lock()
+
+        def progress(project_id, name: str, status: str):
+            with pending_lock:
+                pending[f"projects.{project_id}"] = {"name": name, "status": status}
+
+        # Also keeps the job alive between progress reports, a large project can take longer than the stale timeout
+        stop_reporter = threading.Event()
+        reporter = threading.Thread(
+            target=self._report, args=(job_id, stop_reporter, pending, pending_lock),
+            name=f"sync-reporter-{job_id}", daemon=True
+        )
+        reporter.start()
+        try:
+            result = self._run_sync(student_id, gitlab_username, gitlab_token, progress)
+        except Exception as e:
+            print(f"❌ Sync job {job_id} failed: {e}")
+            self._stop_reporter(reporter, stop_reporter)
+            self._finish(job_id, "failed", error=str(e))
+            return
+        self._stop_reporter(reporter, stop_reporter)
+
+        if isinstance(result, dict) and "error" in result:
+            print(f"❌ Sync job {job_id} failed: {result['error']}")
+            self._finish(job_id, "failed", error=result.get("message") or result["error"])
+        else:
+            print(f"✅ Sync job {job_id} finished")
+            self._finish(job_id, "succeeded", result=result)
+
+    def _report(self, job_id: str, stop: threading.Event, pending: Dict, lock: threading.Lock):
+        """
+        Writes the buffered project progress of a running job in one update
+        every SYNC_JOB_PROGRESS_INTERVAL, and a heartbeat every
+        SYNC_JOB_HEARTBEAT_INTERVAL. Flushes once more when stopped.
+        """
+        last_write = time.monotonic()
+        while True:
+            stopped = stop.wait(min(SYNC_JOB_PROGRESS_INTERVAL, SYNC_JOB_HEARTBEAT_INTERVAL))
+            with lock:
+                fields = dict(pending)
+                pending.clear()
+            if fields or time.monotonic() - last_write >= SYNC_JOB_HEARTBEAT_INTERVAL:
+                try:
+                    self.collection.update_one(
+                        {"_id": job_id, "status": "running"},
+                        {"$set": {**fields, "heartbeat_at": datetime.utcnow()}}
+                    )
+                    last_write = time.monotonic()
+                except Exception as e:
+                    print(f"⚠️ Failed to record progress of sync job {job_id}: {e}")
+            if stopped:
+                return
+
+    def _stop_reporter(self, reporter: threading.Thread, stop: threading.Event):
+        # The last progress is written before the job is marked as finished
+        stop.set()
+        reporter.join()
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            {"_id": job_id},
+            {
+                "$set": {"status": status, "result": result, "error": error, "finished_at": now, "heartbeat_at": now},
+                "$unset": {"active_key": ""},
+            }
+        )
+
+    def _expire_if_stale(self, job: Dict) -> bool:
+        """Marks an active job as failed if it stopped reporting progress. Returns True if it is no longer active."""
+        if job["status"] not in ACTIVE_STATUSES:
+            return True
+        if job["heartbeat_at"] > datetime.utcnow() - SYNC_JOB_STALE_AFTER:
+            return False
+        expired = self.collection.find_one_and_update(
+            {"_id": job["_id"], "heartbeat_at": job["heartbeat_at"], "status": {"$in": list(ACTIVE_STATUSES)}},
+            {
+                "$set": {"status": "failed", "error": "Sync was interrupted", "finished_at": datetime.utcnow()},
+                "$unset": {"active_key": ""},
+            },
+            return_document=ReturnDocument.AFTER
+        )
+        if expired is not None:
+            print(f"⚠️ Sync job {job['_id']} went stale and was marked as failed")
+        return True
+
+    def _to_status(self, job: Dict) -> Dict:
+        projects = [
+            {"project_id": project_id, **project} for project_id, project in (job.get("projects") or {}).items()
+        ]
+        return {
+            "job_id": job["_id"],
+            "student_id": job["student_id"],
+            "gitlab_username": job["gitlab_username"],
+            "status": job["status"],
+            "projects": projects,
+            "total_projects": len(projects),
+            "completed_projects": len([p for p in projects if p["status"] in DONE_PROJECT_STATUSES]),
+            "result": job.get("result"),
+            "error": job.get("error"),
+            "created_at": job["created_at"],
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at"),
+        }
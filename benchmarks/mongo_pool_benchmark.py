@@ -0,0 +1,59 @@
+"""
+Requests/sec of a typical request's database work with a new MongoClient per
+call (the old get_db_connection) versus the shared pooled client.
+
+Each simulated request opens the "students" database the way a service
+constructor does and reads one document. Needs a running MongoDB at MONGO_URI
+(for example `docker compose up mongo`):
+
+    python -m benchmarks.mongo_pool_benchmark --requests 500 --concurrency 16
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import MongoClient
+
+from backend.mongodb import MongoDB
+
+
+def per_call_client_request():
+    client = MongoClient(MongoDB.MONGO_URI)
+    try:
+        client["students"]["student_registry"].find_one({"gitlab_username": "benchmark"})
+    finally:
+        client.close()
+
+
+def shared_client_request():
+    MongoDB.get_db_connection("students")["student_registry"].find_one({"gitlab_username": "benchmark"})
+
+
+def run(name: str, request, total: int, concurrency: int) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(request) for _ in range(total)]:
+            future.result()
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed
+    print(f"{name:<20} {total} requests in {elapsed:.2f}s -> {rate:.1f} req/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    # Warm up the shared pool so both runs measure steady state
+    shared_client_request()
+
+    before = run("client per call", per_call_client_request, args.requests, args.concurrency)
+    after = run("shared pool", shared_client_request, args.requests, args.concurrency)
+    print(f"speedup: {after / before:.1f}x")
+    MongoDB.close_client()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Storage size and read latency of source files stored plain, with zlib and
+with zstd (with and without a trained dictionary).
+
+The corpus is every stored text file under --corpus, by default this
+repository. Every codec encodes the whole corpus, and the read latency is the
+time to decode all of it. With --mongo the encoded documents are also written
+to a scratch collection at MONGO_URI and read back through find():
+
+    python -m benchmarks.storage_codec_benchmark --corpus ../student-repos --mongo
+"""
+import argparse
+import os
+import random
+import time
+
+import mongomock
+
+from backend.gitlab.sync_engine import is_text_file
+from backend.mongodb import MongoDB
+from backend.mongodb.storage_codec import StorageCodec, zstandard
+
+
+def load_corpus(root: str) -> list[str]:
+    files = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".") and name not in ("node_modules", "__pycache__")]
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if is_text_file(path):
+                try:
+                    with open(path, encoding="utf-8") as file:
+                        files.append(file.read())
+                except UnicodeDecodeError:
+                    continue
+    return files
+
+
+def stored_size(fields: dict) -> int:
+    content = fields["content"]
+    return len(content.encode("utf-8")) if isinstance(content, str) else len(content)
+
+
+def run(name: str, codec: StorageCodec, corpus: list[str], collection=None) -> dict:
+    started = time.perf_counter()
+    encoded = [codec.encode(text) for text in corpus]
+    encode_time = time.perf_counter() - started
+
+    if collection is not None:
+        collection.drop()
+        collection.insert_many([{"_id": index, **fields} for index, fields in enumerate(encoded)])
+        started = time.perf_counter()
+        decoded = [codec.decode(doc) for doc in collection.find({})]
+    else:
+        started = time.perf_counter()
+        decoded = [codec.decode(fields) for fields in encoded]
+    read_time = time.perf_counter() - started
+    assert sorted(decoded) == sorted(corpus)
+
+    size = sum(stored_size(fields) for fields in encoded)
+    print(f"{name:<18} {size / 1024:>10.1f} KiB  encode {encode_time * 1000:>8.1f} ms  "
+          f"read {read_time * 1000:>8.1f} ms ({read_time / len(corpus) * 1e6:.1f} µs/file)")
+    return {"size": size, "encode": encode_time, "read": read_time}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--mongo", action="store_true", help="store and read the documents through MongoDB")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    raw = sum(len(text.encode("utf-8")) for text in corpus)
+    print(f"{len(corpus)} files, {raw / 1024:.1f} KiB of source\n")
+
+    # Dictionaries are stored in an in-memory database so the benchmark leaves no trace
+    db = mongomock.MongoClient()["benchmark"]
+    collection = MongoDB.get_db_connection("benchmark")["storage_codec"] if args.mongo else None
+
+    codecs = [("none", StorageCodec(db, codec="none")), ("zlib", StorageCodec(db, codec="zlib"))]
+    if zstandard is not None:
+        codecs.append(("zstd", StorageCodec(db, codec="zstd")))
+        trained = StorageCodec(db, codec="zstd")
+        trained.train_dictionary(random.Random(0).sample(corpus, min(len(corpus), 1000)))
+        codecs.append(("zstd + dictionary", trained))
+    else:
+        print("zstandard is not installed, skipping zstd\n")
+
+    results = {name: run(name, codec, corpus, collection) for name, codec in codecs}
+    for name, result in results.items():
+        print(f"{name:<18} {raw / result['size']:.2f}x smaller than plain text")
+
+    if collection is not None:
+        collection.drop()
+        MongoDB.close_client()
+
+
+if __name__ == "__main__":
+    main()
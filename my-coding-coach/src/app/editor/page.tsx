@@ -264,15 +264,20 @@ const EditorPage = () => {
         }
 
         try {
-            const response = await apiClient.getAssistantResponse(contextualMessage, code, sessionId || undefined);
-            const assistantMessage: Message = {
-                id: (Date.now() + 1).toString(),
-                text: response.response,
-                role: 'assistant',
-                timestamp: new Date(),
-            };
+            // The reply is shown as it streams in and completed when the stream is done
+            const assistantMessageId = (Date.now() + 1).toString();
+            setMessages(prev => [...prev, { id: assistantMessageId, text: '', role: 'assistant', timestamp: new Date() }]);
+            const updateAssistantMessage = (update: (text: string) => string) =>
+                setMessages(prev => prev.map(m => m.id === assistantMessageId ? { ...m, text: update(m.text) } : m));
 
-            setMessages(prev => [...prev, assistantMessage]);
+            try {
+                const response = await apiClient.streamAssistantResponse(contextualMessage, code, sessionId || undefined,
+                    token => updateAssistantMessage(text => text + token));
+                updateAssistantMessage(() => response.response);
+            } catch (streamError) {
+                setMessages(prev => prev.filter(m => m.id !== assistantMessageId));
+                throw streamError;
+            }
         } catch (error) {
             console.error('Error getting assistant response:', error);
             toast.error('Failed to get assistant response. Please try again.');
@@ -15,6 +15,7 @@ export default function ProjectsPage() {
     const [isLoading, setIsLoading] = useState(false);
     const [isAnalyzing, setIsAnalyzing] = useState(false);
     const [expandedProject, setExpandedProject] = useState<string | null>(null);
+    const [projectFiles, setProjectFiles] = useState<Record<number, Record<string, string>>>({});
     const [showAnalysis, setShowAnalysis] = useState(false);
 
     const loadProjects = async () => {
@@ -55,16 +56,31 @@ export default function ProjectsPage() {
         }
     };
 
-    const toggleProject = (projectName: string) => {
-        setExpandedProject(expandedProject === projectName ? null : projectName);
+    const toggleProject = async (project: Project) => {
+        const expanding = expandedProject !== project.name;
+        setExpandedProject(expanding ? project.name : null);
+        // File contents are only fetched the first time a project is opened
+        if (!expanding || !user || projectFiles[project.project_id]) return;
+        try {
+            const files = await apiClient.getProjectFiles(user.id, project.project_id);
+            setProjectFiles(prev => ({ ...prev, [project.project_id]: files }));
+        } catch (error) {
+            console.error('Error loading project files:', error);
+            toast.error('Failed to load project files');
+        }
     };
 
     const getFileCount = (project: Project) => {
-        return Object.keys(project.files || {}).length;
+        return (project.manifest || []).length;
+    };
+
+    // [path, content] pairs, the content is undefined until the project's files are loaded
+    const getFileEntries = (project: Project): [string, string | undefined][] => {
+        return (project.manifest || []).map(file => [file.path, projectFiles[project.project_id]?.[file.path]]);
     };
 
     const getMainLanguage = (project: Project) => {
-        const files = Object.keys(project.files || {});
+        const files = (project.manifest || []).map(file => file.path);
         const extensions = files.map(file => file.split('.').pop()).filter(Boolean);
         const counts = extensions.reduce((acc, ext) => {
             acc[ext || ''] = (acc[ext || ''] || 0) + 1;
@@ -220,7 +236,7 @@ export default function ProjectsPage() {
                                         </div>
 
                                         <button
-                                            onClick={() => toggleProject(project.name)}
+                                            onClick={() => toggleProject(project)}
                                             className="w-full flex items-center justify-center px-4 py-2 bg-gray-100 text-gray-700 rounded-md hover:bg-gray-200 transition-colors"
                                         >
                                             <Eye className="h-4 w-4 mr-2" />
@@ -235,7 +251,7 @@ export default function ProjectsPage() {
                                             <div className="mt-4 border-t pt-4">
                                                 <h4 className="font-medium text-gray-900 mb-3">Project Files:</h4>
                                                 <div className="space-y-3 max-h-80 overflow-y-auto pr-2">
-                                                    {Object.entries(project.files || {}).map(([filePath, content]) => (
+                                                    {getFileEntries(project).map(([filePath, content]) => (
                                                         <div key={filePath} className="bg-gray-50 rounded-lg border hover:bg-gray-100 transition-colors">
                                                             <div className="p-3 border-b border-gray-200">
                                                                 <div className="flex items-center justify-between">
@@ -243,7 +259,7 @@ export default function ProjectsPage() {
                                                                         {filePath}
                                                                     </span>
                                                                     <span className="text-xs text-gray-500 ml-2 flex-shrink-0">
-                                                                        {content ? `${content.split('\n').length} lines` : 'Empty'}
+                                                                        {content === undefined ? 'Loading...' : content ? `${content.split('\n').length} lines` : 'Empty'}
                                                                     </span>
                                                                 </div>
                                                             </div>
@@ -110,15 +110,20 @@ export default function AssistantChat({
                 }
 
                 try {
-                    const response = await apiClient.getAssistantResponse(contextualMessage, code, sessionId || undefined);
-                    const assistantMessage: Message = {
-                        id: (Date.now() + 1).toString(),
-                        text: response.response,
-                        role: 'assistant',
-                        timestamp: new Date(),
-                    };
-
-                    setInternalMessages(prev => [...prev, assistantMessage]);
+                    // The reply is shown as it streams in and completed when the stream is done
+                    const assistantMessageId = (Date.now() + 1).toString();
+                    setInternalMessages(prev => [...prev, { id: assistantMessageId, text: '', role: 'assistant', timestamp: new Date() }]);
+                    const updateAssistantMessage = (update: (text: string) => string) =>
+                        setInternalMessages(prev => prev.map(m => m.id === assistantMessageId ? { ...m, text: update(m.text) } : m));
+
+                    try {
+                        const response = await apiClient.streamAssistantResponse(contextualMessage, code, sessionId || undefined,
+                            token => updateAssistantMessage(text => text + token));
+                        updateAssistantMessage(() => response.response);
+                    } catch (streamError) {
+                        setInternalMessages(prev => prev.filter(m => m.id !== assistantMessageId));
+                        throw streamError;
+                    }
                 } catch (error) {
                     console.error('Error getting assistant response:', error);
                     const errorMessage: Message = {
@@ -1,5 +1,5 @@
 import { api, API_BASE_URL } from './http';
-export type { CodeAnalysis, AIAnalysis, Suggestion, Project, StudentProjects } from './types';
+export type { CodeAnalysis, AIAnalysis, Suggestion, Project, ProjectFile, StudentProjects } from './types';
 
 import * as Assistant from './api/assistant';
 import * as Code from './api/code';
@@ -24,6 +24,7 @@ export const apiClient = {
 
     // Assistant
     getAssistantResponse: Assistant.getAssistantResponse,
+    streamAssistantResponse: Assistant.streamAssistantResponse,
     clearAssistant: Assistant.clearAssistant,
     addSystemMessage: Assistant.addSystemMessage,
     createAssistantSession: Assistant.createAssistantSession,
@@ -42,11 +43,14 @@ export const apiClient = {
 
     // Students
     syncGitlabProjects: Students.syncGitlabProjects,
+    getSyncJob: Students.getSyncJob,
 
     // Projects
     getStudentProjects: Students.getStudentProjects,
+    getProjectFiles: Students.getProjectFiles,
     getNumberOfProjects: Students.getNumberOfProjects,
     getNumberOfFiles: Students.getNumberOfFiles,
+    getProjectStats: Students.getProjectStats,
 
     // Editor state
     loadEditorState: Students.loadEditorState,
@@ -1,18 +1,42 @@
 import { afterEach, describe, expect, it, vi } from 'vitest';
-import { getAssistantResponse, addSystemMessage, clearAssistant } from '../assistant';
-import { api } from '../../http';
+import { getAssistantResponse, addSystemMessage, clearAssistant, streamAssistantResponse } from '../assistant';
+import { api, refreshAccessToken } from '../../http';
 
 vi.mock('../../http', () => {
     const post = vi.fn();
     return {
         api: { post },
+        API_BASE_URL: 'http://api',
+        refreshAccessToken: vi.fn(),
     };
 });
 
 afterEach(() => {
     vi.clearAllMocks();
+    vi.unstubAllGlobals();
 });
 
+// A fetch response whose body arrives in the given pieces
+function streamResponse(chunks: string[], status = 200) {
+    const encoder = new TextEncoder();
+    let index = 0;
+    return {
+        ok: status >= 200 && status < 300,
+        status,
+        body: {
+            getReader: () => ({
+                read: async () => index < chunks.length
+                    ? { value: encoder.encode(chunks[index++]), done: false }
+                    : { value: undefined, done: true },
+            }),
+        },
+    };
+}
+
+function sse(event: string, data: object) {
+    return `event: ${event}\ndata: ${JSON.stringify(data)}\n\n`;
+}
+
 describe('assistant api', () => {
     it('getAssistantResponse posts prompt and code', async () => {
         (api.post as any).mockResolvedValue({ data: { response: 'ok' } });
@@ -34,4 +58,51 @@ describe('assistant api', () => {
         expect(api.post).toHaveBeenCalledWith('/api/assistant/add-system-message', { message: 'hello' });
         expect(res.message).toBe('added');
     });
-}); 
\ No newline at end of file
+
+    it('streamAssistantResponse parses events split across chunks', async () => {
+        const events = sse('token', { token: 'Hel' }) + sse('token', { token: 'lo' }) + sse('done', { response: 'Hello', session_id: 's' });
+        const fetchMock = vi.fn().mockResolvedValue(streamResponse([events.slice(0, 10), events.slice(10, 45), events.slice(45)]));
+        vi.stubGlobal('fetch', fetchMock);
+        const tokens: string[] = [];
+
+        const res = await streamAssistantResponse('hi', 'code', 's', token => tokens.push(token));
+
+        expect(tokens).toEqual(['Hel', 'lo']);
+        expect(res.response).toBe('Hello');
+        expect(fetchMock).toHaveBeenCalledWith('http://api/api/assistant/stream', expect.objectContaining({ credentials: 'include' }));
+    });
+
+    it('streamAssistantResponse rejects on an error event', async () => {
+        vi.stubGlobal('fetch', vi.fn().mockResolvedValue(streamResponse([sse('error', { detail: 'timed out' })])));
+
+        await expect(streamAssistantResponse('hi', undefined, 's', () => {})).rejects.toThrow('timed out');
+    });
+
+    it('streamAssistantResponse refreshes an expired token once and retries', async () => {
+        const fetchMock = vi.fn()
+            .mockResolvedValueOnce(streamResponse([], 401))
+            .mockResolvedValueOnce(streamResponse([sse('done', { response: 'ok' })]));
+        vi.stubGlobal('fetch', fetchMock);
+        (refreshAccessToken as any).mockResolvedValue(true);
+
+        const res = await streamAssistantResponse('hi', undefined, 's', () => {});
+
+        expect(refreshAccessToken).toHaveBeenCalledTimes(1);
+        expect(fetchMock).toHaveBeenCalledTimes(2);
+        expect(res.response).toBe('ok');
+        expect(api.post).not.toHaveBeenCalled();
+    });
+
+    it('streamAssistantResponse falls back to a plain request when the stream is refused', async () => {
+        vi.stubGlobal('fetch', vi.fn().mockResolvedValue(streamResponse([], 401)));
+        (refreshAccessToken as any).mockResolvedValue(false);
+        (api.post as any).mockResolvedValue({ data: { response: 'whole reply' } });
+        const tokens: string[] = [];
+
+        const res = await streamAssistantResponse('hi', 'code', 's', token => tokens.push(token));
+
+        expect(api.post).toHaveBeenCalledWith('/api/assistant', { prompt: 'hi', code: 'code', session_id: 's' });
+        expect(tokens).toEqual(['whole reply']);
+        expect(res.response).toBe('whole reply');
+    });
+});
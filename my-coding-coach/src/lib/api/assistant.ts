@@ -1,10 +1,62 @@
-import { api } from '../http';
+import { api, API_BASE_URL, refreshAccessToken } from '../http';
 
 export async function getAssistantResponse(prompt: string, code?: string, sessionId?: string): Promise<{ response: string }> {
     const response = await api.post('/api/assistant', { prompt, code, session_id: sessionId });
     return response.data;
 }
 
+function postAssistantStream(body: string): Promise<Response> {
+    return fetch(`${API_BASE_URL}/api/assistant/stream`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        credentials: 'include',
+        body,
+    });
+}
+
+// Streams the reply over Server-Sent Events, calling onToken as text arrives. Resolves with the full reply.
+export async function streamAssistantResponse(
+    prompt: string,
+    code: string | undefined,
+    sessionId: string | undefined,
+    onToken: (token: string) => void,
+): Promise<{ response: string }> {
+    const body = JSON.stringify({ prompt, code, session_id: sessionId });
+    let response = await postAssistantStream(body);
+    // fetch does not go through the axios interceptor, so an expired token is refreshed here
+    if (response.status === 401 && await refreshAccessToken()) {
+        response = await postAssistantStream(body);
+    }
+    if (!response.ok || !response.body) {
+        // Without a stream the reply is fetched in one piece, through the client that handles logging in again
+        const reply = await getAssistantResponse(prompt, code, sessionId);
+        onToken(reply.response);
+        return reply;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const event = block.match(/^event: (.*)$/m)?.[1];
+            const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || '{}');
+            if (event === 'token') onToken(data.token);
+            if (event === 'error') throw new Error(data.detail);
+            if (event === 'done') return { response: data.response };
+        }
+    }
+    throw new Error('Assistant stream ended unexpectedly');
+}
+
 export async function clearAssistant(sessionId?: string, systemMessage?: string): Promise<{ message: string; session_id: string }> {
     const response = await api.post('/api/assistant/clear', { session_id: sessionId, system_message: systemMessage });
     return response.data;
@@ -1,9 +1,25 @@
 import { api } from '../http';
 import type { StudentProjects } from '../types';
 
+const SYNC_POLL_INTERVAL_MS = 2000;
+
+export async function getSyncJob(jobId: string): Promise<any> {
+    const response = await api.get(`api/students/sync/${jobId}`);
+    return response.data;
+}
+
+// Starts a background sync and waits for it to finish, resolving with the sync result
 export async function syncGitlabProjects(gitlabUsername: string): Promise<any> {
     const response = await api.post('api/students/sync', { gitlab_username: gitlabUsername });
-    return response.data;
+    let job = response.data;
+    while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, SYNC_POLL_INTERVAL_MS));
+        job = await getSyncJob(job.job_id);
+    }
+    if (job.status !== 'succeeded') {
+        throw new Error(job.error || 'Sync failed');
+    }
+    return job.result;
 }
 
 export async function getStudentProjects(studentId: string): Promise<StudentProjects> {
@@ -11,6 +27,15 @@ export async function getStudentProjects(studentId: string): Promise<StudentProj
     return response.data;
 }
 
+// Loads file contents of one project, all of them when no paths are given
+export async function getProjectFiles(studentId: string, projectId: number, paths?: string[]): Promise<Record<string, string>> {
+    const response = await api.get(`/api/student/${studentId}/projects/${projectId}/files`, {
+        params: paths ? { path: paths } : undefined,
+        paramsSerializer: { indexes: null },
+    });
+    return response.data.files;
+}
+
 export async function getNumberOfProjects(studentId: string): Promise<number> {
     const response = await api.get(`/api/student/${studentId}/projects/count`);
     return response.data;
@@ -21,6 +46,20 @@ export async function getNumberOfFiles(studentId: string): Promise<number> {
     return response.data;
 }
 
+export interface ProjectStats {
+    student_id: string;
+    project_count: number;
+    file_count: number;
+    total_bytes: number;
+    languages: { language: string; file_count: number; total_bytes: number }[];
+    projects: { project_id: number; name: string; file_count: number; total_bytes: number }[];
+}
+
+export async function getProjectStats(studentId: string): Promise<ProjectStats> {
+    const response = await api.get(`/api/student/${studentId}/projects/stats`);
+    return response.data;
+}
+
 export interface EditorFileDTO {
     name: string;
     content: string;
@@ -10,6 +10,24 @@ export const api = axios.create({
     withCredentials: true,
 });
 
+// One refresh at a time, shared by the interceptor and by requests made with fetch
+let refreshRequest: Promise<boolean> | null = null;
+
+// Refreshes the access token cookie, resolving with whether it worked
+export function refreshAccessToken(): Promise<boolean> {
+    if (!refreshRequest) {
+        refreshRequest = fetch(`${API_BASE_URL}/api/auth/refresh`, {
+            method: 'POST',
+            credentials: 'include'
+        })
+            .then((response) => response.ok)
+            .finally(() => {
+                refreshRequest = null;
+            });
+    }
+    return refreshRequest;
+}
+
 // Flag to prevent multiple refresh attempts
 let isRefreshing = false;
 let failedQueue: Array<{ resolve: Function; reject: Function }> = [];
@@ -49,12 +67,9 @@ api.interceptors.response.use(
 
             try {
                 // Attempt to refresh token
-                const refreshResponse = await fetch(`${API_BASE_URL}/api/auth/refresh`, {
-                    method: 'POST',
-                    credentials: 'include'
-                });
+                const refreshed = await refreshAccessToken();
 
-                if (refreshResponse.ok) {
+                if (refreshed) {
                     isRefreshing = false;
                     processQueue(null, 'token_refreshed');
                     // Retry original request
@@ -16,10 +16,19 @@ export interface Suggestion {
     created_at: string;
 }
 
+export interface ProjectFile {
+    path: string;
+    sha: string;
+    size: number | null;
+    language: string | null;
+}
+
 export interface Project {
+    project_id: number;
     name: string;
     description?: string;
-    files: Record<string, string>;
+    // File contents are loaded on demand with getProjectFiles
+    manifest: ProjectFile[];
     updated_at: string;
     language?: string;
 }
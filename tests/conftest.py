@@ -11,8 +11,25 @@ except ImportError:
     mongomock = None
 
 
+if mongomock is not None:
+    # mongomock 4.3 predates the `sort` argument PyMongo >= 4.10 passes to bulk
+    # update/replace builders; drop it (it is always None for our operations).
+    from mongomock.collection import BulkOperationBuilder
+
+    def _without_sort(method):
+        def wrapper(self, *args, sort=None, **kwargs):
+            return method(self, *args, **kwargs)
+        return wrapper
+
+    BulkOperationBuilder.add_update = _without_sort(BulkOperationBuilder.add_update)
+    BulkOperationBuilder.add_replace = _without_sort(BulkOperationBuilder.add_replace)
+
+
 os.environ["SECRET_KEY"] = "test-secret-key"
 os.environ["MODE"] = "dev"
+# Async services run the (mongomock) sync client in worker threads
+os.environ["MONGO_ASYNC_DRIVER"] = "thread"
+os.environ["MIGRATE_PROJECTS_ON_STARTUP"] = "false"
 
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -44,6 +61,8 @@ def mock_mongo(monkeypatch: pytest.MonkeyPatch):
         return client[db_name or os.getenv("DB_NAME", "test_db")]
 
     monkeypatch.setattr(MongoModule, 'get_db_connection', fake_get_db_connection, raising=True)
+    # Modules that imported get_db_connection directly go through the shared client
+    monkeypatch.setattr(MongoModule, '_client', client, raising=True)
     yield
 
 @pytest.fixture()
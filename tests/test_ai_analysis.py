@@ -0,0 +1,102 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.ai.context_window import count_text_tokens
+from backend.analyzer.code_chunker import chunk_files
+
+
+class TrackingCompletions:
+    """Stands in for AsyncAzureOpenAI, recording prompts and how many completions overlap"""
+
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+        self.prompts = []
+        self.running = 0
+        self.max_running = 0
+
+    async def create(self, model, messages, stream=False):
+        prompt = messages[-1]["content"]
+        self.prompts.append(prompt)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        if "Combine their notes" in prompt:
+            reply = "final report"
+        else:
+            reply = "notes on " + ", ".join(line for line in prompt.splitlines() if line.startswith("# FILE:"))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+
+# Verifies: chunks stay within the token budget, keep a module together and split oversized files
+def test_chunk_files_groups_modules_within_budget():
+    files = [
+        ("proj", "game/board.py", "cells = []\n" * 60),
+        ("proj", "game/rules.py", "def valid(): pass\n" * 40),
+        ("proj", "main.py", "print('hi')\n" * 20),
+        ("proj", "big/data.py", "values.append(1)\n" * 800),
+        ("other", "empty.py", ""),
+    ]
+
+    chunks = chunk_files(files, max_tokens=500)
+
+    assert all(count_text_tokens(chunk) <= 500 for chunk in chunks)
+    headers = [[line for line in chunk.splitlines() if line.startswith("# FILE:")] for chunk in chunks]
+    assert ["# FILE: proj/game/board.py", "# FILE: proj/game/rules.py"] in headers
+    parts = [header for chunk in headers for header in chunk if "big/data.py" in header]
+    assert len(parts) > 1 and parts[-1].endswith(f"(part {len(parts)}/{len(parts)})")
+    assert not any("empty.py" in header for chunk in headers for header in chunk)
+
+
+# Verifies: a codebase larger than one prompt is analysed chunk by chunk within the concurrency limit and reduced into the stored report
+def test_large_codebase_is_analysed_in_chunks_and_reduced(monkeypatch: pytest.MonkeyPatch):
+    from backend.ai.ai_analyzer import AIAnalyzer
+    from backend.analyzer import ai_project_analyzer
+    from backend.mongodb.MongoDB import get_db_connection
+
+    db = get_db_connection("students")
+    db["projects"].insert_one({
+        "student_id": "s1",
+        "name": "proj",
+        "files": {f"module_{i}/code.py": f"value_{i} = {i}\n" * 150 for i in range(6)},
+    })
+    client = TrackingCompletions()
+    analyzer = AIAnalyzer.get_instance()
+    monkeypatch.setattr(analyzer, "client", client)
+    monkeypatch.setattr(analyzer, "cache", None)
+    monkeypatch.setattr(ai_project_analyzer, "ANALYSIS_CHUNK_TOKENS", 600)
+    monkeypatch.setattr(ai_project_analyzer, "ANALYSIS_CONCURRENCY", 2)
+
+    analysis = asyncio.run(ai_project_analyzer.AIProjectAnalyzer("s1").analyze_and_store_student_projects())
+
+    chunk_prompts = [prompt for prompt in client.prompts if "Combine their notes" not in prompt]
+    assert len(chunk_prompts) == 6
+    assert all("part" in prompt and "of 6 of the code" in prompt for prompt in chunk_prompts)
+    assert client.max_running == 2
+    assert analysis == "final report"
+    stored = db["code_analyses"].find_one({"student_id": "s1"})
+    assert stored["analysis"] == "final report"
+    assert stored["chunk_count"] == 6
+
+
+# Verifies: every source file is sent for analysis unless ANALYSIS_LANGUAGES narrows it down
+def test_student_files_include_all_languages_by_default(monkeypatch: pytest.MonkeyPatch):
+    from backend.analyzer import ai_project_analyzer
+    from backend.mongodb.MongoDB import get_db_connection
+
+    get_db_connection("students")["projects"].insert_one({
+        "student_id": "s2",
+        "name": "mixed",
+        "files": {"main.py": "print(1)", "Main.java": "class Main {}", "app.js": "let x = 1;"},
+    })
+    analyzer = ai_project_analyzer.AIProjectAnalyzer("s2")
+
+    everything = asyncio.run(analyzer._get_student_files())
+    monkeypatch.setattr(ai_project_analyzer, "ANALYSIS_LANGUAGES", ["Python"])
+    python_only = asyncio.run(analyzer._get_student_files())
+
+    assert sorted(path for _, path, _ in everything) == ["Main.java", "app.js", "main.py"]
+    assert [path for _, path, _ in python_only] == ["main.py"]
@@ -13,6 +13,13 @@ def make_token(sub: str, name: str = "user") -> str:
     return jwt.encode({"sub": sub, "name": name, "exp": exp}, SECRET_KEY, algorithm=ALGORITHM)
 
 
+# Helper to stub an async service method with a fixed return value
+def returning(value):
+    async def fake(self, *args, **kwargs):
+        return value
+    return fake
+
+
 # Verifies: analyzer endpoint returns transformed payload and 200
 
 def test_analyze_student_projects(client: TestClient, monkeypatch: pytest.MonkeyPatch):
@@ -37,21 +44,80 @@ def test_gitlab_student_projects(client: TestClient, monkeypatch: pytest.MonkeyP
 
     coll = mongomock.MongoClient()['test']['projects']
     coll.insert_many([
-        {'_id': '1', 'name': 'A'},
-        {'_id': '2', 'name': 'B'},
+        {'_id': '1', 'student_id': 's123', 'name': 'A'},
+        {'_id': '2', 'student_id': 's123', 'name': 'B'},
+        {'_id': '3', 'student_id': 'other', 'name': 'C'},
     ])
 
-    def fake_get_student_collection(self, student_id: str):
+    def fake_get_projects_collection(self):
         return coll
 
-    monkeypatch.setattr(GitlabService, 'get_student_collection', fake_get_student_collection, raising=True)
+    monkeypatch.setattr(GitlabService, 'get_projects_collection', fake_get_projects_collection, raising=True)
 
     token = make_token(sub='s123')
     resp = client.get('/api/student/s123/projects', cookies={'app_token': token})
     assert resp.status_code == 200
     body = resp.json()
     assert body['student_id'] == 's123'
-    assert body['projects'] == [{'name': 'A'}, {'name': 'B'}]
+    assert body['projects'] == [
+        {'student_id': 's123', 'name': 'A', 'manifest': []},
+        {'student_id': 's123', 'name': 'B', 'manifest': []},
+    ]
+
+
+# Verifies: the project list only carries manifests and file bodies are loaded per project on request
+def test_gitlab_student_project_files_are_loaded_lazily(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    from backend.routers.gitlab_router import GitlabService
+    from backend.services.blob_service import BlobService, build_manifest
+    import mongomock
+
+    db = mongomock.MongoClient()['students']
+    blobs = BlobService(db)
+    file_shas = {'main.py': 'sha-main', 'README.md': 'sha-readme'}
+    blobs.update_refs({'main.py': 'print(1)', 'README.md': '# A'}, file_shas, {})
+    db['projects'].insert_one({
+        'student_id': 's123', 'project_id': 7, 'name': 'A',
+        'manifest': build_manifest(file_shas, blobs.get_sizes(file_shas.values())),
+    })
+    monkeypatch.setattr(GitlabService, 'get_projects_collection', lambda self: db['projects'], raising=True)
+    monkeypatch.setattr(GitlabService, '__init__', lambda self: setattr(self, 'blob_service', blobs), raising=True)
+
+    token = make_token(sub='s123')
+    project = client.get('/api/student/s123/projects', cookies={'app_token': token}).json()['projects'][0]
+    assert 'files' not in project
+    assert project['manifest'][1] == {'path': 'main.py', 'sha': 'sha-main', 'size': 8, 'language': 'Python'}
+
+    resp = client.get('/api/student/s123/projects/7/files', params={'path': 'main.py'}, cookies={'app_token': token})
+    assert resp.json() == {'project_id': 7, 'files': {'main.py': 'print(1)'}}
+    assert client.get('/api/student/s123/projects/8/files', cookies={'app_token': token}).status_code == 404
+
+
+# Verifies: counts and stats are aggregated in MongoDB across manifest, file_shas and embedded layouts
+def test_gitlab_student_project_stats(client: TestClient):
+    from backend.mongodb.MongoDB import get_db_connection
+
+    get_db_connection('students')['projects'].insert_many([
+        {'student_id': 's123', 'project_id': 1, 'name': 'A', 'manifest': [
+            {'path': 'a.py', 'sha': '1', 'size': 10, 'language': 'Python'},
+            {'path': 'b.py', 'sha': '2', 'size': 5, 'language': 'Python'},
+            {'path': 'README.md', 'sha': '3', 'size': 20, 'language': 'Markdown'},
+        ]},
+        {'student_id': 's123', 'project_id': 2, 'name': 'B', 'file_shas': {'x.py': '4', 'y.py': '5'}},
+        {'student_id': 's123', 'project_id': 3, 'name': 'C', 'files': {'z.py': 'print(1)'}},
+        {'student_id': 'other', 'project_id': 4, 'name': 'D', 'manifest': [{'path': 'q.py', 'sha': '6', 'size': 1, 'language': 'Python'}]},
+    ])
+    cookies = {'app_token': make_token(sub='s123')}
+
+    assert client.get('/api/student/s123/projects/count', cookies=cookies).json() == {'count': 3}
+    assert client.get('/api/student/s123/files/count', cookies=cookies).json() == {'count': 6}
+
+    stats = client.get('/api/student/s123/projects/stats', cookies=cookies).json()
+    assert (stats['project_count'], stats['file_count'], stats['total_bytes']) == (3, 6, 35)
+    assert stats['languages'] == [
+        {'language': 'Python', 'file_count': 2, 'total_bytes': 15},
+        {'language': 'Markdown', 'file_count': 1, 'total_bytes': 20},
+    ]
+    assert stats['projects'][0] == {'project_id': 1, 'name': 'A', 'file_count': 3, 'total_bytes': 35}
 
 
 # -------------------- student_router.py --------------------
@@ -62,7 +128,7 @@ def test_students_get_suggestions(client: TestClient, monkeypatch: pytest.Monkey
     from backend.models.suggestion import SuggestionInDB
     from datetime import datetime
 
-    def fake_get_all(self, student_id: str):
+    async def fake_get_all(self, student_id: str):
         return [SuggestionInDB.model_validate({'_id': 'x1', 'student_id': student_id, 'suggestion': 'Try X', 'created_at': datetime.utcnow()})]
 
     monkeypatch.setattr(SuggestionService, 'get_all_for_student', fake_get_all, raising=True)
@@ -78,7 +144,7 @@ def test_students_create(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     from backend.routers.student_router import StudentService
     from backend.models.student import Student
 
-    def fake_get_or_create(self, gitlab_username: str):
+    async def fake_get_or_create(self, gitlab_username: str):
         return Student.model_validate({'_id': 'stu1', 'gitlab_username': gitlab_username})
 
     monkeypatch.setattr(StudentService, 'get_or_create_student', fake_get_or_create, raising=True)
@@ -106,15 +172,33 @@ def test_students_sync_requires_cookie(client: TestClient):
 def test_students_sync_ok(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     from backend.routers.student_router import StudentService
 
-    def fake_sync(self, gitlab_username: str, encrypted_gitlab_token: str):
-        return {'synced': True, 'user': gitlab_username}
+    async def fake_enqueue(self, gitlab_username: str, encrypted_gitlab_token: str):
+        return {'job_id': 'job1', 'status': 'queued', 'gitlab_username': gitlab_username, 'created': True}
 
-    monkeypatch.setattr(StudentService, 'sync_student_with_token', fake_sync, raising=True)
+    monkeypatch.setattr(StudentService, 'enqueue_sync_with_token', fake_enqueue, raising=True)
 
     token = make_token(sub='u1', name='alice')
     resp = client.post('/api/students/sync', json={'gitlab_username': 'alice'}, cookies={'app_token': token, 'gitlab_token': 'secret'})
+    assert resp.status_code == 202
+    assert resp.json()['job_id'] == 'job1'
+
+
+def test_students_sync_status_checks_owner(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    from backend.routers.student_router import StudentService
+
+    jobs = {'job1': {'job_id': 'job1', 'gitlab_username': 'alice', 'status': 'running', 'projects': []}}
+    async def fake_get_sync_job(self, job_id: str):
+        return jobs.get(job_id)
+
+    monkeypatch.setattr(StudentService, 'get_sync_job', fake_get_sync_job, raising=True)
+
+    resp = client.get('/api/students/sync/job1', cookies={'app_token': make_token(sub='u1', name='alice')})
     assert resp.status_code == 200
-    assert resp.json()['synced'] is True
+    assert resp.json()['status'] == 'running'
+    resp = client.get('/api/students/sync/job1', cookies={'app_token': make_token(sub='u2', name='bob')})
+    assert resp.status_code == 403
+    resp = client.get('/api/students/sync/nope', cookies={'app_token': make_token(sub='u1', name='alice')})
+    assert resp.status_code == 404
 
 
 # -------------------- suggestion_router.py --------------------
@@ -124,8 +208,8 @@ def test_suggestion_delete_success(client: TestClient, monkeypatch: pytest.Monke
     from backend.routers.suggestion_router import SuggestionService
 
     # Mock get_one to return a suggestion owned by user 'u1'
-    monkeypatch.setattr(SuggestionService, 'get_one', lambda self, sid: {"student_id": "u1", "_id": "sg1"}, raising=True)
-    monkeypatch.setattr(SuggestionService, 'delete', lambda self, sid: True, raising=True)
+    monkeypatch.setattr(SuggestionService, 'get_one', returning({"student_id": "u1", "_id": "sg1"}), raising=True)
+    monkeypatch.setattr(SuggestionService, 'delete', returning(True), raising=True)
     token = make_token(sub='u1')
     resp = client.delete('/api/suggestions/sg1', cookies={'app_token': token})
     assert resp.status_code == 200
@@ -135,7 +219,7 @@ def test_suggestion_delete_success(client: TestClient, monkeypatch: pytest.Monke
 def test_suggestion_delete_not_found(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     from backend.routers.suggestion_router import SuggestionService
 
-    monkeypatch.setattr(SuggestionService, 'delete', lambda self, sid: False, raising=True)
+    monkeypatch.setattr(SuggestionService, 'delete', returning(False), raising=True)
     token = make_token(sub='u1')
     resp = client.delete('/api/suggestions/sg404', cookies={'app_token': token})
     assert resp.status_code == 404
@@ -147,7 +231,7 @@ def test_suggestion_delete_not_found(client: TestClient, monkeypatch: pytest.Mon
 def test_ai_analyze_projects_job(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     from backend.routers.ai_router import AIProjectAnalyzer
 
-    monkeypatch.setattr(AIProjectAnalyzer, 'analyze_and_store_student_projects', lambda self: {'ok': True}, raising=True)
+    monkeypatch.setattr(AIProjectAnalyzer, 'analyze_and_store_student_projects', returning({'ok': True}), raising=True)
     token = make_token(sub='u1')
     resp = client.post('/api/ai-analyze-student-projects/u1', cookies={'app_token': token})
     assert resp.status_code == 200
@@ -157,7 +241,7 @@ def test_ai_analyze_projects_job(client: TestClient, monkeypatch: pytest.MonkeyP
 def test_ai_create_suggestions(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     from backend.routers.ai_router import AIProjectAnalyzer
 
-    monkeypatch.setattr(AIProjectAnalyzer, 'create_project_suggestions', lambda self: [{'s': 1}], raising=True)
+    monkeypatch.setattr(AIProjectAnalyzer, 'create_project_suggestions', returning([{'s': 1}]), raising=True)
     token = make_token(sub='u1')
     resp = client.post('/api/ai-suggest-projects/u1', cookies={'app_token': token})
     assert resp.status_code == 200
@@ -167,7 +251,7 @@ def test_ai_create_suggestions(client: TestClient, monkeypatch: pytest.MonkeyPat
 def test_ai_get_suggestions(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     from backend.routers.ai_router import AIProjectAnalyzer
 
-    monkeypatch.setattr(AIProjectAnalyzer, 'get_project_suggestions', lambda self: [{'s': 2}], raising=True)
+    monkeypatch.setattr(AIProjectAnalyzer, 'get_project_suggestions', returning([{'s': 2}]), raising=True)
     token = make_token(sub='u1')
     resp = client.get('/api/ai-get-suggestions/u1', cookies={'app_token': token})
     assert resp.status_code == 200
@@ -177,7 +261,7 @@ def test_ai_get_suggestions(client: TestClient, monkeypatch: pytest.MonkeyPatch)
 def test_ai_get_analysis(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     from backend.routers.ai_router import AIProjectAnalyzer
 
-    monkeypatch.setattr(AIProjectAnalyzer, 'get_stored_analysis', lambda self: {'a': 1}, raising=True)
+    monkeypatch.setattr(AIProjectAnalyzer, 'get_stored_analysis', returning({'a': 1}), raising=True)
     token = make_token(sub='u1')
     resp = client.get('/api/ai-get-analysis/u1', cookies={'app_token': token})
     assert resp.status_code == 200
@@ -187,7 +271,7 @@ def test_ai_get_analysis(client: TestClient, monkeypatch: pytest.MonkeyPatch):
 def test_ai_delete_all_suggestions(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     from backend.routers.ai_router import AIProjectAnalyzer
 
-    monkeypatch.setattr(AIProjectAnalyzer, 'delete_all_project_suggestions', lambda self: 'ok', raising=True)
+    monkeypatch.setattr(AIProjectAnalyzer, 'delete_all_project_suggestions', returning('ok'), raising=True)
     token = make_token(sub='u1')
     resp = client.delete('/api/ai-delete-all-suggestions/u1', cookies={'app_token': token})
     assert resp.status_code == 200
@@ -197,7 +281,7 @@ def test_ai_delete_all_suggestions(client: TestClient, monkeypatch: pytest.Monke
 def test_ai_delete_suggestion(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     from backend.routers.ai_router import AIProjectAnalyzer
 
-    monkeypatch.setattr(AIProjectAnalyzer, 'delete_project_suggestions', lambda self, sid: 'deleted', raising=True)
+    monkeypatch.setattr(AIProjectAnalyzer, 'delete_project_suggestions', returning('deleted'), raising=True)
     token = make_token(sub='u1')
     resp = client.delete('/api/ai-delete-suggestion/u1/sg1', cookies={'app_token': token})
     assert resp.status_code == 200
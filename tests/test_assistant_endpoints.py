@@ -55,7 +55,7 @@ def test_clear_assistant_messages(client: TestClient):
 # Strategy: monkeypatch Assistant.get_assistant_response to avoid external API
 def test_add_system_message_and_get_response(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     # Stub assistant response to avoid network
-    def fake_get_response(self, session_id: str, prompt: str, code: str | None = None) -> str:
+    async def fake_get_response(self, session_id: str, prompt: str, code: str | None = None) -> str:
         return "ok-test"
 
     # Patch the session assistant's get_assistant_response method
@@ -77,7 +77,7 @@ def test_session_isolation(client: TestClient, monkeypatch: pytest.MonkeyPatch):
     Test that different sessions maintain separate conversation histories and system prompts.
     """
     # Mock the OpenAI client to avoid external API calls
-    def fake_get_response(self, session_id: str, prompt: str, code: str | None = None) -> str:
+    async def fake_get_response(self, session_id: str, prompt: str, code: str | None = None) -> str:
         # Return different responses based on session to verify isolation
         if session_id == "default_session":
             return f"Default response to: {prompt}"
@@ -156,3 +156,182 @@ def test_create_and_delete_session(client: TestClient):
     assert resp3.status_code == 200
 
 
+def test_create_session_without_id_gets_a_unique_one(client: TestClient):
+    """
+    Sessions created without an ID get distinct ones, without listing every session.
+    """
+    token = make_token(sub='u1')
+
+    ids = [
+        client.post("/api/assistant/create-session", json={"system_message": "Survey assistant."},
+                    cookies={'app_token': token}).json()["session_id"]
+        for _ in range(2)
+    ]
+
+    assert all(session_id.startswith("user_u1_survey_") for session_id in ids)
+    assert ids[0] != ids[1]
+
+
+
+
+class SlowCompletions:
+    """Stands in for AsyncAzureOpenAI, answering every completion after a delay"""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.chat = self
+        self.completions = self
+
+    async def create(self, model, messages, stream=False):
+        import asyncio
+        from types import SimpleNamespace
+
+        reply = f"echo: {messages[-1]['content']}"
+        if stream:
+            return self._stream(reply)
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+    async def _stream(self, reply: str):
+        import asyncio
+        from types import SimpleNamespace
+
+        yield SimpleNamespace(choices=[])
+        for word in reply.split(" "):
+            await asyncio.sleep(self.delay)
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=word + " "))])
+
+
+# Verifies: concurrent chats overlap on the event loop instead of queueing behind each other
+def test_concurrent_assistant_requests_do_not_serialize(monkeypatch: pytest.MonkeyPatch):
+    import asyncio
+    import time
+    import httpx
+
+    assistant = SessionAssistantManager.get_instance().get_assistant()
+    monkeypatch.setattr(assistant, "client", SlowCompletions(delay=0.3))
+    cookies = {'app_token': make_token(sub='u1')}
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", cookies=cookies) as http:
+            return await asyncio.gather(*(
+                http.post("/api/assistant", json={"prompt": f"hi {i}", "session_id": f"load_{i}"})
+                for i in range(8)
+            ))
+
+    started = time.monotonic()
+    responses = asyncio.run(run())
+    elapsed = time.monotonic() - started
+
+    assert [r.json()["response"] for r in responses] == [f"echo: hi {i}" for i in range(8)]
+    assert elapsed < 0.3 * 3
+
+
+# Verifies: a completion past the deadline is abandoned and leaves the session history untouched
+def test_assistant_request_times_out_without_touching_history(monkeypatch: pytest.MonkeyPatch):
+    import asyncio
+    from backend.ai import openai_client
+
+    assistant = SessionAssistantManager.get_instance().get_assistant()
+    monkeypatch.setattr(assistant, "client", SlowCompletions(delay=1))
+    monkeypatch.setattr(openai_client, "OPENAI_TIMEOUT", 0.05)
+    asyncio.run(assistant.create_session("timeout_session", "You are terse."))
+
+    response = asyncio.run(assistant.get_assistant_response("timeout_session", "Hello"))
+
+    assert "too long" in response
+    assert asyncio.run(assistant.get_session_history("timeout_session")) == [{"role": "system", "content": "You are terse."}]
+
+
+# Verifies: the stream yields the first token long before the reply is complete and then records the reply
+def test_stream_assistant_response_yields_tokens_early(monkeypatch: pytest.MonkeyPatch):
+    import asyncio
+    import time
+
+    assistant = SessionAssistantManager.get_instance().get_assistant()
+    monkeypatch.setattr(assistant, "client", SlowCompletions(delay=0.1))
+    asyncio.run(assistant.create_session("stream_session"))
+
+    async def run():
+        started = time.monotonic()
+        arrivals = []
+        async for token in assistant.stream_assistant_response("stream_session", "one two three four"):
+            arrivals.append((time.monotonic() - started, token))
+        return arrivals
+
+    arrivals = asyncio.run(run())
+
+    assert "".join(token for _, token in arrivals).strip() == "echo: one two three four"
+    assert arrivals[0][0] < 0.2 < arrivals[-1][0]
+    assert asyncio.run(assistant.get_session_history("stream_session"))[-1] == {"role": "assistant", "content": "echo: one two three four"}
+
+
+# Verifies: /assistant/stream sends token events followed by a done event with the full reply
+def test_assistant_stream_endpoint_sends_server_sent_events(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    import json
+
+    assistant = SessionAssistantManager.get_instance().get_assistant()
+    monkeypatch.setattr(assistant, "client", SlowCompletions(delay=0))
+    token = make_token(sub='u1')
+
+    resp = client.post("/api/assistant/stream", json={"prompt": "Hi there", "session_id": "sse_session"}, cookies={'app_token': token})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n", 1) for block in resp.text.strip().split("\n\n")]
+    names = [name.removeprefix("event: ") for name, _ in events]
+    payloads = [json.loads(data.removeprefix("data: ")) for _, data in events]
+    assert names == ["token", "token", "token", "done"]
+    assert "".join(p["token"] for p in payloads[:-1]).strip() == payloads[-1]["response"] == "echo: Hi there"
+
+
+# Verifies: identical stateless analyzer calls are served from the LRU, then from MongoDB after a restart, and errors are never cached
+def test_ai_response_cache_skips_repeated_llm_calls(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    import asyncio
+    import mongomock
+    from backend.ai.ai_analyzer import AIAnalyzer
+    from backend.ai.response_cache import ResponseCache
+    from backend.mongodb.async_db import ThreadedDatabase
+
+    class CountingCompletions(SlowCompletions):
+        calls = 0
+
+        async def create(self, model, messages, stream=False):
+            CountingCompletions.calls += 1
+            if "fail" in messages[-1]["content"]:
+                raise RuntimeError("gateway down")
+            return await super().create(model, messages, stream)
+
+    db = ThreadedDatabase(mongomock.MongoClient()["students"])
+    analyzer = AIAnalyzer.get_instance()
+    monkeypatch.setattr(analyzer, "client", CountingCompletions(delay=0))
+    monkeypatch.setattr(analyzer, "cache", ResponseCache(db))
+
+    async def ask(prompt, version="analysis-v1"):
+        return await analyzer.get_ai_response(prompt, add_promt_to_history=False, add_response_to_history=False, cache_version=version)
+
+    assert asyncio.run(ask("def f(): pass")) == asyncio.run(ask("def f(): pass")) == "echo: def f(): pass"
+    assert CountingCompletions.calls == 1
+
+    monkeypatch.setattr(analyzer, "cache", ResponseCache(db))
+    asyncio.run(ask("def f(): pass"))
+    asyncio.run(ask("def f(): pass", version="analysis-v2"))
+    asyncio.run(ask("fail"))
+    asyncio.run(ask("fail"))
+    assert CountingCompletions.calls == 4
+
+    resp = client.get("/api/ai/cache/stats", cookies={'app_token': make_token(sub='u1')})
+    stats = resp.json()
+    assert stats["enabled"] is True
+    assert (stats["memory_hits"], stats["mongo_hits"], stats["misses"], stats["entries"]) == (0, 1, 3, 2)
+
+
+# Verifies: the session gauges count the sessions the assistant holds
+def test_assistant_session_stats(client: TestClient):
+    token = make_token(sub='u1')
+    before = client.get("/api/assistant/sessions/stats", cookies={'app_token': token}).json()["sessions"]
+    client.post("/api/assistant/create-session", json={"session_id": "gauge_session", "system_message": "Hi"}, cookies={'app_token': token})
+
+    stats = client.get("/api/assistant/sessions/stats", cookies={'app_token': token}).json()
+    assert stats["sessions"] == before + 1
+    assert stats["bytes"] > 0
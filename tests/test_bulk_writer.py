@@ -0,0 +1,35 @@
+import mongomock
+
+from backend.mongodb.bulk_writer import MAX_BSON_SIZE, BulkWriter
+
+
+# Verifies: writes are split into size-bounded batches and every item lands
+def test_bulk_writer_splits_batches_by_size():
+    collection = mongomock.MongoClient()["students"]["s1"]
+    writer = BulkWriter(collection, max_batch_bytes=2000, max_batch_size=100)
+
+    report = writer.update_many(
+        [({"project_id": i}, {"$set": {"project_id": i, "readme": "x" * 500}}) for i in range(10)],
+        upsert=True
+    )
+
+    assert report["upserted"] == 10
+    assert report["batches"] == 4
+    assert report["failed"] == []
+    assert collection.count_documents({}) == 10
+
+
+# Verifies: a failing item is reported with its input index while the rest of its batch is written
+def test_bulk_writer_reports_per_item_failures():
+    collection = mongomock.MongoClient()["students"]["suggested_tasks"]
+    collection.create_index("suggestion", unique=True)
+    collection.insert_one({"suggestion": "taken"})
+    too_large = "x" * (MAX_BSON_SIZE + 1)
+
+    report = BulkWriter(collection).insert_many(
+        [{"suggestion": "a"}, {"suggestion": "taken"}, {"suggestion": too_large}, {"suggestion": "b"}]
+    )
+
+    assert [failure["index"] for failure in report["failed"]] == [1, 2]
+    assert report["inserted"] == 2
+    assert collection.count_documents({}) == 3
@@ -0,0 +1,162 @@
+import asyncio
+from types import SimpleNamespace
+
+from backend.ai.context_window import CODE_NAME, SUMMARY_NAME, ContextWindow, count_tokens, latest_code
+from backend.ai.session_assistant import SessionAssistant
+from backend.ai.session_store import MemorySessionStore, trim_to_bytes
+
+
+def exchange(i: int) -> list[dict]:
+    return [{"role": "user", "content": f"question {i}"}, {"role": "assistant", "content": f"answer {i}"}]
+
+
+class RecordingCompletions:
+    """Stands in for AsyncAzureOpenAI, recording the messages of every completion"""
+
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+        self.requests = []
+
+    async def create(self, model, messages, stream=False):
+        self.requests.append(messages)
+        reply = "summary" if "Summarize" in messages[0]["content"] else f"echo: {messages[-1]['content']}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+
+# Verifies: a request carries the instructions, the last turns and the code in full once
+def test_build_keeps_system_prompt_recent_turns_and_full_code():
+    window = ContextWindow(keep_turns=2)
+    system = {"role": "system", "content": "You are a tutor."}
+    history = [system]
+    for i in range(5):
+        history += window.turn(history, f"question {i}", code=f"print({i})")[:1] + exchange(i)[1:]
+
+    messages = window.build(history, window.turn(history, "question 5", code="print(4)"))
+
+    assert messages[0] == system
+    assert [m["content"] for m in messages[1:]] == [
+        "Here is my current code:\nprint(3)", "answer 3",
+        "Here is my current code:\nprint(4)", "answer 4",
+        "question 5",
+    ]
+    assert all(set(m) <= {"role", "name", "content"} for m in messages)
+
+
+# Verifies: unchanged code adds nothing, a small edit is sent as a diff and a rewrite in full
+def test_turn_sends_code_changes_as_diffs():
+    window = ContextWindow()
+    code = "".join(f"line_{i} = {i}\n" for i in range(40))
+    history = window.turn([], "first", code) + exchange(0)[1:]
+
+    assert window.turn(history, "again", code) == [{"role": "user", "content": "again"}]
+
+    edited = window.turn(history, "edited", code.replace("line_7 = 7", "line_7 = 70"))
+    assert edited[0]["content"].startswith("I changed my code since the last version:\n--- before\n+++ after")
+    assert "-line_7 = 7\n+line_7 = 70\n" in edited[0]["content"]
+    assert len(edited[0]["content"]) < len(code)
+
+    rewritten = window.turn(history + edited, "rewritten", "print('new')\n")
+    assert rewritten[0]["content"] == "Here is my current code:\nprint('new')\n"
+
+
+# Verifies: the session stores only diffs between periodic full copies and rebuilds the current code from them
+def test_stored_code_is_diffs_between_periodic_snapshots():
+    window = ContextWindow(snapshot_every=4)
+    code = "".join(f"line_{i} = {i}\n" for i in range(200))
+    history = []
+    for i in range(10):
+        code = code.replace(f"line_{i} = {i}\n", f"line_{i} = {i * 10}\n")
+        history += window.turn(history, f"edit {i}", code) + exchange(i)[1:]
+
+    stored = [m for m in history if m.get("name") == CODE_NAME]
+    full = [m for m in stored if m["content"].startswith("Here is my current code:")]
+    assert len(full) == 3
+    assert sum(len(m["content"]) for m in stored) < 4 * len(code)
+    assert all(set(m) == {"role", "name", "content", "sha"} for m in stored)
+    assert latest_code(history)["code"] == code
+    assert window.build(history, [])[-3]["content"].startswith("I changed my code since the last version:")
+
+
+# Verifies: trimming a session keeps the full copy its diffs apply to, and diffs left without one are dropped and the code resent
+def test_trimmed_history_still_builds_from_a_full_copy():
+    window = ContextWindow(keep_turns=1)
+    code = "".join(f"line_{i} = {i}\n" for i in range(200))
+    history = [{"role": "system", "content": "You are a tutor."}]
+    for i in range(4):
+        code = code.replace(f"line_{i} = {i}\n", f"line_{i} = {i * 10}\n")
+        history += window.turn(history, f"edit {i} " + "x" * 1000, code) + exchange(i)[1:]
+
+    trimmed = trim_to_bytes(history, 5000)
+    assert len(trimmed) < len(history)
+    assert latest_code(trimmed)["code"] == code
+    messages = window.build(trimmed, window.turn(trimmed, "next"))
+    assert messages[1]["content"] == f"Here is my current code:\n{code}"
+
+    orphaned = [m for m in history if not m.get("content", "").startswith("Here is my current code:")]
+    messages = window.build(orphaned, window.turn(orphaned, "next", code))
+    assert [m["content"] for m in messages if m.get("name") == CODE_NAME] == [f"Here is my current code:\n{code}"]
+
+
+# Verifies: the oldest verbatim turns are dropped to stay within the token budget
+def test_build_stays_within_token_budget():
+    window = ContextWindow(max_tokens=200, keep_turns=10)
+    history = [{"role": "system", "content": "You are a tutor."}]
+    for i in range(10):
+        history += [{"role": "user", "content": f"question {i} " + "x" * 200}, {"role": "assistant", "content": f"answer {i}"}]
+
+    messages = window.build(history, window.turn(history, "last question"))
+
+    assert count_tokens(messages) <= 200
+    assert messages[0]["role"] == "system"
+    assert messages[-1]["content"] == "last question"
+    assert messages[-2]["content"] == "answer 9"
+
+
+# Verifies: old turns are folded into a stored summary once per batch and requests stop growing
+def test_assistant_folds_old_turns_into_summary():
+    client = RecordingCompletions()
+    assistant = SessionAssistant(store=MemorySessionStore(), context=ContextWindow(keep_turns=2, summary_batch=2))
+    assistant.client = client
+
+    async def chat():
+        await assistant.create_session("s", "You are a tutor.")
+        for i in range(9):
+            await assistant.get_assistant_response("s", f"question {i}", code=f"print({i})")
+        return await assistant.get_session_history("s")
+
+    history = asyncio.run(chat())
+
+    summaries = [request for request in client.requests if "Summarize" in request[0]["content"]]
+    answers = [request for request in client.requests if "Summarize" not in request[0]["content"]]
+    assert len(summaries) == 3
+    assert len(answers[-1]) == len(answers[4])
+    assert answers[-1][1] == {"role": "system", "name": SUMMARY_NAME, "content": "Summary of the earlier conversation: summary"}
+    assert [m for m in history if m.get("name") == SUMMARY_NAME][0]["content"].endswith("summary")
+    assert history[-1] == {"role": "assistant", "content": "echo: question 8"}
+
+
+# Verifies: the assistant sends the file once, then only diffs, and the window always starts from a full copy
+def test_assistant_sends_code_diffs_between_requests():
+    client = RecordingCompletions()
+    assistant = SessionAssistant(store=MemorySessionStore(), context=ContextWindow(keep_turns=1, summary_batch=10))
+    assistant.client = client
+    code = "".join(f"total += {i}\n" for i in range(50))
+
+    async def chat():
+        await assistant.create_session("s", "You are a tutor.")
+        await assistant.get_assistant_response("s", "first", code=code)
+        await assistant.get_assistant_response("s", "same", code=code)
+        await assistant.get_assistant_response("s", "edited", code=code.replace("total += 9\n", "total -= 9\n"))
+
+    asyncio.run(chat())
+
+    first, same, edited = client.requests
+    code_messages = [[m for m in request if m.get("name") == CODE_NAME] for request in client.requests]
+    assert [m["content"] for m in first[1:]] == [f"Here is my current code:\n{code}", "first"]
+    assert [m["content"] for m in same[1:]] == [f"Here is my current code:\n{code}", "first", "echo: first", "same"]
+    # The turn that sent the file has left the one-turn window, a full copy takes its place
+    assert [m["content"] for m in edited[1:4]] == [f"Here is my current code:\n{code}", "same", "echo: same"]
+    assert edited[4]["content"].startswith("I changed my code since the last version:")
+    assert edited[5]["content"] == "edited"
+    assert [len(messages) for messages in code_messages] == [1, 1, 2]
@@ -0,0 +1,641 @@
+import asyncio
+import hashlib
+import io
+import json
+import tarfile
+from urllib.parse import unquote
+
+import httpx
+import pytest
+
+from backend.gitlab.request_scheduler import RequestScheduler
+from backend.gitlab.sync_engine import GitlabSyncEngine
+
+
+def git_blob_sha(content: str) -> str:
+    data = content.encode()
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class FakeGitlab:
+    """
+    Minimal in-process GitLab API used to exercise the sync engine offline.
+    Tracks in-flight requests so tests can assert on concurrency.
+    """
+
+    def __init__(self, projects: dict, delay: float = 0.0, page_size: int = 100, throttle_first: int = 0, etags: bool = False,
+                 statistics: bool = False, x_total: bool = False):
+        self.projects = projects
+        self.etags = etags
+        self.statistics = statistics
+        self.x_total = x_total
+        self.not_modified = 0
+        self.delay = delay
+        self.page_size = page_size
+        self.throttle_first = throttle_first
+        self.calls: list[str] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle)
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            path = unquote(request.url.raw_path.decode().split("?")[0]).removeprefix("/api/v4")
+            self.calls.append(path)
+            if self.throttle_first > 0:
+                self.throttle_first -= 1
+                return httpx.Response(429, headers={"Retry-After": "0"}, text="Retry later")
+            response = self.route(request, path)
+            if self.etags and response.status_code == 200 and not path.endswith(("/raw", ".tar.gz")):
+                etag = f'W/"{hashlib.sha1(response.content).hexdigest()}"'
+                if request.headers.get("If-None-Match") == etag:
+                    self.not_modified += 1
+                    return httpx.Response(304, headers={"ETag": etag})
+                response.headers["ETag"] = etag
+            return response
+        finally:
+            self.in_flight -= 1
+
+    def route(self, request: httpx.Request, path: str) -> httpx.Response:
+        if request.headers.get("Authorization") != "Bearer token":
+            return httpx.Response(401, text="Unauthorized")
+        if path == "/user":
+            return httpx.Response(200, json={"username": "alice"})
+        if path == "/projects":
+            with_statistics = self.statistics and request.url.params.get("statistics") == "true"
+            return self.paginated(request, [
+                {
+                    "id": pid, "name": p["name"], "default_branch": "main", "web_url": f"https://gitlab/{p['name']}",
+                    "path_with_namespace": f"alice/{p['name']}",
+                    **({"statistics": {"commit_count": p.get("commits", 1)}} if with_statistics else {}),
+                }
+                for pid, p in self.projects.items()
+            ])
+        if path == "/api/graphql":
+            paths = json.loads(request.content)["variables"]["paths"]
+            return httpx.Response(200, json={"data": {"projects": {"nodes": [
+                {"fullPath": f"alice/{p['name']}", "statistics": {"commitCount": float(p.get("commits", 1))}}
+                for p in self.projects.values() if f"alice/{p['name']}" in paths
+            ]}}})
+
+        parts = path.strip("/").split("/")
+        project = self.projects[int(parts[1])]
+        rest = "/".join(parts[2:])
+        if rest == "languages":
+            return httpx.Response(200, json=project["languages"])
+        if rest == "repository/commits":
+            headers = {"X-Total": str(project.get("commits", 1))} if self.x_total else {}
+            return httpx.Response(200, json=[{"id": project.get("head", "c1")}], headers=headers)
+        if rest == "repository/tree":
+            return self.paginated(request, [
+                {"type": "blob", "path": file_path, "id": git_blob_sha(content)}
+                for file_path, content in project["files"].items()
+            ] + [{"type": "tree", "path": "src", "id": "t1"}])
+        if rest == "repository/archive.tar.gz":
+            return httpx.Response(200, content=self.archive(project))
+        if rest.startswith("repository/blobs/") and rest.endswith("/raw"):
+            sha = rest.split("/")[2]
+            for content in project["files"].values():
+                if git_blob_sha(content) == sha:
+                    return httpx.Response(200, content=content.encode())
+        return httpx.Response(404)
+
+
+    def paginated(self, request: httpx.Request, items: list) -> httpx.Response:
+        """Keyset pagination with a Link header when asked for, offset pagination with X-Next-Page otherwise"""
+        size = min(int(request.url.params.get("per_page", 20)), self.page_size)
+        if request.url.params.get("pagination") == "keyset":
+            start = int(request.url.params.get("page_token", 0))
+            headers = {}
+            if start + size < len(items):
+                next_url = request.url.copy_set_param("page_token", str(start + size))
+                headers["Link"] = f'<{next_url}>; rel="next"'
+        else:
+            page = int(request.url.params.get("page", 1))
+            start = (page - 1) * size
+            headers = {"X-Next-Page": str(page + 1) if start + size < len(items) else ""}
+        return httpx.Response(200, json=items[start:start + size], headers=headers)
+
+    def archive(self, project: dict) -> bytes:
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+            for file_path, content in project["files"].items():
+                data = content.encode()
+                info = tarfile.TarInfo(f"{project['name']}-main-abc123/{file_path}")
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        return buffer.getvalue()
+
+
+def make_projects() -> dict:
+    return {
+        1: {
+            "name": "alpha",
+            "languages": {"Python": 100.0},
+            "files": {"main.py": "print('a')", "README.md": "# alpha", "logo.png": "binary"},
+        },
+        2: {
+            "name": "beta",
+            "languages": {"Java": 100.0},
+            "files": {f"src/Mod{i}.java": f"class Mod{i} {{}}" for i in range(6)},
+        },
+    }
+
+
+def fast_scheduler(**kwargs) -> RequestScheduler:
+    return RequestScheduler(**{"rate": 10_000, "burst": 10_000, "backoff_base": 0, **kwargs})
+
+
+def run_engine(fake: FakeGitlab, previous=None, known_blobs=None, **kwargs):
+    kwargs.setdefault("scheduler", fast_scheduler())
+
+    async def run():
+        async with GitlabSyncEngine("token", base_url="https://gitlab.test", transport=fake.transport(), **kwargs) as engine:
+            return await engine.fetch_user_projects(previous, known_blobs)
+    return asyncio.run(run())
+
+
+# Verifies: the async engine returns the same document shape that store_projects_for_student upserts
+def test_sync_engine_builds_project_documents():
+    fake = FakeGitlab(make_projects())
+    projects = sorted(run_engine(fake), key=lambda p: p["project_id"])
+
+    assert [p["name"] for p in projects] == ["alpha", "beta"]
+    alpha = projects[0]
+    assert alpha["files"] == {"main.py": "print('a')", "README.md": "# alpha"}
+    assert alpha["languages"] == {"Python": 100.0}
+    assert alpha["url"] == "https://gitlab/alpha"
+    assert alpha["stats"]["file_count"] == 2
+    assert alpha["stats"]["readme_exists"] is True
+    assert set(alpha) >= {"project_id", "description", "created_at", "last_activity_at", "fetched_at"}
+
+
+# Verifies: requests run in parallel but never exceed the configured per-host concurrency
+def test_sync_engine_respects_concurrency_limit():
+    fake = FakeGitlab(make_projects(), delay=0.01)
+    run_engine(fake, concurrency=3)
+
+    assert 1 < fake.max_in_flight <= 3
+
+
+# Verifies: authentication failures surface as the legacy error dict
+def test_sync_engine_reports_auth_failure():
+    fake = FakeGitlab(make_projects())
+
+    async def run():
+        async with GitlabSyncEngine("wrong", base_url="https://gitlab.test", transport=fake.transport(), scheduler=fast_scheduler()) as engine:
+            return await engine.fetch_user_projects()
+
+    result = asyncio.run(run())
+    assert result["error"] == "Authentication failed"
+
+
+# Verifies: archive mode yields the same files and blob SHAs with one download per project
+def test_archive_mode_matches_api_mode():
+    api_projects = {p["project_id"]: p for p in run_engine(FakeGitlab(make_projects()))}
+    fake = FakeGitlab(make_projects())
+    archive_projects = {p["project_id"]: p for p in run_engine(fake, mode="archive")}
+
+    for project_id, project in api_projects.items():
+        assert archive_projects[project_id]["files"] == project["files"]
+        assert archive_projects[project_id]["file_shas"] == project["file_shas"]
+    assert len([call for call in fake.calls if call.endswith("archive.tar.gz")]) == 2
+    assert not any(call.endswith("/raw") or call.endswith("/tree") for call in fake.calls)
+
+
+# Verifies: an archive is extracted while it downloads, pulling one chunk at a time from the stream
+def test_archive_is_extracted_from_the_stream():
+    from backend.gitlab.sync_engine import ByteStreamReader, extract_text_files_from_archive
+
+    project = make_projects()[2]
+    archive = FakeGitlab(make_projects()).archive(project)
+    pulled = []
+
+    async def chunks():
+        for start in range(0, len(archive), 64):
+            pulled.append(start)
+            yield archive[start:start + 64]
+
+    async def run():
+        reader = ByteStreamReader(chunks(), asyncio.get_running_loop())
+        return await asyncio.to_thread(extract_text_files_from_archive, reader)
+
+    files, file_shas = asyncio.run(run())
+    assert files == project["files"]
+    assert set(file_shas) == set(files)
+    assert 1 < len(pulled) <= -(-len(archive) // 64)
+
+
+# Verifies: project listings and repository trees are followed across every page
+def test_sync_engine_follows_pagination():
+    projects = make_projects()
+    projects[2]["files"] = {f"src/Mod{i}.java": f"class Mod{i} {{}}" for i in range(25)}
+    for project_id in range(3, 15):
+        projects[project_id] = {"name": f"p{project_id}", "languages": {}, "files": {"a.py": str(project_id)}}
+    fake = FakeGitlab(projects, page_size=10)
+
+    synced = {p["project_id"]: p for p in run_engine(fake)}
+
+    assert len(synced) == 14
+    assert len(synced[2]["files"]) == 25
+    assert len([call for call in fake.calls if call == "/projects"]) == 2
+    assert len([call for call in fake.calls if call == "/projects/2/repository/tree"]) == 3
+
+
+# Verifies: throttled requests are retried after Retry-After instead of dropping files
+def test_sync_engine_retries_rate_limited_requests():
+    fake = FakeGitlab(make_projects(), throttle_first=5)
+    scheduler = fast_scheduler()
+    synced = {p["project_id"]: p for p in run_engine(fake, scheduler=scheduler)}
+
+    assert len(synced[2]["files"]) == 6
+    assert scheduler.retries == 5
+    assert scheduler.throttled == 5
+
+
+# Verifies: the token bucket spaces requests at the configured rate once the burst is spent
+def test_request_scheduler_paces_requests():
+    import time
+
+    scheduler = RequestScheduler(rate=50, burst=1)
+    started = time.monotonic()
+    for _ in range(6):
+        scheduler.acquire()
+    assert time.monotonic() - started >= 0.09
+
+
+# Verifies: a re-sync skips projects whose head commit did not move and only fetches changed blobs
+def test_incremental_sync_fetches_only_the_diff(monkeypatch: pytest.MonkeyPatch):
+    import mongomock
+    from backend.gitlab import gitlab_service as gitlab_module
+    from backend.services.blob_service import BlobService
+
+    projects = make_projects()
+    fake = FakeGitlab(projects)
+    db = mongomock.MongoClient()["students"]
+
+    def fake_fetch(user_token, **kwargs):
+        return run_engine(fake, kwargs.get("previous"), kwargs.get("known_blobs"))
+
+    monkeypatch.setattr(gitlab_module, "fetch_user_projects", fake_fetch, raising=True)
+    monkeypatch.setattr(gitlab_module.GitlabService, "get_projects_collection", lambda self: db["projects"], raising=True)
+    service = gitlab_module.GitlabService()
+    service.blob_service = BlobService(db)
+
+    first = service.store_projects_for_student("s1", "alice", "token")
+    assert first["unchanged_count"] == 0
+
+    projects[2]["head"] = "c2"
+    projects[2]["files"]["src/Mod0.java"] = "class Mod0 { int x; }"
+    fake.calls.clear()
+    second = service.store_projects_for_student("s1", "alice", "token")
+
+    assert second["unchanged_count"] == 1
+    assert not any(call.startswith("/projects/1/repository/tree") for call in fake.calls)
+    assert len([call for call in fake.calls if call.endswith("/raw")]) == 1
+
+    beta = db["projects"].find_one({"student_id": "s1", "project_id": 2}, {"_id": 0})
+    assert "files" not in beta and "file_shas" not in beta
+    entry = next(entry for entry in beta["manifest"] if entry["path"] == "src/Mod0.java")
+    assert entry == {"path": "src/Mod0.java", "sha": git_blob_sha("class Mod0 { int x; }"), "size": 21, "language": "Java"}
+    assert all(entry["size"] is not None for entry in beta["manifest"])
+    assert service.blob_service.load_files(beta, paths=["src/Mod0.java"]) == {"src/Mod0.java": "class Mod0 { int x; }"}
+    assert len(service.blob_service.load_files(beta)) == 6
+    assert db["blobs"].find_one({"_id": git_blob_sha("class Mod0 {}")})["refcount"] == 0
+
+
+# Verifies: a sync that fails while storing blobs leaves every stored manifest readable and is repeated by the next sync
+def test_sync_failing_while_storing_blobs_keeps_the_old_manifest(monkeypatch: pytest.MonkeyPatch):
+    import mongomock
+    from datetime import timedelta
+    from backend.gitlab import gitlab_service as gitlab_module
+    from backend.services.blob_service import BlobService
+
+    projects = make_projects()
+    fake = FakeGitlab(projects)
+    db = mongomock.MongoClient()["students"]
+    monkeypatch.setattr(gitlab_module, "fetch_user_projects", lambda user_token, **kwargs: run_engine(fake, kwargs.get("previous"), kwargs.get("known_blobs")))
+    monkeypatch.setattr(gitlab_module.GitlabService, "get_projects_collection", lambda self: db["projects"], raising=True)
+    service = gitlab_module.GitlabService()
+    service.blob_service = BlobService(db)
+    service.store_projects_for_student("s1", "alice", "token")
+
+    projects[2]["head"] = "c2"
+    projects[2]["files"]["src/Mod0.java"] = "class Mod0 { int x; }"
+    blobs = service.blob_service.collection
+    bulk_write = blobs.bulk_write
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("worker killed")
+
+    monkeypatch.setattr(blobs, "bulk_write", crash)
+    with pytest.raises(RuntimeError):
+        service.store_projects_for_student("s1", "alice", "token")
+    monkeypatch.setattr(blobs, "bulk_write", bulk_write)
+    service.blob_service.collect_garbage(grace_period=timedelta(0))
+
+    beta = db["projects"].find_one({"student_id": "s1", "project_id": 2})
+    assert beta["head_commit_sha"] != "c2"
+    assert service.blob_service.load_files(beta)["src/Mod0.java"] == "class Mod0 {}"
+
+    assert service.store_projects_for_student("s1", "alice", "token")["unchanged_count"] == 1
+    beta = db["projects"].find_one({"student_id": "s1", "project_id": 2})
+    assert service.blob_service.load_files(beta)["src/Mod0.java"] == "class Mod0 { int x; }"
+
+
+# Verifies: identical files across students are stored once, and unreferenced blobs are collected
+def test_blob_store_deduplicates_and_collects_garbage():
+    import mongomock
+    from datetime import timedelta
+    from backend.services.blob_service import BlobService
+
+    blobs = BlobService(mongomock.MongoClient()["students"])
+    template = {"main.py": "print('hello')"}
+    shas = {"main.py": git_blob_sha("print('hello')")}
+
+    blobs.update_refs(template, shas, {})
+    blobs.update_refs({}, shas, {})
+    assert blobs.collection.count_documents({}) == 1
+    assert blobs.collection.find_one()["refcount"] == 2
+
+    blobs.update_refs({}, {}, shas)
+    assert blobs.collect_garbage(grace_period=timedelta(0)) == 0
+    blobs.update_refs({}, {}, shas)
+    assert blobs.collect_garbage(grace_period=timedelta(0)) == 1
+
+
+# Verifies: the periodic job deletes blobs left unreferenced past the grace period
+def test_blob_garbage_collection_runs_periodically():
+    import asyncio
+    from datetime import timedelta
+    from backend.services import blob_service as blob_module
+
+    blobs = blob_module.BlobService()
+    shas = {"main.py": git_blob_sha("print('bye')")}
+    blobs.update_refs({"main.py": "print('bye')"}, shas, {})
+    blobs.update_refs({}, {}, shas)
+
+    async def run_job():
+        job = asyncio.create_task(blob_module.collect_garbage_periodically(interval=0.01, grace_period=timedelta(0)))
+        await asyncio.sleep(0.1)
+        job.cancel()
+
+    asyncio.run(run_job())
+    assert blobs.collection.count_documents({}) == 0
+
+
+# Verifies: contents above the inline limit are split into chunks, reassembled on read and collected with their blob
+def test_blob_store_chunks_large_contents(monkeypatch: pytest.MonkeyPatch):
+    import mongomock
+    from datetime import timedelta
+    from backend.services import blob_service as blob_module
+
+    monkeypatch.setattr(blob_module, "BLOB_INLINE_MAX_BYTES", 10)
+    monkeypatch.setattr(blob_module, "BLOB_CHUNK_BYTES", 4)
+    blobs = blob_module.BlobService(mongomock.MongoClient()["students"])
+    content = "print('æøå' * 3)"
+    shas = {"big.py": "sha-big", "small.py": "sha-small"}
+
+    blobs.update_refs({"big.py": content, "small.py": "x = 1"}, shas, {})
+    stored = blobs.collection.find_one({"_id": "sha-big"})
+    assert "content" not in stored and stored["size"] == len(content.encode("utf-8"))
+    assert blobs.chunks.count_documents({"sha": "sha-big"}) == stored["chunks"] == 5
+    assert blobs.get_many(shas.values()) == {"sha-big": content, "sha-small": "x = 1"}
+
+    blobs.update_refs({}, {}, shas)
+    assert blobs.collect_garbage(grace_period=timedelta(0)) == 2
+    assert blobs.chunks.count_documents({}) == 0
+
+
+# Verifies: blobs are stored compressed and every layout (plain, zlib, chunked) reads back transparently
+def test_blob_store_compresses_contents(monkeypatch: pytest.MonkeyPatch):
+    import mongomock
+    from backend.mongodb.storage_codec import StorageCodec
+    from backend.services import blob_service as blob_module
+
+    db = mongomock.MongoClient()["students"]
+    blobs = blob_module.BlobService(db, codec=StorageCodec(db, codec="zlib"))
+    source = "def handler(request):\n    return request\n\n" * 200
+    blobs.update_refs({"app.py": source}, {"app.py": "sha-app"}, {})
+    db["blobs"].insert_one({"_id": "sha-plain", "content": "x = 1", "size": 5, "refcount": 1})
+
+    stored = db["blobs"].find_one({"_id": "sha-app"})
+    assert stored["codec"] == "zlib" and stored["size"] == len(source)
+    assert len(stored["content"]) < len(source) / 10
+    assert blobs.get_many(["sha-app", "sha-plain"]) == {"sha-app": source, "sha-plain": "x = 1"}
+
+    monkeypatch.setattr(blob_module, "BLOB_INLINE_MAX_BYTES", 64)
+    monkeypatch.setattr(blob_module, "BLOB_CHUNK_BYTES", 32)
+    big = "".join(f"value_{i} = {i * i}\n" for i in range(500))
+    blobs.update_refs({"big.py": big}, {"big.py": "sha-big"}, {})
+    assert db["blobs"].find_one({"_id": "sha-big"})["chunks"] > 1
+    assert blobs.get_many(["sha-big"]) == {"sha-big": big}
+
+
+# Verifies: a trained zstd dictionary is used for new writes and looked up again when reading
+def test_storage_codec_zstd_dictionary():
+    pytest.importorskip("zstandard")
+    import mongomock
+    from backend.mongodb.storage_codec import StorageCodec
+
+    db = mongomock.MongoClient()["students"]
+    codec = StorageCodec(db, codec="zstd")
+    samples = [f"import os\n\ndef task_{i}(values):\n    return [v * {i} for v in values]\n" * 8 for i in range(200)]
+    dict_id = codec.train_dictionary(samples, size=4096)
+
+    fields = codec.encode(samples[7])
+    assert fields["codec"] == "zstd" and fields["dict_id"] == dict_id
+    assert StorageCodec(db, codec="zstd").decode(fields) == samples[7]
+
+
+# Verifies: a dictionary trained by another process is used for new writes once the refresh interval passed
+def test_storage_codec_picks_up_dictionaries_trained_elsewhere(monkeypatch: pytest.MonkeyPatch):
+    pytest.importorskip("zstandard")
+    import mongomock
+    from backend.mongodb import storage_codec
+
+    now = [1000.0]
+    monkeypatch.setattr(storage_codec.time, "monotonic", lambda: now[0])
+    db = mongomock.MongoClient()["students"]
+    server = storage_codec.StorageCodec(db, codec="zstd")
+    sample = "def task(values):\n    return [v * 2 for v in values]\n" * 20
+    assert "dict_id" not in server.encode(sample)
+
+    samples = [f"import os\n\ndef task_{i}(values):\n    return [v * {i} for v in values]\n" * 8 for i in range(200)]
+    dict_id = storage_codec.StorageCodec(db, codec="zstd").train_dictionary(samples, size=4096)
+    assert "dict_id" not in server.encode(sample)
+
+    now[0] += storage_codec.DICTIONARY_REFRESH
+    assert server.encode(sample)["dict_id"] == dict_id
+
+
+# Verifies: sync jobs run in the background, report per-project progress and allow one active job per student
+def test_sync_jobs_report_progress_and_run_once_per_student():
+    import threading
+    import mongomock
+    from backend.mongodb.indexes import ensure_indexes
+    from backend.services.sync_job_service import SyncJobService
+
+    release = threading.Event()
+    fake = FakeGitlab(make_projects())
+
+    def runner(student_id, gitlab_username, gitlab_token, progress=None):
+        async def run():
+            async with GitlabSyncEngine(gitlab_token, base_url="https://gitlab.test", transport=fake.transport(), scheduler=fast_scheduler()) as engine:
+                return await engine.fetch_user_projects(progress=progress)
+
+        release.wait(5)
+        return {"success": True, "project_count": len(asyncio.run(run()))}
+
+    db = mongomock.MongoClient()["students"]
+    ensure_indexes(db)
+    jobs = SyncJobService(db, runner=runner, max_workers=2)
+    first = jobs.enqueue("s1", "alice", "token")
+    second = jobs.enqueue("s1", "alice", "token")
+    other = jobs.enqueue("s2", "bob", "token")
+
+    assert first["created"] and other["created"]
+    assert not second["created"] and second["job_id"] == first["job_id"]
+
+    release.set()
+    jobs.executor.shutdown(wait=True)
+
+    status = jobs.get(first["job_id"])
+    assert status["status"] == "succeeded"
+    assert status["result"]["project_count"] == 2
+    assert status["completed_projects"] == status["total_projects"] == 2
+    assert {p["status"] for p in status["projects"]} == {"new"}
+    assert jobs.collection.find_one({"_id": first["job_id"]}).get("active_key") is None
+    assert "token" not in str(jobs.collection.find_one({"_id": first["job_id"]}))
+
+
+# Verifies: a job stuck on one long project keeps its heartbeat fresh and is not expired as stale
+def test_sync_job_heartbeat_runs_while_a_project_is_syncing(monkeypatch: pytest.MonkeyPatch):
+    import threading
+    import time
+    import mongomock
+    from datetime import timedelta
+    from backend.mongodb.indexes import ensure_indexes
+    from backend.services import sync_job_service
+
+    monkeypatch.setattr(sync_job_service, "SYNC_JOB_STALE_AFTER", timedelta(seconds=0.3))
+    monkeypatch.setattr(sync_job_service, "SYNC_JOB_HEARTBEAT_INTERVAL", 0.05)
+    release = threading.Event()
+
+    def runner(student_id, gitlab_username, gitlab_token, progress=None):
+        # One large project that reports no progress for longer than the stale timeout
+        release.wait(5)
+        return {"success": True}
+
+    db = mongomock.MongoClient()["students"]
+    ensure_indexes(db)
+    jobs = sync_job_service.SyncJobService(db, runner=runner)
+    job = jobs.enqueue("s1", "alice", "token")
+    time.sleep(0.6)
+
+    assert jobs.get(job["job_id"])["status"] == "running"
+    assert not jobs.enqueue("s1", "alice", "token")["created"]
+
+    release.set()
+    jobs.executor.shutdown(wait=True)
+    assert jobs.get(job["job_id"])["status"] == "succeeded"
+
+
+# Verifies: progress reports only buffer, and are written together by the reporter thread before the job finishes
+def test_sync_job_progress_is_buffered_and_coalesced():
+    import mongomock
+    from backend.services.sync_job_service import SyncJobService
+
+    writes = []
+
+    def runner(student_id, gitlab_username, gitlab_token, progress=None):
+        before = len(updates)
+        for project_id in range(3):
+            progress(project_id, f"project-{project_id}", "new")
+        writes.append(len(updates) - before)
+        return {"success": True}
+
+    jobs = SyncJobService(mongomock.MongoClient()["students"], runner=runner)
+    updates = []
+    update_one = jobs.collection.update_one
+
+    def recording_update_one(*args, **kwargs):
+        updates.append(args)
+        return update_one(*args, **kwargs)
+
+    jobs.collection.update_one = recording_update_one
+    job = jobs.enqueue("s1", "alice", "token")
+    jobs.executor.shutdown(wait=True)
+
+    status = jobs.get(job["job_id"])
+    assert writes == [0]
+    assert status["completed_projects"] == 3
+    # Starting the job, one coalesced progress write and finishing it
+    assert len(updates) == 3
+
+
+# Verifies: a repeat sync revalidates listings with If-None-Match and replays stored bodies on 304
+def test_http_cache_serves_not_modified_responses():
+    import mongomock
+    from backend.gitlab.http_cache import GitlabHttpCache
+
+    projects = make_projects()
+    projects[2]["files"] = {f"src/Mod{i}.java": f"class Mod{i} {{}}" for i in range(25)}
+    fake = FakeGitlab(projects, page_size=10, etags=True)
+    cache = GitlabHttpCache(mongomock.MongoClient()["students"])
+
+    first = {p["project_id"]: p for p in run_engine(fake, cache=cache)}
+    assert cache.hits == 0 and fake.not_modified == 0
+
+    second = {p["project_id"]: p for p in run_engine(fake, cache=cache)}
+    assert fake.not_modified == cache.hits > 0
+    assert second[2]["file_shas"] == first[2]["file_shas"]
+    assert second[1]["languages"] == {"Python": 100.0}
+    assert cache.stats()["hit_rate"] > 0
+    assert not cache.collection.find_one({"url": {"$regex": "/raw$"}})
+
+    other_user = GitlabHttpCache.scope_for_token("someone-else")
+    assert not cache.collection.find_one({"scope": other_user})
+
+
+# Verifies: commit counts come from listing statistics, X-Total or one batched GraphQL query, never from paging history
+@pytest.mark.parametrize("source", ["statistics", "x_total", "graphql"])
+def test_commit_counts_cost_at_most_one_request(source):
+    projects = make_projects()
+    projects[1]["commits"] = 250
+    projects[2]["commits"] = 3
+    fake = FakeGitlab(projects, statistics=source == "statistics", x_total=source == "x_total")
+
+    synced = {p["project_id"]: p for p in run_engine(fake)}
+
+    assert synced[1]["stats"]["commit_count"] == 250
+    assert synced[2]["stats"]["commit_count"] == 3
+    assert len([call for call in fake.calls if call.endswith("/repository/commits")]) == 2
+    assert fake.calls.count("/api/graphql") == (1 if source == "graphql" else 0)
+
+
+# Verifies: legacy per-student collections move into the projects collection without touching newer syncs
+def test_project_migration_moves_legacy_collections():
+    import mongomock
+    from backend.mongodb.project_migration import migrate_all
+
+    db = mongomock.MongoClient()["students"]
+    alice = "0b6f7a54-5d8e-4a3e-9a43-1f2f3c4d5e6f"
+    bob = "9c1d2e3f-4a5b-4c6d-8e7f-0a1b2c3d4e5f"
+    db[alice].insert_many([{"project_id": 1, "name": "alpha"}, {"project_id": 2, "name": "beta"}])
+    db[bob].insert_one({"project_id": 1, "name": "old"})
+    db["projects"].insert_one({"student_id": bob, "project_id": 1, "name": "synced"})
+    db["student_registry"].insert_one({"gitlab_username": "alice"})
+
+    assert migrate_all(db) == {alice: 2, bob: 0}
+    assert migrate_all(db) == {}
+
+    assert sorted(db.list_collection_names()) == ["projects", "student_registry"]
+    assert db["projects"].count_documents({"student_id": alice}) == 2
+    assert db["projects"].find_one({"student_id": bob})["name"] == "synced"
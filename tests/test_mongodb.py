@@ -0,0 +1,163 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.mongodb import MongoDB
+
+
+# Verifies: every get_db_connection call shares one client, which the app lifespan closes on shutdown
+def test_shared_client_is_reused_and_closed_by_lifespan(client: TestClient):
+    mongo_client = MongoDB.get_client()
+    assert MongoDB.get_db_connection("students").client is mongo_client
+    assert MongoDB.get_db_connection("other").client is mongo_client
+
+    with client:
+        assert MongoDB.get_client() is mongo_client
+    assert MongoDB._client is None
+
+
+# Verifies: the pool settings from the environment are applied to the client
+def test_create_client_applies_pool_settings():
+    client = MongoDB.create_client("mongodb://localhost:27017/")
+    try:
+        pool = client.options.pool_options
+        assert pool.max_pool_size == MongoDB.MONGO_MAX_POOL_SIZE
+        assert pool.wait_queue_timeout == MongoDB.MONGO_WAIT_QUEUE_TIMEOUT_MS / 1000
+        assert client.options.server_selection_timeout == MongoDB.MONGO_SERVER_SELECTION_TIMEOUT_MS / 1000
+    finally:
+        client.close()
+
+
+# Verifies: services run on the async layer, backed by mongomock through the thread facade
+def test_async_services_round_trip_through_thread_facade(client: TestClient):
+    import asyncio
+    from backend.services.suggestion_service import SuggestionService
+    from test_all_endpoints import make_token
+
+    async def run():
+        service = SuggestionService()
+        created = await service.create("u1", "Write tests")
+        await service.create("u1", "Refactor")
+        listed = await service.get_all_for_student("u1")
+        deleted = await service.delete(created["_id"])
+        return created, listed, deleted
+
+    created, listed, deleted = asyncio.run(run())
+    assert created["suggestion"] == "Write tests"
+    assert [s["suggestion"] for s in listed] == ["Write tests", "Refactor"]
+    assert deleted is True
+
+    cookies = {'app_token': make_token(sub='u1')}
+    state = {'user_id': 'u1', 'files': [{'name': 'main.py', 'content': 'print(1)', 'language': 'python'}], 'active_file': 'main.py'}
+    assert client.post('/api/students/u1/editor-state', json=state, cookies=cookies).status_code == 200
+    resp = client.get('/api/students/u1/editor-state', cookies=cookies)
+    assert resp.status_code == 200
+    assert resp.json()['files'][0]['content'] == 'print(1)'
+
+
+# Verifies: with the native driver the lifespan opens the AsyncMongoClient on the server's loop, and other loops are refused
+def test_native_async_client_is_bound_to_the_server_loop(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+    import asyncio
+    from pymongo import AsyncMongoClient
+    from backend.mongodb import async_db
+
+    monkeypatch.setattr(async_db, "MONGO_ASYNC_DRIVER", "native")
+    # Nothing listens here, the client only connects lazily
+    monkeypatch.setattr(MongoDB, "MONGO_URI", "mongodb://127.0.0.1:1/")
+
+    async def connect():
+        return async_db.get_async_db_connection("students")
+
+    with client:
+        opened = async_db._async_client
+        assert isinstance(opened, AsyncMongoClient)
+        assert client.portal.call(connect).client is opened
+        with pytest.raises(RuntimeError, match="server's event loop"):
+            asyncio.run(connect())
+    assert async_db._async_client is None
+
+
+# Verifies: editor files are compressed at rest and returned as plain text
+def test_editor_state_is_compressed_at_rest(client: TestClient):
+    from test_all_endpoints import make_token
+
+    cookies = {'app_token': make_token(sub='u2')}
+    content = "for i in range(10):\n    print(i)\n" * 100
+    state = {'user_id': 'u2', 'files': [{'name': 'main.py', 'content': content, 'language': 'python'}], 'active_file': 'main.py'}
+    assert client.post('/api/students/u2/editor-state', json=state, cookies=cookies).json()['files'][0]['content'] == content
+
+    stored = MongoDB.get_db_connection("students")["editor_state"].find_one({'user_id': 'u2'})
+    assert stored['files'][0]['codec'] in ('zstd', 'zlib')
+    assert client.get('/api/students/u2/editor-state', cookies=cookies).json()['files'][0] == state['files'][0]
+
+
+# Verifies: the thread facade cursor supports sort/limit chaining and async iteration
+def test_threaded_cursor_sort_and_limit():
+    import asyncio
+    import mongomock
+    from backend.mongodb.async_db import ThreadedDatabase
+
+    collection = ThreadedDatabase(mongomock.MongoClient()["students"])["items"]
+
+    async def run():
+        await collection.insert_many([{"n": n} for n in range(5)])
+        top = await collection.find({}, {"_id": 0}).sort("n", -1).limit(2).to_list()
+        seen = [doc["n"] async for doc in collection.find({})]
+        return top, seen, await collection.count_documents({})
+
+    top, seen, count = asyncio.run(run())
+    assert top == [{"n": 4}, {"n": 3}]
+    assert seen == [0, 1, 2, 3, 4]
+    assert count == 5
+
+
+# Verifies: every declared index is created and undeclared collections are left alone
+def test_ensure_indexes_creates_declared_indexes():
+    import mongomock
+    from backend.ai.session_store import ASSISTANT_SESSION_TTL
+    from backend.mongodb import indexes
+
+    db = mongomock.MongoClient()["students"]
+    db["blobs"].insert_one({"_id": "sha"})
+
+    indexes.ensure_indexes(db)
+
+    assert "gitlab_username_unique" in db["student_registry"].index_information()
+    assert "user_id_unique" in db["editor_state"].index_information()
+    assert "participant_id" in db["survey_sessions"].index_information()
+    assert "student_id_project_id_unique" in db["projects"].index_information()
+    assert db["sync_jobs"].index_information()["active_key_1"]["unique"]
+    assert db["assistant_sessions"].index_information()["updated_at_ttl"]["expireAfterSeconds"] == ASSISTANT_SESSION_TTL
+    assert "last_used_at_ttl" in db["ai_response_cache"].index_information()
+    assert list(db["blobs"].index_information()) == ["_id_"]
+
+
+# Verifies: COLLSCANs are detected anywhere in a winning plan, including nested stages
+def test_winning_stages_flags_collscans():
+    from backend.mongodb.indexes import winning_stages
+
+    indexed = {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_unique"}}}}
+    scanned = {"queryPlanner": {"winningPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}}
+    sbe = {"queryPlanner": {"winningPlan": {"queryPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}}}}
+
+    assert winning_stages(indexed) == ["FETCH", "IXSCAN"]
+    assert "COLLSCAN" in winning_stages(scanned)
+    assert winning_stages(sbe) == ["FETCH", "IXSCAN"]
+
+
+# Verifies: with the indexes in place no hot query is a collection scan (needs a real MongoDB)
+@pytest.mark.skipif(not os.getenv("MONGO_TEST_URI"), reason="set MONGO_TEST_URI to run explain() against MongoDB")
+def test_hot_queries_use_indexes():
+    from pymongo import MongoClient
+    from backend.mongodb import indexes
+
+    client = MongoClient(os.environ["MONGO_TEST_URI"])
+    db = client["index_check"]
+    try:
+        db["projects"].insert_one({"student_id": "s1", "project_id": 1})
+        indexes.ensure_indexes(db)
+        assert indexes.find_collscans(db) == []
+    finally:
+        client.drop_database("index_check")
+        client.close()
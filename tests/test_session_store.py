@@ -0,0 +1,234 @@
+import asyncio
+
+from backend.ai.session_store import MemorySessionStore, MongoSessionStore, message_bytes
+
+
+def user(text: str) -> dict:
+    return {"role": "user", "content": text}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+# Verifies: the least recently used session is evicted once the session limit is reached
+def test_store_evicts_least_recently_used_session():
+    store = MemorySessionStore(max_sessions=2)
+    run(store.set("a", [user("1")]))
+    run(store.set("b", [user("2")]))
+    run(store.get("a"))
+    run(store.set("c", [user("3")]))
+
+    assert run(store.list_ids()) == ["a", "c"]
+    assert run(store.stats())["evictions"] == 1
+
+
+# Verifies: sessions idle for longer than the TTL disappear
+def test_store_expires_idle_sessions(monkeypatch):
+    from backend.ai import session_store
+
+    now = [1000.0]
+    monkeypatch.setattr(session_store.time, "monotonic", lambda: now[0])
+    store = MemorySessionStore(ttl=60)
+    run(store.set("old", [user("1")]))
+    now[0] += 30
+    run(store.set("new", [user("2")]))
+    now[0] += 45
+
+    assert not run(store.exists("old"))
+    assert run(store.get("new")) == [user("2")]
+
+
+# Verifies: a session over its byte cap drops its oldest messages but keeps the system prompt
+def test_store_caps_session_bytes_keeping_system_messages():
+    system = {"role": "system", "content": "You are a tutor."}
+    cap = message_bytes(system) + 2 * message_bytes(user("x" * 100))
+    store = MemorySessionStore(max_session_bytes=cap)
+    run(store.set("s", [system]))
+    for i in range(5):
+        run(store.append("s", user(str(i) * 100)))
+
+    assert run(store.get("s")) == [system, user("3" * 100), user("4" * 100)]
+    assert run(store.stats())["bytes"] <= cap
+
+
+# Verifies: the global byte budget evicts whole sessions and the gauges track what is held
+def test_store_global_budget_and_gauges():
+    message = user("y" * 1000)
+    store = MemorySessionStore(max_total_bytes=3 * message_bytes(message))
+    for i in range(5):
+        run(store.set(f"s{i}", [message]))
+
+    stats = run(store.stats())
+    assert stats["sessions"] == 3
+    assert stats["bytes"] == 3 * message_bytes(message)
+    assert run(store.list_ids()) == ["s2", "s3", "s4"]
+
+    run(store.delete("s3"))
+    assert run(store.stats())["bytes"] == 2 * message_bytes(message)
+
+
+def mongo_db():
+    import mongomock
+    from backend.mongodb.async_db import ThreadedDatabase
+
+    return ThreadedDatabase(mongomock.MongoClient()["students"])
+
+
+# Verifies: a session written by one worker is visible to another once flushed, and reads include unflushed writes
+def test_mongo_store_shares_sessions_between_workers():
+    db = mongo_db()
+
+    async def scenario():
+        first, second = MongoSessionStore(db, flush_interval=60), MongoSessionStore(db, flush_interval=60)
+        await first.set("s", [user("1")])
+        await first.append("s", user("2"))
+        assert await first.get("s") == [user("1"), user("2")]
+        assert await second.get("s") is None
+
+        await first.flush()
+        assert await second.get("s") == [user("1"), user("2")]
+        await first.close()
+        await second.close()
+        return await second.stats()
+
+    stats = run(scenario())
+    assert stats["sessions"] == 1
+    assert stats["pending_writes"] == 0
+
+
+# Verifies: appends buffered by two workers at once are both kept, the losing write retries on a version conflict
+def test_mongo_store_merges_concurrent_appends_with_versioning():
+    db = mongo_db()
+
+    async def scenario():
+        first, second = MongoSessionStore(db, flush_interval=60), MongoSessionStore(db, flush_interval=60)
+        await first.set("s", [user("start")])
+        await first.flush()
+
+        await first.append("s", user("a"))
+        await second.append("s", user("b"))
+        # The second worker reads version 1, then the first worker writes version 2 before it saves
+        read = second.collection.find_one
+
+        async def interleaved_find_one(*args, **kwargs):
+            doc = await read(*args, **kwargs)
+            if first.pending:
+                await first.flush()
+            return doc
+
+        second.collection.find_one = interleaved_find_one
+        await second.flush()
+        messages = await MongoSessionStore(db).get("s")
+        return messages, second.conflicts
+
+    messages, conflicts = run(scenario())
+    assert messages == [user("start"), user("a"), user("b")]
+    assert conflicts == 1
+
+
+# Verifies: buffered writes are flushed in the background without an explicit flush
+def test_mongo_store_writes_behind_in_background():
+    db = mongo_db()
+
+    async def scenario():
+        store = MongoSessionStore(db, flush_interval=0.01)
+        await store.append("s", user("hi"))
+        await asyncio.sleep(0.2)
+        return store.pending, await MongoSessionStore(db).get("s")
+
+    pending, stored = run(scenario())
+    assert pending == {}
+    assert stored == [user("hi")]
+
+
+# Verifies: a message appended while a flush is writing is flushed by the next round, not left in the buffer
+def test_mongo_store_flushes_appends_made_during_a_flush():
+    db = mongo_db()
+
+    async def scenario():
+        store = MongoSessionStore(db, flush_interval=0.01)
+        write = store._write
+
+        async def slow_write(session_id, pending):
+            await asyncio.sleep(0.1)
+            await write(session_id, pending)
+
+        store._write = slow_write
+        await store.append("s", user("question"))
+        await asyncio.sleep(0.05)
+        await store.append("s", {"role": "assistant", "content": "answer"})
+        await asyncio.sleep(0.5)
+        return store.pending, await MongoSessionStore(db).get("s")
+
+    pending, stored = run(scenario())
+    assert pending == {}
+    assert stored == [user("question"), {"role": "assistant", "content": "answer"}]
+
+
+# Verifies: a write already in flight does not bring a deleted session back, for this worker or another one
+def test_mongo_store_delete_wins_over_writes_in_flight():
+    db = mongo_db()
+
+    async def scenario():
+        first, second = MongoSessionStore(db, flush_interval=60), MongoSessionStore(db, flush_interval=60)
+        await first.set("s", [user("1")])
+        await first.flush()
+
+        await first.append("s", user("2"))
+        await second.append("s", user("3"))
+        find_one = first.collection.find_one
+
+        async def delete_after_read(*args, **kwargs):
+            doc = await find_one(*args, **kwargs)
+            if "s" not in first.deleted:
+                await first.delete("s")
+            return doc
+
+        first.collection.find_one = delete_after_read
+        await first.flush()
+        await second.flush()
+        first.collection.find_one = find_one
+        reader = MongoSessionStore(db)
+        gone = (await reader.get("s"), await reader.list_ids(), (await reader.stats())["sessions"])
+
+        await second.set("s", [user("again")])
+        await second.flush()
+        return gone, await reader.get("s")
+
+    gone, recreated = run(scenario())
+    assert gone == (None, [], 0)
+    assert recreated == [user("again")]
+
+
+# Verifies: a compaction and a create by one worker keep what other workers wrote in the meantime
+def test_mongo_store_compaction_and_create_keep_other_workers_writes():
+    db = mongo_db()
+    system = {"role": "system", "content": "You are a tutor."}
+    summary = {"role": "system", "content": "Summary"}
+
+    async def scenario():
+        first, second = MongoSessionStore(db, flush_interval=60), MongoSessionStore(db, flush_interval=60)
+        await second.append("s", user("early"))
+        await first.create("s", [system])
+        await second.flush()
+        await first.flush()
+        created = await MongoSessionStore(db).get("s")
+
+        read = await first.get("s")
+        await second.append("s", user("during summary"))
+        await second.flush()
+        await first.replace("s", read, [summary])
+        await first.flush()
+        compacted = await MongoSessionStore(db).get("s")
+
+        await second.set("s", [])
+        await second.flush()
+        await first.replace("s", compacted, [system])
+        await first.flush()
+        return created, compacted, await MongoSessionStore(db).get("s")
+
+    created, compacted, cleared = run(scenario())
+    assert created == [user("early")]
+    assert compacted == [summary, user("during summary")]
+    assert cleared == []